@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Integer arithmetic with huge operands. Every workload computes a result whose exact value is
+known (factorials, Fibonacci numbers, digit sums of powers, floor division of negative numbers),
+so the output of the interpret is checked, and the same programs run by an older revision show
+the cost and the errors of IDIV through a float quotient. The small workload is a loop on small
+integers, the common case which must not get slower. """
+# ---------------------------------------------------------------------------
+import os, sys, math, argparse, resource, tempfile, subprocess
+from workloads import toXml
+from generate import interpretPath
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if hasattr(sys, 'set_int_max_str_digits'):
+    sys.set_int_max_str_digits(0) # expected results have more than 4300 digits
+
+def factorial(n):
+    """ n! by MUL, thousands of digits for n in thousands """
+
+    return '''.IPPcode22
+DEFVAR GF@n
+DEFVAR GF@f
+MOVE GF@n int@%d
+MOVE GF@f int@1
+LABEL loop
+MUL GF@f GF@f GF@n
+SUB GF@n GF@n int@1
+JUMPIFNEQ loop GF@n int@0
+WRITE GF@f
+''' % n, str(math.factorial(n))
+
+def fibonacci(n):
+    """ The n-th Fibonacci number by ADD """
+
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return '''.IPPcode22
+DEFVAR GF@a
+DEFVAR GF@b
+DEFVAR GF@t
+DEFVAR GF@i
+MOVE GF@a int@0
+MOVE GF@b int@1
+MOVE GF@i int@%d
+LABEL loop
+ADD GF@t GF@a GF@b
+MOVE GF@a GF@b
+MOVE GF@b GF@t
+SUB GF@i GF@i int@1
+JUMPIFNEQ loop GF@i int@0
+WRITE GF@a
+''' % n, str(a)
+
+def digits(n):
+    """ Sum of the decimal digits of 7^n, every digit is split off by IDIV of the huge number """
+
+    return '''.IPPcode22
+DEFVAR GF@p
+DEFVAR GF@q
+DEFVAR GF@r
+DEFVAR GF@s
+DEFVAR GF@i
+MOVE GF@p int@1
+MOVE GF@s int@0
+MOVE GF@i int@%d
+LABEL power
+MUL GF@p GF@p int@7
+SUB GF@i GF@i int@1
+JUMPIFNEQ power GF@i int@0
+LABEL digit
+IDIV GF@q GF@p int@10
+MUL GF@r GF@q int@10
+SUB GF@r GF@p GF@r
+ADD GF@s GF@s GF@r
+MOVE GF@p GF@q
+JUMPIFNEQ digit GF@p int@0
+WRITE GF@s
+''' % n, str(sum(map(int, str(7 ** n))))
+
+def floor(n):
+    """ Halves -(5^n) by IDIV until it is -1, floor division never reaches 0 """
+
+    p, steps = -5 ** n, 0
+    while p != -1:
+        p, steps = p // 2, steps + 1
+    return '''.IPPcode22
+DEFVAR GF@p
+DEFVAR GF@i
+DEFVAR GF@c
+MOVE GF@p int@1
+MOVE GF@i int@%d
+LABEL power
+MUL GF@p GF@p int@5
+SUB GF@i GF@i int@1
+JUMPIFNEQ power GF@i int@0
+SUB GF@p int@0 GF@p
+MOVE GF@c int@0
+LABEL half
+JUMPIFEQ end GF@p int@-1
+JUMPIFEQ end GF@p int@0
+IDIV GF@p GF@p int@2
+ADD GF@c GF@c int@1
+JUMP half
+LABEL end
+WRITE GF@p
+WRITE string@\\032
+WRITE GF@c
+''' % n, '-1 %d' % steps
+
+def small(n):
+    """ n iterations of ADD, SUB, MUL and IDIV on small integers """
+
+    s = t = 0
+    for i in range(n, 0, -1):
+        s = (s + i) % 1000
+        t = (t + s * 3) // 7
+    return '''.IPPcode22
+DEFVAR GF@s
+DEFVAR GF@t
+DEFVAR GF@q
+DEFVAR GF@i
+MOVE GF@s int@0
+MOVE GF@t int@0
+MOVE GF@i int@%d
+LABEL loop
+ADD GF@s GF@s GF@i
+IDIV GF@q GF@s int@1000
+MUL GF@q GF@q int@1000
+SUB GF@s GF@s GF@q
+MUL GF@q GF@s int@3
+ADD GF@t GF@t GF@q
+IDIV GF@t GF@t int@7
+SUB GF@i GF@i int@1
+JUMPIFNEQ loop GF@i int@0
+WRITE GF@s
+WRITE string@\\032
+WRITE GF@t
+''' % n, '%d %d' % (s, t)
+
+WORKLOADS = {'factorial': (factorial, 3000), 'fibonacci': (fibonacci, 20000), 'digits': (digits, 3000),
+             'floor': (floor, 2000), 'small': (small, 50000)}
+
+def run(interpret, source, runs):
+    """ Returns the output, return code and minimal CPU time of the runs """
+
+    times = []
+    for _ in range(runs):
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        result = subprocess.run([sys.executable, interpret, '--source=' + source], stdin=subprocess.DEVNULL,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        times.append(after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime)
+    return result.stdout.decode(), result.returncode, min(times)
+
+def main():
+    parser = argparse.ArgumentParser(description="Huge integer arithmetic benchmark and check")
+    parser.add_argument("--old", default='HEAD', help="git revision or path of the interpret compared (default HEAD)")
+    parser.add_argument("--new", default=os.path.join(ROOT, 'interpret.py'))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the sizes of the workloads")
+    parser.add_argument("--only", help="comma separated workloads, all by default: " + ','.join(WORKLOADS))
+    arguments = parser.parse_args()
+
+    names = arguments.only.split(',') if arguments.only else list(WORKLOADS)
+    wrong = 0
+    print('%-10s %7s %10s %10s %8s  %-12s %s' % ('workload', 'size', 'old [s]', 'new [s]', 'old/new', 'old', 'new'))
+    with tempfile.TemporaryDirectory() as tmp:
+        old, new = interpretPath(tmp, 'old', arguments.old), interpretPath(tmp, 'new', arguments.new)
+        for name in names:
+            function, size = WORKLOADS[name]
+            size = max(1, int(size * arguments.scale))
+            code, expected = function(size)
+            source = os.path.join(tmp, name + '.xml')
+            with open(source, 'w') as f:
+                f.write(toXml(code, 'IPPcode22'))
+            results = []
+            for interpret in (old, new):
+                output, rc, seconds = run(interpret, source, arguments.runs)
+                results.append((seconds, 'ok' if rc == 0 and output == expected else
+                                'rc %d' % rc if rc else 'wrong'))
+            (oldTime, oldResult), (newTime, newResult) = results
+            wrong += newResult != 'ok'
+            print('%-10s %7d %10.3f %10.3f %7.2fx  %-12s %s' % (name, size, oldTime, newTime, oldTime / newTime,
+                                                              oldResult, newResult))
+    print('%d of %d workloads wrong' % (wrong, len(names)))
+    return 1 if wrong else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Compares interrupted and uninterrupted runs of generated programs. Every program (bench/generate.py,
+with READ from its input) is run once to its end, then again with --checkpoint: that run is killed
+by SIGKILL after a random delay and continued by --resume, killed again and so on, the last run ends.
+All the runs append their output to one file, which every resume cuts at the offset saved in the
+checkpoint, so the file and the return code of the last run must be the same as the output and the
+return code of the uninterrupted run. Kills land anywhere, also while a checkpoint is being written,
+so the test checks the atomic replacement of the file as well. The heavy output case is a WRITE loop
+whose CPU time is measured without and with checkpoints, the cost of a checkpoint must not grow with
+the output written so far. """
+# ---------------------------------------------------------------------------
+import os, sys, time, random, signal, argparse, resource, tempfile, subprocess
+from workloads import toXml
+from generate import Generator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def start(command, inputFile, output=subprocess.PIPE):
+    """ Starts the interpret reading the input of the program from its stdin """
+
+    with open(inputFile) as f:
+        return subprocess.Popen(command, stdin=f, stdout=output, stderr=subprocess.DEVNULL)
+
+def uninterrupted(command, inputFile):
+    """ Returns the output, return code and wall clock time of a run without checkpoints """
+
+    begin = time.perf_counter()
+    process = start(command, inputFile)
+    output = process.communicate()[0]
+    return output, process.returncode, time.perf_counter() - begin
+
+def interrupted(command, inputFile, checkpointFile, every, kills, duration, generator):
+    """ Kills the run kills times after random delays up to duration, continuing it by --resume,
+    and lets the last run end. Returns the output of all the runs and the return code of the last. """
+
+    command = command + ['--checkpoint=' + checkpointFile, '--checkpoint-every=%d' % every]
+    if os.path.exists(checkpointFile):
+        os.unlink(checkpointFile)
+    outputFile = checkpointFile + '.out'
+    open(outputFile, 'w').close()
+    for run in range(kills + 1):
+        with open(outputFile, 'ab') as output:
+            process = start(command + (['--resume'] if run else []), inputFile, output)
+        try:
+            process.wait(timeout=generator.uniform(0, duration) if run < kills else None)
+            break
+        except subprocess.TimeoutExpired:
+            process.send_signal(signal.SIGKILL)
+            process.wait()
+    with open(outputFile, 'rb') as f:
+        return f.read(), process.returncode
+
+def heavyOutput(writes):
+    """ A loop of writes iterations, each writes its counter """
+
+    return '''.IPPcode22
+DEFVAR GF@i
+MOVE GF@i int@%d
+LABEL loop
+WRITE GF@i
+WRITE string@\\010
+SUB GF@i GF@i int@1
+JUMPIFNEQ loop GF@i int@0
+''' % writes
+
+def cpuTime(command, inputFile, outputFile):
+    """ Returns the CPU time of a run writing its output to the file, --checkpoint needs a regular file """
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    with open(inputFile) as f, open(outputFile, 'wb') as output:
+        subprocess.run(command, stdin=f, stdout=output, stderr=subprocess.DEVNULL)
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpoint and resume test")
+    parser.add_argument("--interpret", default=os.path.join(ROOT, 'interpret.py'))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--programs", type=int, default=10)
+    parser.add_argument("--size", type=int, default=3000, help="--size of the generated programs")
+    parser.add_argument("--every", type=int, default=2000, help="--checkpoint-every of the interrupted runs")
+    parser.add_argument("--kills", type=int, default=5, help="number of kills of every interrupted run")
+    parser.add_argument("--writes", type=int, default=200000, help="iterations of the heavy output case")
+    parser.add_argument("--writes-every", type=int, default=5000, help="--checkpoint-every of the heavy output case")
+    arguments = parser.parse_args()
+
+    mismatches = 0
+    print('%-6s %10s %10s %4s %s' % ('seed', 'lines', 'time [s]', 'rc', 'result'))
+    with tempfile.TemporaryDirectory() as tmp:
+        source, inputFile = os.path.join(tmp, 'program.xml'), os.path.join(tmp, 'program.in')
+        checkpointFile = os.path.join(tmp, 'program.ckpt')
+        for seed in range(arguments.seed, arguments.seed + arguments.programs):
+            code, inputText = Generator(seed, arguments.size).generate()
+            with open(source, 'w') as f:
+                f.write(toXml(code, 'IPPcode22'))
+            with open(inputFile, 'w') as f:
+                f.write(inputText)
+            command = [sys.executable, arguments.interpret, '--source=' + source]
+            output, rc, duration = uninterrupted(command, inputFile)
+            resumed, resumedRc = interrupted(command, inputFile, checkpointFile, arguments.every, arguments.kills,
+                                             duration, random.Random(seed))
+            same = (output, rc) == (resumed, resumedRc)
+            mismatches += not same
+            result = 'ok' if same else 'DIFFERS (return codes %d and %d)' % (rc, resumedRc)
+            print('%-6d %10d %10.3f %4d %s' % (seed, code.count('\n'), duration, rc, result))
+        print('%d of %d programs differ' % (mismatches, arguments.programs))
+
+        with open(source, 'w') as f:
+            f.write(toXml(heavyOutput(arguments.writes), 'IPPcode22'))
+        open(inputFile, 'w').close()
+        command = [sys.executable, arguments.interpret, '--source=' + source]
+        checkpointed = command + ['--checkpoint=' + checkpointFile, '--checkpoint-every=%d' % arguments.writes_every]
+        if os.path.exists(checkpointFile):
+            os.unlink(checkpointFile)
+        outputFile = os.path.join(tmp, 'program.out')
+        plain, saving = cpuTime(command, inputFile, outputFile), cpuTime(checkpointed, inputFile, outputFile)
+        output, rc, duration = uninterrupted(command, inputFile)
+        resumed, resumedRc = interrupted(command, inputFile, checkpointFile, arguments.writes_every,
+                                         arguments.kills, duration, random.Random(arguments.seed))
+        same = (output, rc) == (resumed, resumedRc)
+        mismatches += not same
+        print('heavy output, %d writes: %.3f s without checkpoints, %.3f s with --checkpoint-every=%d, '
+              'resumed output %s' % (arguments.writes, plain, saving, arguments.writes_every,
+                                     'same' if same else 'DIFFERS'))
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
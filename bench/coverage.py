@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Runs every program of the test suite with and without --coverage, prints the overhead of
+coverage and the per-opcode report of interpret_coverage.py for the whole suite. The suite is
+written for IPPcode23, its headers are rewritten to the language accepted by the interpret. """
+# ---------------------------------------------------------------------------
+import os, sys, time, argparse, tempfile, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def findTests(directory):
+    """ Returns paths without the extension of all tests with a .src file """
+
+    tests = []
+    for dirpath, _, names in os.walk(directory):
+        tests.extend(os.path.join(dirpath, name[:-4]) for name in names if name.endswith('.src'))
+    return sorted(tests)
+
+def prepare(tests, tmp, language):
+    """ Copies the programs with the rewritten header, returns (name, source, input) triples """
+
+    prepared = []
+    for num, test in enumerate(tests):
+        with open(test + '.src') as f:
+            program = f.read().replace('IPPcode23', language, 1)
+        source = os.path.join(tmp, '%04d_%s.xml' % (num, os.path.basename(test)))
+        with open(source, 'w') as f:
+            f.write(program)
+        prepared.append((test, source, test + '.in' if os.path.exists(test + '.in') else os.devnull))
+    return prepared
+
+def runSuite(interpret, prepared, coverageDir):
+    start = time.perf_counter()
+    for test, source, inputFile in prepared:
+        command = [sys.executable, interpret, '--source=' + source, '--input=' + inputFile]
+        if coverageDir is not None:
+            command.append('--coverage=' + os.path.join(coverageDir, os.path.basename(source) + '.json'))
+        subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Coverage of the test suite and its overhead")
+    parser.add_argument("--interpret", default=os.path.join(ROOT, 'interpret.py'))
+    parser.add_argument("--directory", default=os.path.join(ROOT, 'ipp-2023-tests', 'interpret-only'))
+    parser.add_argument("--language", default='IPPcode22')
+    parser.add_argument("--repeat", type=int, default=3, help="the best of the repeated runs is reported")
+    arguments = parser.parse_args()
+
+    tests = findTests(arguments.directory)
+    with tempfile.TemporaryDirectory() as tmp:
+        prepared = prepare(tests, tmp, arguments.language)
+        coverageDir = os.path.join(tmp, 'coverage')
+        plain, covered = [], []
+        for _ in range(arguments.repeat):
+            plain.append(runSuite(arguments.interpret, prepared, None))
+            if os.path.isdir(coverageDir):
+                for name in os.listdir(coverageDir):
+                    os.unlink(os.path.join(coverageDir, name))
+            else:
+                os.mkdir(coverageDir)
+            covered.append(runSuite(arguments.interpret, prepared, coverageDir))
+
+        coverageFiles = sorted(os.path.join(coverageDir, name) for name in os.listdir(coverageDir))
+        report = subprocess.run([sys.executable, os.path.join(ROOT, 'interpret_coverage.py'), '--missed=0'] + coverageFiles,
+                                stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+
+    print(report)
+    print('%d programs, %d with coverage data' % (len(tests), len(coverageFiles)))
+    print('without --coverage  %8.3f s' % min(plain))
+    print('with --coverage     %8.3f s (%+.1f %%)' % (min(covered), 100.0 * (min(covered) - min(plain)) / min(plain)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Compares --batch with --batch --fork-at-read on a synthetic program, which builds a table
+with DEFVAR/MOVE/CONCAT in a loop before its first READ and then does little work per input. """
+# ---------------------------------------------------------------------------
+import os, sys, time, argparse, tempfile, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def initHeavyProgram(iterations, language):
+    """ Returns XML of the program, the loop before READ runs the given number of iterations """
+
+    instructions = [
+        ('DEFVAR', [('var', 'GF@i')]),
+        ('DEFVAR', [('var', 'GF@table')]),
+        ('DEFVAR', [('var', 'GF@n')]),
+        ('MOVE', [('var', 'GF@i'), ('int', str(iterations))]),
+        ('MOVE', [('var', 'GF@table'), ('string', '')]),
+        ('WRITE', [('string', 'init\\010')]),
+        ('LABEL', [('label', 'init')]),
+        ('CONCAT', [('var', 'GF@table'), ('var', 'GF@table'), ('string', 'x')]),
+        ('SUB', [('var', 'GF@i'), ('var', 'GF@i'), ('int', '1')]),
+        ('JUMPIFNEQ', [('label', 'init'), ('var', 'GF@i'), ('int', '0')]),
+        ('READ', [('var', 'GF@n'), ('type', 'int')]),
+        ('GETCHAR', [('var', 'GF@i'), ('var', 'GF@table'), ('var', 'GF@n')]),
+        ('WRITE', [('var', 'GF@i')]),
+        ('WRITE', [('var', 'GF@n')]),
+    ]
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<program language="%s">' % language]
+    for order, (opcode, args) in enumerate(instructions, 1):
+        lines.append(' <instruction order="%d" opcode="%s">' % (order, opcode))
+        for num, (typ, text) in enumerate(args, 1):
+            lines.append('  <arg%d type="%s">%s</arg%d>' % (num, typ, text, num))
+        lines.append(' </instruction>')
+    lines.append('</program>')
+    return '\n'.join(lines) + '\n'
+
+def timeBatch(interpret, source, inputDir, outputDir, extra):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, interpret, '--source=' + source, '--batch=' + inputDir,
+                    '--batch-output=' + outputDir] + extra, check=True, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Fork server benchmark")
+    parser.add_argument("--interpret", default=os.path.join(ROOT, 'interpret.py'))
+    parser.add_argument("--iterations", type=int, default=5000, help="iterations of the initialisation loop")
+    parser.add_argument("--inputs", type=int, default=50)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--language", default='IPPcode22')
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'program.xml')
+        with open(source, 'w') as f:
+            f.write(initHeavyProgram(arguments.iterations, arguments.language))
+        inputDir = os.path.join(tmp, 'inputs')
+        os.mkdir(inputDir)
+        for i in range(arguments.inputs):
+            with open(os.path.join(inputDir, 'input%03d.in' % i), 'w') as f:
+                f.write('%d\n' % (i % arguments.iterations))
+
+        jobs = ['--jobs=%d' % arguments.jobs]
+        plain = timeBatch(arguments.interpret, source, inputDir, os.path.join(tmp, 'plain'), jobs)
+        forked = timeBatch(arguments.interpret, source, inputDir, os.path.join(tmp, 'forked'), jobs + ['--fork-at-read'])
+
+        for name in sorted(os.listdir(os.path.join(tmp, 'plain'))):
+            if name == 'summary.json':
+                continue
+            with open(os.path.join(tmp, 'plain', name)) as a, open(os.path.join(tmp, 'forked', name)) as b:
+                if a.read() != b.read():
+                    print('Results differ: %s' % name, file=sys.stderr)
+                    exit(1)
+
+    print('%d inputs, %d init iterations, %d jobs' % (arguments.inputs, arguments.iterations, arguments.jobs))
+    print('--batch                 %8.3f s' % plain)
+    print('--batch --fork-at-read  %8.3f s (%.1fx)' % (forked, plain / forked))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Compares loading of large programs from XML and from IPPcode23 text (--source-format=text).
+Programs of the given sizes jump over their body, so the wall clock time of a run is the start of
+the interpret and the loading. When php is installed, the pipeline parse.php + interpret is measured
+too; parse.php reads IPPcode21, so its header and the language of its XML are rewritten. """
+# ---------------------------------------------------------------------------
+import os, sys, shutil, argparse, tempfile
+from workloads import toXml
+from startup import wallClock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BODY = '''DEFVAR GF@a%(n)d
+MOVE GF@a%(n)d int@%(n)d
+ADD GF@a%(n)d GF@a%(n)d int@-1
+CONCAT GF@s GF@s string@x\\032%(n)d
+JUMPIFEQ skip%(n)d GF@a%(n)d bool@true
+PUSHS GF@a%(n)d
+POPS GF@a%(n)d
+LABEL skip%(n)d
+WRITE GF@a%(n)d
+'''
+
+def program(size):
+    """ Returns IPPcode23 text with about size instructions, which executes three of them """
+
+    blocks = ['.IPPcode23', '# generated by bench/frontend.py', 'DEFVAR GF@s', 'JUMP end']
+    blocks.extend(BODY % {'n': n} for n in range(size // BODY.count('\n')))
+    blocks.append('LABEL end')
+    return '\n'.join(blocks) + '\n'
+
+def phpPipeline(interpret, source, tmp):
+    """ Returns a shell command running parse.php and the interpret on its XML """
+
+    php = os.path.join(tmp, 'php.src')
+    with open(source) as f, open(php, 'w') as g:
+        g.write(f.read().replace('.IPPcode23', '.IPPcode21', 1))
+    xml = os.path.join(tmp, 'php.xml')
+    return ['sh', '-c', 'php "$1" < "$2" | sed "s/IPPcode21/IPPcode22/" > "$3" && "$4" "$5" --source="$3"', 'sh',
+            os.path.join(ROOT, 'parse.php'), php, xml, sys.executable, interpret]
+
+def main():
+    parser = argparse.ArgumentParser(description="Text and XML front-end benchmark")
+    parser.add_argument("--interpret", default=os.path.join(ROOT, 'interpret.py'))
+    parser.add_argument("--sizes", default='1000,10000,100000', help="comma separated numbers of instructions")
+    parser.add_argument("--runs", type=int, default=5)
+    arguments = parser.parse_args()
+
+    php = shutil.which('php') is not None
+    print('%10s %12s %12s %12s %9s' % ('size', 'php+xml [s]', 'xml [s]', 'text [s]', 'xml/text'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in map(int, arguments.sizes.split(',')):
+            code = program(size)
+            source = os.path.join(tmp, 'program.src')
+            with open(source, 'w') as f:
+                f.write(code)
+            xml = os.path.join(tmp, 'program.xml')
+            with open(xml, 'w') as f:
+                f.write(toXml(code, 'IPPcode22'))
+            fromXml = wallClock([sys.executable, arguments.interpret, '--source=' + xml], arguments.runs)[0]
+            fromText = wallClock([sys.executable, arguments.interpret, '--source=' + source, '--source-format=text'],
+                                 arguments.runs)[0]
+            pipeline = wallClock(phpPipeline(arguments.interpret, source, tmp), arguments.runs)[0] if php else None
+            print('%10d %12s %12.3f %12.3f %8.2fx' % (size, '%.3f' % pipeline if php else 'no php', fromXml, fromText,
+                                                     fromXml / fromText))
+
+if __name__ == "__main__":
+    main()
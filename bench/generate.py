@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Seeded generator of random valid IPPcode programs. The size in instructions (up to 10^6 and
+more), the depth of nested loops, the depth of calls, the number of variables and the mix of opcode
+families are configurable and the same seed always gives the same program. Generated programs
+always terminate without an error: every loop counts down a fixed number of iterations, functions
+only call deeper functions and integers are kept small.
+
+With --diff the programs of several seeds are run by two interprets (paths or git revisions of
+interpret.py, e.g. interpret.py and interpret_MY.py --new-language=IPPcode23) and mismatches of the
+output or the return code are reported together with the ratio of their run times. """
+# ---------------------------------------------------------------------------
+import os, sys, time, random, argparse, tempfile, subprocess
+from workloads import toXml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# weights of the opcode families used when --mix is not given; edge cases are excluded as interpret.py
+# does not follow the specification there (STRI2INT at index 0, PUSHS of a variable)
+DEFAULT_MIX = {'arith': 4, 'string': 2, 'compare': 2, 'stack': 1, 'frame': 1, 'io': 1, 'call': 1, 'edge': 0}
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+MODULUS = 1000 # integer variables are reduced to (-MODULUS, MODULUS) after each multiplication
+
+def parseMix(text):
+    """ Parses comma separated family=weight pairs, families not mentioned get the weight 0 """
+
+    mix = dict.fromkeys(DEFAULT_MIX, 0)
+    for item in text.split(','):
+        family, _, weight = item.partition('=')
+        if family not in mix:
+            raise argparse.ArgumentTypeError('unknown opcode family: %s' % family)
+        mix[family] = int(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError('all weights are zero')
+    return mix
+
+class Generator:
+    """ Generates one program. Integer, string and bool variables keep their type for the whole
+    run, so every instruction gets operands of the types it expects. """
+
+    def __init__(self, seed, size, loopDepth=2, callDepth=3, variables=8, mix=None):
+        self._random = random.Random(seed)
+        self._size = size
+        self._loopDepth = loopDepth
+        self._callDepth = callDepth
+        count = max(3, variables)
+        self._ints = ['GF@i%d' % n for n in range(count - 2 * (count // 3))]
+        self._strings = ['GF@s%d' % n for n in range(count // 3)]
+        self._bools = ['GF@b%d' % n for n in range(count // 3)]
+        mix = mix or DEFAULT_MIX
+        if not callDepth:
+            mix = dict(mix, call=0)
+        self._families = [family for family in mix if mix[family]]
+        self._weights = [mix[family] for family in self._families]
+        self._labels = 0
+        self._inputs = []
+
+    def _label(self, prefix):
+        self._labels += 1
+        return '%s%d' % (prefix, self._labels)
+
+    def _int(self):
+        return self._random.choice(self._ints)
+
+    def _intSymbol(self):
+        if self._random.random() < 0.3:
+            return 'int@%d' % self._random.randint(-50, 50)
+        return self._int()
+
+    def _string(self):
+        return self._random.choice(self._strings)
+
+    def _stringConstant(self):
+        return 'string@' + ''.join(self._random.choice(LETTERS) for _ in range(self._random.randint(1, 6)))
+
+    def _bool(self):
+        return self._random.choice(self._bools)
+
+    def _reduce(self, var):
+        """ var = var - var / MODULUS * MODULUS, keeps the integer small """
+
+        return ['IDIV GF@t %s int@%d' % (var, MODULUS), 'MUL GF@t GF@t int@%d' % MODULUS, 'SUB %s %s GF@t' % (var, var)]
+
+    def arith(self):
+        opcode = self._random.choice(('ADD', 'SUB', 'MUL', 'IDIV'))
+        target = self._int()
+        if opcode == 'IDIV':
+            divisor = self._random.choice([n for n in range(-9, 10) if n])
+            return ['IDIV %s %s int@%d' % (target, self._intSymbol(), divisor)]
+        lines = ['%s %s %s %s' % (opcode, target, self._int(), self._intSymbol())]
+        return lines + self._reduce(target)
+
+    def string(self):
+        choice = self._random.randrange(5)
+        target = self._string()
+        if choice == 0: # strings are emptied now and then, so they do not grow in loops
+            return ['MOVE %s %s' % (target, self._stringConstant())]
+        if choice == 1:
+            return ['CONCAT %s %s %s' % (target, self._string(), self._stringConstant()),
+                    'GETCHAR %s %s int@0' % (self._string(), target)]
+        if choice == 2:
+            return ['STRLEN %s %s' % (self._int(), self._string())]
+        if choice == 3:
+            constant = self._stringConstant()
+            index = self._random.randint(1, len(constant) - len('string@'))
+            return ['STRI2INT %s %s%s int@%d' % (self._int(), constant, self._random.choice(LETTERS), index)]
+        return ['INT2CHAR %s int@%d' % (target, self._random.randint(97, 122))]
+
+    def compare(self):
+        choice = self._random.randrange(4)
+        target = self._bool()
+        if choice == 0:
+            return ['%s %s %s %s' % (self._random.choice(('LT', 'GT', 'EQ')), target, self._int(), self._intSymbol())]
+        if choice == 1:
+            return ['EQ %s %s %s' % (target, self._string(), self._stringConstant())]
+        if choice == 2:
+            return ['%s %s %s %s' % (self._random.choice(('AND', 'OR')), target, self._bool(), self._bool())]
+        return ['NOT %s %s' % (target, self._bool())]
+
+    def stack(self):
+        if self._random.random() < 0.5:
+            return ['PUSHS int@%d' % self._random.randint(-50, 50), 'POPS %s' % self._int()]
+        return ['PUSHS %s' % self._stringConstant(), 'PUSHS int@%d' % self._random.randint(-50, 50),
+                'POPS %s' % self._int(), 'POPS %s' % self._string()]
+
+    def edge(self):
+        if self._random.random() < 0.5:
+            return ['STRI2INT %s %s int@0' % (self._int(), self._stringConstant())]
+        return ['PUSHS %s' % self._int(), 'POPS %s' % self._int()]
+
+    def frame(self):
+        source, target = self._int(), self._int()
+        return ['CREATEFRAME', 'DEFVAR TF@x', 'MOVE TF@x %s' % source, 'PUSHFRAME',
+                'ADD LF@x LF@x int@%d' % self._random.randint(-9, 9), 'POPFRAME', 'MOVE %s TF@x' % target]
+
+    def io(self):
+        choice = self._random.randrange(3)
+        if choice == 0: # a missing input line reads nil, which is not moved to the integer variable
+            self._inputs.append(str(self._random.randint(-99, 99)))
+            label = self._label('read')
+            return ['READ GF@r int', 'TYPE GF@rt GF@r', 'JUMPIFNEQ %s GF@rt string@int' % label,
+                    'MOVE %s GF@r' % self._int(), 'LABEL ' + label]
+        if choice == 1:
+            return ['TYPE %s %s' % (self._string(), self._random.choice(self._ints + self._strings + self._bools))]
+        return ['WRITE %s' % self._random.choice(self._ints + self._strings + self._bools), 'WRITE string@\\010']
+
+    def call(self):
+        return ['CREATEFRAME', 'DEFVAR TF@arg', 'MOVE TF@arg %s' % self._int(), 'CALL f0', 'MOVE %s TF@arg' % self._int()]
+
+    def statements(self, budget, calls=True):
+        """ Returns at least budget instructions of straight code """
+
+        lines = []
+        while len(lines) < budget:
+            family = self._random.choices(self._families, self._weights)[0]
+            if family == 'call' and not calls:
+                family = 'arith'
+            lines.extend(getattr(self, family)())
+        return lines
+
+    def loop(self, depth, budget, prefix, calls=True):
+        """ Returns a nest of depth counted loops around about budget instructions. Loops at the same
+        depth share their counter GF@<prefix><depth>, so the number of variables does not grow. """
+
+        counter, label = 'GF@%s%d' % (prefix, depth), self._label('loop')
+        body = self.loop(depth - 1, budget, prefix, calls) if depth > 1 else self.statements(budget, calls)
+        self._counters[counter] = None
+        return (['MOVE %s int@%d' % (counter, self._random.randint(2, 3)), 'LABEL ' + label] + body +
+                ['SUB %s %s int@1' % (counter, counter), 'JUMPIFNEQ %s %s int@0' % (label, counter)])
+
+    def block(self, budget, prefix='c', calls=True):
+        depth = self._random.randint(0, self._loopDepth)
+        if depth:
+            return self.loop(depth, max(1, budget // 3 ** depth), prefix, calls)
+        return self.statements(budget, calls)
+
+    def function(self, level):
+        """ Function f<level> adds a value to its argument LF@arg and calls f<level + 1> """
+
+        lines = ['LABEL f%d' % level, 'PUSHFRAME', 'ADD LF@arg LF@arg %s' % self._intSymbol()]
+        lines += self.block(8, 'f%dc' % level, calls=False) # loops of a function have their own counters
+        if level + 1 < self._callDepth:
+            lines += ['CREATEFRAME', 'DEFVAR TF@arg', 'MOVE TF@arg LF@arg', 'CALL f%d' % (level + 1),
+                      'ADD LF@arg TF@arg int@1']
+        lines += self._reduce('LF@arg')
+        return lines + ['POPFRAME', 'RETURN']
+
+    def generate(self):
+        """ Returns the program in IPPcode and the text of its input """
+
+        self._counters = {} # loop counters in the order of their first use
+        body = []
+        while len(body) < self._size:
+            body += self.block(self._random.randint(5, 40))
+        functions = [line for level in range(self._callDepth) for line in self.function(level)]
+        header = ['.IPPcode22', '# generated by bench/generate.py', 'DEFVAR GF@t', 'DEFVAR GF@r', 'DEFVAR GF@rt']
+        for var in self._ints + list(self._counters):
+            header += ['DEFVAR ' + var, 'MOVE %s int@%d' % (var, self._random.randint(-9, 9))]
+        for var in self._strings:
+            header += ['DEFVAR ' + var, 'MOVE %s %s' % (var, self._stringConstant())]
+        for var in self._bools:
+            header += ['DEFVAR ' + var, 'MOVE %s bool@%s' % (var, self._random.choice(('true', 'false')))]
+        footer = [line for var in self._ints + self._strings + self._bools for line in ('WRITE ' + var, 'WRITE string@\\010')]
+        footer += ['EXIT int@0'] + functions
+        return '\n'.join(header + body + footer) + '\n', ''.join(value + '\n' for value in self._inputs)
+
+def toText(code):
+    """ Converts the generated program to IPPcode23 read by --source-format=text """
+
+    return code.replace('.IPPcode22', '.IPPcode23', 1)
+
+def interpretPath(tmp, name, revision):
+    """ Returns the path of the interpret, a git revision is written into tmp """
+
+    if os.path.exists(revision):
+        return revision
+    path = os.path.join(tmp, 'interpret_%s.py' % name)
+    with open(path, 'wb') as f:
+        f.write(subprocess.run(['git', 'show', revision + ':interpret.py'], cwd=ROOT,
+                               stdout=subprocess.PIPE, check=True).stdout)
+    return path
+
+def run(interpret, source, inputFile):
+    """ Returns the output, return code and wall clock time of one run """
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, interpret, '--source=' + source, '--input=' + inputFile],
+                            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return result.stdout, result.returncode, time.perf_counter() - start
+
+def differential(arguments, mix):
+    """ Runs programs of seeds seed .. seed + programs - 1 by both interprets, returns the number of mismatches """
+
+    mismatches, ratios = 0, []
+    with tempfile.TemporaryDirectory() as tmp:
+        old, new = interpretPath(tmp, 'old', arguments.old), interpretPath(tmp, 'new', arguments.new)
+        print('%-10s %10s %10s %10s %8s %4s %s' % ('seed', 'lines', 'old [s]', 'new [s]', 'old/new', 'rc', 'result'))
+        for seed in range(arguments.seed, arguments.seed + arguments.programs):
+            code, inputText = Generator(seed, arguments.size, arguments.loop_depth, arguments.call_depth,
+                                        arguments.variables, mix).generate()
+            inputFile = os.path.join(tmp, 'input.in')
+            with open(inputFile, 'w') as f:
+                f.write(inputText)
+            results = []
+            for name, interpret, language in (('old', old, arguments.old_language), ('new', new, arguments.new_language)):
+                source = os.path.join(tmp, '%s.xml' % name)
+                with open(source, 'w') as f:
+                    f.write(toXml(code, language))
+                results.append(run(interpret, source, inputFile))
+            before, after = results
+            same = before[:2] == after[:2]
+            if same:
+                ratios.append(before[2] / after[2])
+            else:
+                mismatches += 1
+                if arguments.keep:
+                    os.makedirs(arguments.keep, exist_ok=True)
+                    for extension, text in (('.src', code), ('.in', inputText)):
+                        with open(os.path.join(arguments.keep, 'seed%d%s' % (seed, extension)), 'w') as f:
+                            f.write(text)
+            result = 'ok' if same else 'DIFFERS (return codes %d and %d)' % (before[1], after[1])
+            print('%-10d %10d %10.3f %10.3f %7.2fx %4d %s' % (seed, code.count('\n'), before[2], after[2],
+                                                            before[2] / after[2], after[1], result))
+    product = 1.0
+    for ratio in ratios:
+        product *= ratio
+    print('%d of %d programs differ' % (mismatches, arguments.programs), end='')
+    print(', geometric mean old/new %.2fx' % product ** (1.0 / len(ratios)) if ratios else '')
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Random IPPcode program generator")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, default=1000, help="number of instructions of the main body")
+    parser.add_argument("--loop-depth", type=int, default=2, help="maximal depth of nested loops")
+    parser.add_argument("--call-depth", type=int, default=3, help="number of functions calling each other")
+    parser.add_argument("--variables", type=int, default=8, help="number of global variables")
+    parser.add_argument("--mix", type=parseMix, help="comma separated family=weight, families: " + ','.join(DEFAULT_MIX))
+    parser.add_argument("--format", choices=('xml', 'text'), default='xml', help="format of the generated program")
+    parser.add_argument("--language", default='IPPcode22', help="language of the generated XML")
+    parser.add_argument("--output", help="write the program to the file instead of stdout")
+    parser.add_argument("--input", help="write the input of the program to the file")
+    parser.add_argument("--diff", action='store_true', help="run generated programs by two interprets and compare them")
+    parser.add_argument("--old", default='HEAD', help="git revision or path of the first interpret (default HEAD)")
+    parser.add_argument("--new", default=os.path.join(ROOT, 'interpret.py'))
+    parser.add_argument("--old-language", default='IPPcode22')
+    parser.add_argument("--new-language", default='IPPcode22')
+    parser.add_argument("--programs", type=int, default=20, help="number of programs compared by --diff")
+    parser.add_argument("--keep", help="directory for programs which differ")
+    arguments = parser.parse_args()
+
+    if arguments.diff:
+        exit(1 if differential(arguments, arguments.mix) else 0)
+    code, inputText = Generator(arguments.seed, arguments.size, arguments.loop_depth, arguments.call_depth,
+                                arguments.variables, arguments.mix).generate()
+    program = toText(code) if arguments.format == 'text' else toXml(code, arguments.language)
+    if arguments.output:
+        with open(arguments.output, 'w') as f:
+            f.write(program)
+    else:
+        sys.stdout.write(program)
+    if arguments.input:
+        with open(arguments.input, 'w') as f:
+            f.write(inputText)
+
+if __name__ == "__main__":
+    main()
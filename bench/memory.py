@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Runs large synthetic programs with every --gc mode of the interpret and prints the minimal
+CPU time of each mode and the --memstats report of the program. The programs keep many
+values alive: deep recursion with a frame per level, a deep data stack and a large loaded program
+with a loop creating strings. """
+# ---------------------------------------------------------------------------
+import os, sys, json, argparse, resource, tempfile, subprocess
+from workloads import toXml
+from recursion import frames
+import frontend
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GC_MODES = ('default', 'freeze', 'off')
+
+def cpuTime(command, runs):
+    """ Returns the minimal user and system CPU time of the command in seconds, which is less
+    disturbed by other load of the machine than the wall clock time """
+
+    times = []
+    for _ in range(runs):
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, check=True)
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        times.append(after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime)
+    return min(times)
+
+def dataStack(size):
+    """ Pushes size strings on the data stack and pops them """
+
+    return '''.IPPcode22
+DEFVAR GF@i
+DEFVAR GF@s
+MOVE GF@i int@%d
+LABEL push
+PUSHS string@value
+SUB GF@i GF@i int@1
+JUMPIFNEQ push GF@i int@0
+LABEL pop
+POPS GF@s
+ADD GF@i GF@i int@1
+JUMPIFNEQ pop GF@i int@%d
+WRITE GF@i
+''' % (size, size)
+
+def largeProgram(size):
+    """ A program of size instructions, most of them jumped over, with a loop building a string """
+
+    body = frontend.program(size).replace('.IPPcode23', '.IPPcode22', 1).replace('LABEL end', '''LABEL end
+DEFVAR GF@i
+MOVE GF@i int@20000
+MOVE GF@s string@
+LABEL loop
+CONCAT GF@s GF@s string@x
+SUB GF@i GF@i int@1
+JUMPIFNEQ loop GF@i int@0
+STRLEN GF@i GF@s
+WRITE GF@i''')
+    return body
+
+def framesWithoutBreak(size):
+    return frames(size).replace('BREAK\n', '')
+
+PROGRAMS = {'frames': (framesWithoutBreak, 20000), 'stack': (dataStack, 100000), 'large': (largeProgram, 50000)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Garbage collector modes and memory of phases")
+    parser.add_argument("--interpret", default=os.path.join(ROOT, 'interpret.py'))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the sizes of the programs")
+    parser.add_argument("--only", help="comma separated programs, all by default: " + ','.join(PROGRAMS))
+    arguments = parser.parse_args()
+
+    names = arguments.only.split(',') if arguments.only else list(PROGRAMS)
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            function, size = PROGRAMS[name]
+            size = max(1, int(size * arguments.scale))
+            source = os.path.join(tmp, name + '.xml')
+            with open(source, 'w') as f:
+                f.write(toXml(function(size), 'IPPcode22'))
+            command = [sys.executable, arguments.interpret, '--source=' + source]
+            times = {mode: cpuTime(command + ['--gc=' + mode], arguments.runs) for mode in GC_MODES}
+            report = os.path.join(tmp, name + '.json')
+            subprocess.run(command + ['--memstats=' + report], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            with open(report) as f:
+                phases = json.load(f)
+            print('%s (size %d)' % (name, size))
+            for mode in GC_MODES:
+                print('  --gc=%-8s %8.3f s  %6.2fx' % (mode, times[mode], times['default'] / times[mode]))
+            for key, value in phases.items():
+                print('  %-10s %12d B' % (key, value))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Deep recursion benchmark. Tail recursive programs (CALL followed by RETURN, or by POPFRAME and
+RETURN) are run with recursion depths of 10^5 and more by two interprets, by default the committed
+interpret.py (git show HEAD) and the one in the working tree. For every run it reports the wall
+clock time, the maximum resident set size, the peak depths of the call stack and of the frame stack
+(--peak-usage) and the executed instruction count, which the programs print by BREAK after the
+recursion, and checks that both interprets print the same output and end with the same code. The
+instruction counts differ when one of the interprets skips the RETURNs after tail calls. """
+# ---------------------------------------------------------------------------
+import os, re, sys, json, time, argparse, tempfile, subprocess
+from workloads import toXml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def countdown(depth):
+    """ Recursion without frames, the depth is kept in GF@n """
+
+    return '''.IPPcode22
+DEFVAR GF@n
+MOVE GF@n int@%d
+CALL down
+BREAK
+WRITE GF@n
+EXIT int@0
+LABEL down
+JUMPIFEQ bottom GF@n int@0
+SUB GF@n GF@n int@1
+CALL down
+RETURN
+LABEL bottom
+RETURN
+''' % depth
+
+def frames(depth):
+    """ Recursion with the argument passed in a frame, every level pushes and pops its frame """
+
+    return '''.IPPcode22
+DEFVAR GF@sum
+MOVE GF@sum int@0
+CREATEFRAME
+DEFVAR TF@n
+MOVE TF@n int@%d
+CALL down
+BREAK
+WRITE GF@sum
+EXIT int@0
+LABEL down
+PUSHFRAME
+ADD GF@sum GF@sum LF@n
+JUMPIFEQ bottom LF@n int@0
+CREATEFRAME
+DEFVAR TF@n
+SUB TF@n LF@n int@1
+CALL down
+POPFRAME
+RETURN
+LABEL bottom
+POPFRAME
+RETURN
+''' % depth
+
+def mutual(depth):
+    """ Two functions calling each other in tail position with the argument in a frame """
+
+    return '''.IPPcode22
+DEFVAR GF@sum
+MOVE GF@sum int@0
+CREATEFRAME
+DEFVAR TF@n
+MOVE TF@n int@%d
+CALL even
+BREAK
+WRITE GF@sum
+EXIT int@0
+LABEL even
+PUSHFRAME
+ADD GF@sum GF@sum LF@n
+JUMPIFEQ evenBottom LF@n int@0
+CREATEFRAME
+DEFVAR TF@n
+SUB TF@n LF@n int@1
+CALL odd
+POPFRAME
+RETURN
+LABEL evenBottom
+POPFRAME
+RETURN
+LABEL odd
+PUSHFRAME
+SUB GF@sum GF@sum LF@n
+JUMPIFEQ oddBottom LF@n int@0
+CREATEFRAME
+DEFVAR TF@n
+SUB TF@n LF@n int@1
+CALL even
+POPFRAME
+RETURN
+LABEL oddBottom
+POPFRAME
+RETURN
+''' % depth
+
+PROGRAMS = {'countdown': countdown, 'frames': frames, 'mutual': mutual}
+
+def run(interpret, source):
+    """ Returns the output, return code, wall clock time, max RSS in KiB, executed instructions and
+    the peak depths of the call stack and of the frame stack """
+
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, interpret, '--source=' + source, '--input=' + os.devnull,
+                                    '--peak-usage'], stdout=stdout, stderr=stderr)
+        _, status, usage = os.wait4(process.pid, 0) # reaps the child, its resource usage is kept
+        spent = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stdout.seek(0)
+        stderr.seek(0)
+        output, errors = stdout.read(), stderr.read()
+    count = re.search(br'executed instructions: (\d+)', errors)
+    depths = re.search(br'call depth (\d+), frame depth (\d+)', errors)
+    return (output, process.returncode, spent, usage.ru_maxrss, int(count.group(1)) if count else None,
+            int(depths.group(1)) if depths else None, int(depths.group(2)) if depths else None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Deep recursion benchmark")
+    parser.add_argument("--old", default='HEAD', help="git revision of the old interpret.py or a path (default HEAD)")
+    parser.add_argument("--new", default=os.path.join(ROOT, 'interpret.py'))
+    parser.add_argument("--depths", default='100000,300000,1000000', help="comma separated recursion depths")
+    parser.add_argument("--only", help="comma separated programs, all by default: " + ','.join(PROGRAMS))
+    parser.add_argument("--json", help="write the results to the file")
+    arguments = parser.parse_args()
+
+    names = arguments.only.split(',') if arguments.only else list(PROGRAMS)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        old = arguments.old
+        if not os.path.exists(old):
+            old = os.path.join(tmp, 'interpret_old.py')
+            with open(old, 'wb') as f:
+                f.write(subprocess.run(['git', 'show', arguments.old + ':interpret.py'], cwd=ROOT,
+                                       stdout=subprocess.PIPE, check=True).stdout)
+        print('%-10s %8s %12s %12s %10s %10s %10s %10s %15s %15s %s' % (
+            'Program', 'depth', 'old instrs', 'new instrs', 'old [s]', 'new [s]', 'old [MiB]', 'new [MiB]',
+            'old calls/frms', 'new calls/frms', 'result'))
+        for name in names:
+            for depth in map(int, arguments.depths.split(',')):
+                source = os.path.join(tmp, '%s_%d.xml' % (name, depth))
+                with open(source, 'w') as f:
+                    f.write(toXml(PROGRAMS[name](depth), 'IPPcode22'))
+                before = run(old, source)
+                after = run(arguments.new, source)
+                same = before[0] == after[0] and before[1] == after[1]
+                print('%-10s %8d %12s %12s %10.3f %10.3f %10.1f %10.1f %15s %15s %s' % (
+                    name, depth, before[4], after[4], before[2], after[2], before[3] / 1024, after[3] / 1024,
+                    '%s/%s' % before[5:7], '%s/%s' % after[5:7], 'ok' if same else 'DIFFERS'))
+                results.append({'program': name, 'depth': depth, 'same': same,
+                                'old': {'time': before[2], 'maxrss': before[3], 'returnCode': before[1], 'instructions': before[4],
+                                        'callDepth': before[5], 'frameDepth': before[6]},
+                                'new': {'time': after[2], 'maxrss': after[3], 'returnCode': after[1], 'instructions': after[4],
+                                        'callDepth': after[5], 'frameDepth': after[6]}})
+    if arguments.json:
+        with open(arguments.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Runner of the benchmark suite (workloads.py). Every workload is run by the interpret after
+warm-up runs several times, the report shows the median wall clock time and executed instructions
+per second. Instructions are counted once by interpret.py --profile and the output of every run is
+checked against the output of interpret.py, so different interprets (e.g. interpret_MY.py with
+--language=IPPcode23) are measured on the same work. Results are written by --json and two result
+files are compared by --compare. """
+# ---------------------------------------------------------------------------
+import os, sys, json, time, hashlib, platform, argparse, tempfile, subprocess
+from workloads import WORKLOADS, toXml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REFERENCE = os.path.join(ROOT, 'interpret.py')
+
+def runOnce(interpret, source, inputFile, extra=()):
+    """ Returns the return code, stdout and wall clock time of one run """
+
+    start = time.perf_counter()
+    with open(inputFile) as f:
+        result = subprocess.run([sys.executable, interpret, '--source=' + source] + list(extra), stdin=f,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return result.returncode, result.stdout, time.perf_counter() - start
+
+def reference(tmp, code, inputFile):
+    """ Returns the number of executed instructions and the output of interpret.py """
+
+    source = os.path.join(tmp, 'reference.xml')
+    with open(source, 'w') as f:
+        f.write(toXml(code, 'IPPcode22'))
+    profile = os.path.join(tmp, 'profile.json')
+    _, stdout, _ = runOnce(REFERENCE, source, inputFile, ['--profile=' + profile])
+    with open(profile) as f:
+        return json.load(f)['instructions'], stdout
+
+def benchmark(arguments, name, tmp):
+    function, kind, size = WORKLOADS[name]
+    size = max(1, int(size * arguments.scale))
+    code, inputText = function(size)
+    inputFile = os.path.join(tmp, name + '.in')
+    with open(inputFile, 'w') as f:
+        f.write(inputText)
+    source = os.path.join(tmp, name + '.xml')
+    with open(source, 'w') as f:
+        f.write(toXml(code, arguments.language))
+    instructions, expected = reference(tmp, code, inputFile)
+
+    for _ in range(arguments.warmup):
+        runOnce(arguments.interpret, source, inputFile)
+    times, rcs, matches = [], set(), True
+    for _ in range(arguments.repeat):
+        rc, stdout, spent = runOnce(arguments.interpret, source, inputFile)
+        times.append(spent)
+        rcs.add(rc)
+        matches = matches and stdout == expected
+    median = sorted(times)[len(times) // 2]
+    return {
+        'kind': kind,
+        'size': size,
+        'instructions': instructions,
+        'times': times,
+        'median': median,
+        'min': min(times),
+        'instructionsPerSecond': instructions / median,
+        'returnCodes': sorted(rcs),
+        'outputMatches': matches,
+    }
+
+def fileHash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def runSuite(arguments):
+    names = arguments.only.split(',') if arguments.only else list(WORKLOADS)
+    unknown = [name for name in names if name not in WORKLOADS]
+    if unknown:
+        print('Unknown workload: %s' % unknown[0], file=sys.stderr)
+        exit(1)
+    results = {
+        'interpret': os.path.abspath(arguments.interpret),
+        'sha256': fileHash(arguments.interpret),
+        'language': arguments.language,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': arguments.scale,
+        'warmup': arguments.warmup,
+        'repeat': arguments.repeat,
+        'workloads': {},
+    }
+    print('%-12s %-6s %12s %10s %14s %s' % ('Workload', 'kind', 'instructions', 'median [s]', 'instructions/s', 'output'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            result = benchmark(arguments, name, tmp)
+            results['workloads'][name] = result
+            print('%-12s %-6s %12d %10.3f %14.0f %s' % (name, result['kind'], result['instructions'], result['median'],
+                                                      result['instructionsPerSecond'], 'ok' if result['outputMatches'] else 'DIFFERS'))
+    if arguments.json:
+        with open(arguments.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+def compare(oldFile, newFile):
+    """ Prints the speedup of the new results against the old ones for workloads in both files """
+
+    with open(oldFile) as f:
+        old = json.load(f)
+    with open(newFile) as f:
+        new = json.load(f)
+    print('old: %s (%s)' % (old['interpret'], old['sha256'][:12]))
+    print('new: %s (%s)' % (new['interpret'], new['sha256'][:12]))
+    print('%-12s %12s %12s %9s %s' % ('Workload', 'old [s]', 'new [s]', 'speedup', 'output'))
+    speedups = {}
+    for name, newResult in new['workloads'].items():
+        oldResult = old['workloads'].get(name)
+        if oldResult is None or oldResult['size'] != newResult['size']:
+            continue
+        speedup = oldResult['median'] / newResult['median']
+        speedups.setdefault(newResult['kind'], []).append(speedup)
+        output = 'ok' if oldResult['outputMatches'] and newResult['outputMatches'] else 'DIFFERS'
+        print('%-12s %12.3f %12.3f %8.2fx %s' % (name, oldResult['median'], newResult['median'], speedup, output))
+    for kind, values in sorted(speedups.items()):
+        product = 1.0
+        for value in values:
+            product *= value
+        print('geometric mean %-6s %8.2fx' % (kind, product ** (1.0 / len(values))))
+
+def main():
+    parser = argparse.ArgumentParser(description="IPPcode benchmark suite")
+    parser.add_argument("--interpret", default=REFERENCE)
+    parser.add_argument("--language", default='IPPcode22', help="language in the header of the programs")
+    parser.add_argument("--only", help="comma separated workloads, all by default: " + ','.join(WORKLOADS))
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the sizes of the workloads")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write the results to the file")
+    parser.add_argument("--compare", nargs=2, metavar=('OLD', 'NEW'), help="compare two result files and exit")
+    arguments = parser.parse_args()
+    if arguments.compare:
+        compare(*arguments.compare)
+    else:
+        runSuite(arguments)
+
+if __name__ == "__main__":
+    main()
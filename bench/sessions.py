@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Load test of interactive sessions. Every simulated user sends a number, waits for the answer
+(a sum computed by a loop of that many iterations), thinks for a while and sends the next one.
+The same sessions are served by interpret_async.py, one process for all of them, and by one
+interpret.py process per session. For both models it reports the wall clock time, the CPU time
+of the interprets, the memory, the latency of answers and the number of sessions per core, i.e.
+how many such sessions one core keeps going (sessions * wall time / CPU time). """
+# ---------------------------------------------------------------------------
+import os, sys, time, random, signal, asyncio, argparse, resource, tempfile, subprocess
+from workloads import toXml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROGRAM = '''.IPPcode22
+DEFVAR GF@n
+DEFVAR GF@t
+DEFVAR GF@s
+DEFVAR GF@i
+LABEL next
+READ GF@n int
+TYPE GF@t GF@n
+JUMPIFEQ end GF@t string@nil
+MOVE GF@s int@0
+MOVE GF@i GF@n
+LABEL loop
+ADD GF@s GF@s GF@i
+SUB GF@i GF@i int@1
+JUMPIFNEQ loop GF@i int@0
+WRITE GF@s
+WRITE string@\\010
+JUMP next
+LABEL end
+'''
+
+async def user(seed, connect, arguments, latencies):
+    """ One session, its requests are random numbers of iterations """
+
+    generator = random.Random(seed)
+    reader, writer = await connect()
+    for _ in range(arguments.rounds):
+        await asyncio.sleep(generator.uniform(0, 2 * arguments.think))
+        n = generator.randint(1, 2 * arguments.work)
+        start = time.perf_counter()
+        writer.write(b'%d\n' % n)
+        await writer.drain()
+        answer = await reader.readline()
+        latencies.append(time.perf_counter() - start)
+        if int(answer) != n * (n + 1) // 2:
+            raise ValueError('wrong answer %r for %d' % (answer, n))
+    writer.write_eof()
+    await reader.read()
+    writer.close()
+
+async def runUsers(connect, arguments):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(user(seed, connect, arguments, latencies) for seed in range(arguments.sessions)))
+    return time.perf_counter() - start, sorted(latencies)
+
+def asyncModel(arguments, source, tmp):
+    """ All sessions served by one interpret_async.py, returns wall time, CPU time, memory and latencies """
+
+    socketPath = os.path.join(tmp, 'sessions.sock')
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'interpret_async.py'), '--source=' + source,
+                               '--socket=' + socketPath, '--slice=%d' % arguments.slice])
+    while not os.path.exists(socketPath):
+        if server.poll() is not None:
+            raise RuntimeError('interpret_async.py failed')
+        time.sleep(0.01)
+    connect = lambda: asyncio.open_unix_connection(socketPath, limit=1 << 20)
+    try:
+        wall, latencies = asyncio.run(runUsers(connect, arguments))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        _, _, usage = os.wait4(server.pid, 0)
+        server.returncode = 0
+    return wall, usage.ru_utime + usage.ru_stime, usage.ru_maxrss, latencies
+
+def processModel(arguments, source):
+    """ A process of interpret.py for every session """
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    processes = []
+
+    async def connect():
+        process = await asyncio.create_subprocess_exec(sys.executable, os.path.join(ROOT, 'interpret.py'),
+                                                       '--source=' + source, stdin=subprocess.PIPE,
+                                                       stdout=subprocess.PIPE)
+        processes.append(process)
+        return process.stdout, process.stdin
+
+    async def run():
+        result = await runUsers(connect, arguments)
+        for process in processes:
+            await process.wait()
+        return result
+
+    wall, latencies = asyncio.run(run())
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime
+    # every process takes about the largest resident set of a child
+    return wall, cpu, after.ru_maxrss * arguments.sessions, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Interactive sessions load test")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5, help="requests of every session")
+    parser.add_argument("--work", type=int, default=200, help="mean number of loop iterations of a request")
+    parser.add_argument("--think", type=float, default=0.5, help="mean time in seconds between requests")
+    parser.add_argument("--slice", type=int, default=1000, help="--slice of interpret_async.py")
+    parser.add_argument("--only", choices=('async', 'process'), help="run only one of the models")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'program.xml')
+        with open(source, 'w') as f:
+            f.write(toXml(PROGRAM, 'IPPcode22'))
+        results = {}
+        if arguments.only != 'process':
+            results['async'] = asyncModel(arguments, source, tmp)
+        if arguments.only != 'async':
+            results['process'] = processModel(arguments, source)
+
+    print('%d sessions, %d requests each, %d iterations and %.2f s think time on average' %
+          (arguments.sessions, arguments.rounds, arguments.work, arguments.think))
+    print('%-8s %9s %9s %12s %10s %10s %17s' % ('model', 'wall [s]', 'CPU [s]', 'memory [MiB]', 'p50 [ms]',
+                                               'p99 [ms]', 'sessions per core'))
+    for model, (wall, cpu, maxrss, latencies) in results.items():
+        p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+        print('%-8s %9.2f %9.2f %12.1f %10.1f %10.1f %17.0f' % (model, wall, cpu, maxrss / 1024, p50 * 1000,
+                                                              p99 * 1000, arguments.sessions * wall / cpu))
+
+if __name__ == "__main__":
+    main()
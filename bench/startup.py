@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Measures the start of the interpret on the both/no-instructions test, which is an empty
+program. It reports the wall clock time of whole runs compared with a bare Python start and the
+slowest imports from python -X importtime. With --json the results are written to a file. """
+# ---------------------------------------------------------------------------
+import os, sys, json, time, argparse, tempfile, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# XML written by the parser for both/no-instructions.src, with the language accepted by the interpret
+EMPTY_PROGRAM = '<?xml version="1.0" encoding="UTF-8"?>\n<program language="IPPcode22"/>\n'
+
+def wallClock(command, runs):
+    """ Returns the median and the minimum of the wall clock time of the command in seconds """
+
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2], times[0]
+
+def importTimes(command):
+    """ Returns cumulative import times in microseconds of top level imports of the command """
+
+    stderr = subprocess.run([command[0], '-X', 'importtime'] + command[1:], stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True).stderr
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '): # nested imports are included in the cumulative time
+            imports[name.strip()] = int(cumulative)
+    return imports
+
+def main():
+    parser = argparse.ArgumentParser(description="Interpret startup benchmark")
+    parser.add_argument("--interpret", default=os.path.join(ROOT, 'interpret.py'))
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--top", type=int, default=10, help="number of slowest imports shown")
+    parser.add_argument("--json", help="write the results to the file")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'no-instructions.xml')
+        with open(source, 'w') as f:
+            f.write(EMPTY_PROGRAM)
+        command = [sys.executable, arguments.interpret, '--source=' + source]
+        python = wallClock([sys.executable, '-c', 'pass'], arguments.runs)
+        interpret = wallClock(command, arguments.runs)
+        imports = importTimes(command)
+
+    slowest = sorted(imports.items(), key=lambda item: -item[1])[:arguments.top]
+    print('python -c pass         %7.1f ms median, %7.1f ms min' % (python[0] * 1000, python[1] * 1000))
+    print('no-instructions        %7.1f ms median, %7.1f ms min' % (interpret[0] * 1000, interpret[1] * 1000))
+    print('')
+    print('%-40s %10s' % ('Import', 'time [ms]'))
+    for name, micros in slowest:
+        print('%-40s %10.2f' % (name, micros / 1000))
+    if arguments.json:
+        with open(arguments.json, 'w') as f:
+            json.dump({'python': {'median': python[0], 'min': python[1]},
+                       'noInstructions': {'median': interpret[0], 'min': interpret[1]},
+                       'imports': dict(slowest)}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
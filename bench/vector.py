@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Compares interpret_vector.py with interpret.py --batch --jobs=1 on a synthetic arithmetic
+loop. Every input holds the number of iterations, inputs with the same count stay in lock-step,
+a few differing counts show the cost of instances split off to the scalar interpret. """
+# ---------------------------------------------------------------------------
+import os, sys, time, argparse, tempfile, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def arithmeticProgram(language):
+    """ Returns XML of the program, it reads n and sums a small expression in a loop n times """
+
+    instructions = [
+        ('DEFVAR', [('var', 'GF@n')]),
+        ('DEFVAR', [('var', 'GF@s')]),
+        ('DEFVAR', [('var', 'GF@t')]),
+        ('DEFVAR', [('var', 'GF@b')]),
+        ('READ', [('var', 'GF@n'), ('type', 'int')]),
+        ('MOVE', [('var', 'GF@s'), ('int', '0')]),
+        ('LABEL', [('label', 'loop')]),
+        ('ADD', [('var', 'GF@s'), ('var', 'GF@s'), ('var', 'GF@n')]),
+        ('IDIV', [('var', 'GF@t'), ('var', 'GF@s'), ('int', '3')]),
+        ('MUL', [('var', 'GF@t'), ('var', 'GF@t'), ('int', '7')]),
+        ('LT', [('var', 'GF@b'), ('var', 'GF@t'), ('var', 'GF@s')]),
+        ('NOT', [('var', 'GF@b'), ('var', 'GF@b')]),
+        ('SUB', [('var', 'GF@n'), ('var', 'GF@n'), ('int', '1')]),
+        ('JUMPIFNEQ', [('label', 'loop'), ('var', 'GF@n'), ('int', '0')]),
+        ('WRITE', [('var', 'GF@s')]),
+        ('WRITE', [('var', 'GF@b')]),
+        ('WRITE', [('var', 'GF@t')]),
+    ]
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<program language="%s">' % language]
+    for order, (opcode, args) in enumerate(instructions, 1):
+        lines.append(' <instruction order="%d" opcode="%s">' % (order, opcode))
+        for num, (typ, text) in enumerate(args, 1):
+            lines.append('  <arg%d type="%s">%s</arg%d>' % (num, typ, text, num))
+        lines.append(' </instruction>')
+    lines.append('</program>')
+    return '\n'.join(lines) + '\n'
+
+def timeRun(command):
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + command, check=True, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Lock-step engine benchmark")
+    parser.add_argument("--interpret", default=os.path.join(ROOT, 'interpret.py'))
+    parser.add_argument("--vector", default=os.path.join(ROOT, 'interpret_vector.py'))
+    parser.add_argument("--iterations", type=int, default=200, help="iterations of the loop for most inputs")
+    parser.add_argument("--inputs", type=int, default=200)
+    parser.add_argument("--divergent", type=int, default=5, help="inputs with a different number of iterations")
+    parser.add_argument("--language", default='IPPcode22')
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'program.xml')
+        with open(source, 'w') as f:
+            f.write(arithmeticProgram(arguments.language))
+        inputDir = os.path.join(tmp, 'inputs')
+        os.mkdir(inputDir)
+        for i in range(arguments.inputs):
+            iterations = arguments.iterations if i >= arguments.divergent else i + 1
+            with open(os.path.join(inputDir, 'input%04d.in' % i), 'w') as f:
+                f.write('%d\n' % iterations)
+
+        scalar = timeRun([arguments.interpret, '--source=' + source, '--batch=' + inputDir,
+                          '--batch-output=' + os.path.join(tmp, 'scalar'), '--jobs=1'])
+        vector = timeRun([arguments.vector, '--source=' + source, '--batch=' + inputDir,
+                          '--batch-output=' + os.path.join(tmp, 'vector')])
+
+        for name in sorted(os.listdir(os.path.join(tmp, 'scalar'))):
+            if name == 'summary.json':
+                continue
+            with open(os.path.join(tmp, 'scalar', name)) as a, open(os.path.join(tmp, 'vector', name)) as b:
+                if a.read() != b.read():
+                    print('Results differ: %s' % name, file=sys.stderr)
+                    exit(1)
+
+    print('%d inputs (%d divergent), %d iterations' % (arguments.inputs, arguments.divergent, arguments.iterations))
+    print('interpret.py --batch --jobs=1  %8.3f s' % scalar)
+    print('interpret_vector.py            %8.3f s (%.1fx)' % (vector, scalar / vector))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Workloads of the benchmark suite. Every workload is a function of the size, which returns
+the program in IPPcode and the text of its input. Programs are converted to the XML read by the
+interpret by toXml(), a small assembler of IPPcode, so no parser is needed to run the suite. """
+# ---------------------------------------------------------------------------
+from xml.sax.saxutils import escape
+
+LABEL_OPCODES = ('LABEL', 'JUMP', 'CALL', 'JUMPIFEQ', 'JUMPIFNEQ')
+
+def toXml(code, language):
+    """ Converts IPPcode to XML, the header line is replaced by the given language """
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<program language="%s">' % language]
+    order = 0
+    for line in code.splitlines():
+        line = line.split()
+        if not line or line[0].startswith(('.', '#')): # header and comments
+            continue
+        order += 1
+        opcode = line[0].upper()
+        lines.append(' <instruction order="%d" opcode="%s">' % (order, opcode))
+        for num, operand in enumerate(line[1:], 1):
+            if num == 1 and opcode in LABEL_OPCODES:
+                typ, text = 'label', operand
+            elif num == 2 and opcode == 'READ':
+                typ, text = 'type', operand
+            else:
+                typ, _, text = operand.partition('@')
+                if typ in ('GF', 'LF', 'TF'):
+                    typ, text = 'var', operand
+            lines.append('  <arg%d type="%s">%s</arg%d>' % (num, typ, escape(text), num))
+        lines.append(' </instruction>')
+    lines.append('</program>')
+    return '\n'.join(lines) + '\n'
+
+#### micro-benchmarks, one family of opcodes each ####
+def arithmetic(size):
+    return '''.IPPcode22
+DEFVAR GF@i
+DEFVAR GF@a
+DEFVAR GF@b
+DEFVAR GF@c
+MOVE GF@i int@%d
+MOVE GF@a int@7
+LABEL loop
+ADD GF@a GF@a int@13
+MUL GF@b GF@a int@3
+IDIV GF@b GF@b int@7
+SUB GF@a GF@b GF@i
+LT GF@c GF@a int@0
+GT GF@c GF@a GF@b
+AND GF@c GF@c bool@true
+OR GF@c GF@c bool@false
+NOT GF@c GF@c
+EQ GF@c GF@a GF@b
+SUB GF@i GF@i int@1
+JUMPIFNEQ loop GF@i int@0
+WRITE GF@a
+''' % size, ''
+
+def string(size):
+    return '''.IPPcode22
+DEFVAR GF@i
+DEFVAR GF@s
+DEFVAR GF@t
+DEFVAR GF@c
+DEFVAR GF@k
+DEFVAR GF@n
+MOVE GF@i int@%d
+MOVE GF@s string@abc\\032def
+LABEL loop
+CONCAT GF@t GF@s string@xyz
+STRLEN GF@n GF@t
+GETCHAR GF@c GF@t int@4
+SETCHAR GF@t int@0 GF@c
+STRI2INT GF@k GF@t int@1
+INT2CHAR GF@c GF@k
+TYPE GF@c GF@k
+SUB GF@i GF@i int@1
+JUMPIFNEQ loop GF@i int@0
+WRITE GF@t
+WRITE GF@n
+''' % size, ''
+
+def frames(size):
+    return '''.IPPcode22
+DEFVAR GF@i
+DEFVAR GF@r
+MOVE GF@i int@%d
+MOVE GF@r int@0
+LABEL loop
+CREATEFRAME
+DEFVAR TF@x
+MOVE TF@x GF@i
+CALL inc
+SUB GF@i GF@i int@1
+JUMPIFNEQ loop GF@i int@0
+WRITE GF@r
+EXIT int@0
+LABEL inc
+PUSHFRAME
+DEFVAR LF@y
+ADD LF@y LF@x GF@r
+IDIV LF@y LF@y int@2
+MOVE GF@r LF@y
+POPFRAME
+RETURN
+''' % size, ''
+
+def stack(size):
+    return '''.IPPcode22
+DEFVAR GF@i
+DEFVAR GF@a
+DEFVAR GF@b
+DEFVAR GF@c
+MOVE GF@i int@%d
+LABEL loop
+PUSHS int@1
+PUSHS string@ab
+PUSHS bool@true
+PUSHS nil@nil
+POPS GF@a
+POPS GF@b
+POPS GF@c
+POPS GF@a
+SUB GF@i GF@i int@1
+JUMPIFNEQ loop GF@i int@0
+WRITE GF@a
+WRITE GF@c
+''' % size, ''
+
+def io(size):
+    return '''.IPPcode22
+DEFVAR GF@x
+DEFVAR GF@t
+DEFVAR GF@sum
+MOVE GF@sum int@0
+LABEL loop
+READ GF@x int
+TYPE GF@t GF@x
+JUMPIFEQ end GF@t string@nil
+ADD GF@sum GF@sum GF@x
+WRITE GF@x
+WRITE string@\\010
+JUMP loop
+LABEL end
+WRITE GF@sum
+''', ''.join('%d\n' % (i * 7919 % 1000) for i in range(size))
+
+#### macro-benchmarks ####
+def recursion(size):
+    """ Recursive Fibonacci numbers, arguments are passed in frames and results in GF@ret """
+
+    return '''.IPPcode22
+DEFVAR GF@ret
+DEFVAR GF@k
+MOVE GF@k int@0
+LABEL loop
+CREATEFRAME
+DEFVAR TF@n
+MOVE TF@n GF@k
+CALL fib
+WRITE GF@ret
+WRITE string@\\010
+ADD GF@k GF@k int@1
+JUMPIFNEQ loop GF@k int@%d
+EXIT int@0
+LABEL fib
+PUSHFRAME
+DEFVAR LF@small
+DEFVAR LF@a
+LT LF@small LF@n int@2
+JUMPIFEQ base LF@small bool@true
+CREATEFRAME
+DEFVAR TF@n
+SUB TF@n LF@n int@1
+CALL fib
+MOVE LF@a GF@ret
+CREATEFRAME
+DEFVAR TF@n
+SUB TF@n LF@n int@2
+CALL fib
+ADD GF@ret GF@ret LF@a
+POPFRAME
+RETURN
+LABEL base
+MOVE GF@ret LF@n
+POPFRAME
+RETURN
+''' % (size + 1), ''
+
+# numbers of koule are fixed point with three decimal places, the interpret has no floats
+KOULE_SPHERES = ((-5000, -3000, 6000, 3000), (-1000, 1000, 10000, 5000), (5000, -3000, 20000, 8000))
+
+def koule(size):
+    """ Translation of ipp-2023-tests/koule/koule.ifj19.py, a ray tracer of three spheres. Numbers
+    are fixed point (1.0 is 1000), the square root is the same Newton iteration as yiplus1. The
+    picture has size columns and size * 6 / 7 rows, at least 7 columns. """
+
+    resx = max(size, 7)
+    resy = resx * 6 // 7
+    spheres = []
+    for n, (x, y, z, r) in enumerate(KOULE_SPHERES):
+        spheres.append('''JUMPIFNEQ sphere%(next)d GF@n int@%(n)d
+MOVE GF@sx int@%(x)d
+MOVE GF@sy int@%(y)d
+MOVE GF@sz int@%(z)d
+MOVE GF@sr int@%(r)d
+JUMP trace
+LABEL sphere%(next)d''' % {'n': n, 'next': n + 1, 'x': x, 'y': y, 'z': z, 'r': r})
+    variables = ('x y line n z pixel sx sy sz sr sr2 rx ry rz ocx ocy ocz a b c d t tmp tmp2 ix iy iz '
+                 'nx ny nz lx ly lz lightness in arg ret delta yi yip1 lo hi').split()
+    return '''.IPPcode22
+%(defvars)s
+WRITE string@ifj-raytracer,\\032vykresli\\0323\\032koule\\010
+CALL print_line
+MOVE GF@y int@3
+LABEL row
+MOVE GF@line string@|
+MOVE GF@x int@0
+LABEL column
+# ray from (0, 0, -20) to the target in the plane z = 0
+MUL GF@tmp GF@x int@2000
+IDIV GF@tmp GF@tmp int@%(resx)d
+SUB GF@rx int@1000 GF@tmp
+MUL GF@rx GF@rx int@7
+MUL GF@tmp GF@y int@2000
+IDIV GF@tmp GF@tmp int@%(resy)d
+SUB GF@ry int@1000 GF@tmp
+MUL GF@ry GF@ry int@5
+MOVE GF@rz int@20000
+MOVE GF@n int@0
+MOVE GF@z int@9999000
+MOVE GF@pixel string@\\032
+LABEL sphere
+%(spheres)s
+LABEL trace
+MUL GF@sr2 GF@sr GF@sr
+IDIV GF@sr2 GF@sr2 int@1000
+SUB GF@ocx int@0 GF@sx
+SUB GF@ocy int@0 GF@sy
+SUB GF@ocz int@-20000 GF@sz
+MUL GF@a GF@rx GF@rx
+MUL GF@tmp GF@ry GF@ry
+ADD GF@a GF@a GF@tmp
+MUL GF@tmp GF@rz GF@rz
+ADD GF@a GF@a GF@tmp
+IDIV GF@a GF@a int@1000
+MUL GF@b GF@rx GF@ocx
+MUL GF@tmp GF@ry GF@ocy
+ADD GF@b GF@b GF@tmp
+MUL GF@tmp GF@rz GF@ocz
+ADD GF@b GF@b GF@tmp
+IDIV GF@b GF@b int@500
+MUL GF@c GF@ocx GF@ocx
+MUL GF@tmp GF@ocy GF@ocy
+ADD GF@c GF@c GF@tmp
+MUL GF@tmp GF@ocz GF@ocz
+ADD GF@c GF@c GF@tmp
+IDIV GF@c GF@c int@1000
+SUB GF@c GF@c GF@sr2
+MUL GF@d GF@b GF@b
+MUL GF@tmp GF@a GF@c
+MUL GF@tmp GF@tmp int@4
+SUB GF@d GF@d GF@tmp
+IDIV GF@d GF@d int@1000
+GT GF@in GF@d int@0
+JUMPIFNEQ next GF@in bool@true
+MOVE GF@arg GF@d
+CALL sqrt
+SUB GF@t int@0 GF@b
+SUB GF@t GF@t GF@ret
+MUL GF@t GF@t int@500
+IDIV GF@t GF@t GF@a
+MOVE GF@lo int@0
+MOVE GF@hi GF@z
+CALL is_in_range
+JUMPIFEQ next GF@in bool@false
+MOVE GF@z GF@t
+MUL GF@ix GF@rx GF@t
+IDIV GF@ix GF@ix int@1000
+MUL GF@iy GF@ry GF@t
+IDIV GF@iy GF@iy int@1000
+MUL GF@iz GF@rz GF@t
+IDIV GF@iz GF@iz int@1000
+SUB GF@iz GF@iz int@20000
+SUB GF@nx GF@ix GF@sx
+MUL GF@nx GF@nx int@1000
+IDIV GF@nx GF@nx GF@sr
+SUB GF@ny GF@iy GF@sy
+MUL GF@ny GF@ny int@1000
+IDIV GF@ny GF@ny GF@sr
+SUB GF@nz GF@iz GF@sz
+MUL GF@nz GF@nz int@1000
+IDIV GF@nz GF@nz GF@sr
+SUB GF@lx int@-5000 GF@ix
+SUB GF@ly int@5000 GF@iy
+SUB GF@lz int@-11000 GF@iz
+MUL GF@d GF@lx GF@lx
+MUL GF@tmp GF@ly GF@ly
+ADD GF@d GF@d GF@tmp
+MUL GF@tmp GF@lz GF@lz
+ADD GF@d GF@d GF@tmp
+IDIV GF@d GF@d int@1000
+MOVE GF@arg GF@d
+CALL sqrt
+MUL GF@lightness GF@nx GF@lx
+MUL GF@tmp GF@ny GF@ly
+ADD GF@lightness GF@lightness GF@tmp
+MUL GF@tmp GF@nz GF@lz
+ADD GF@lightness GF@lightness GF@tmp
+IDIV GF@lightness GF@lightness GF@ret
+CALL pixel_color
+LABEL next
+ADD GF@n GF@n int@1
+JUMPIFNEQ sphere GF@n int@3
+CONCAT GF@line GF@line GF@pixel
+ADD GF@x GF@x int@1
+JUMPIFNEQ column GF@x int@%(resx)d
+CONCAT GF@line GF@line string@|
+WRITE GF@line
+WRITE string@\\010
+ADD GF@y GF@y int@1
+JUMPIFNEQ row GF@y int@%(resy)d
+CALL print_line
+EXIT int@0
+
+# GF@ret = square root of GF@arg, Newton iteration
+LABEL sqrt
+MOVE GF@yi GF@arg
+LABEL sqrt_loop
+MUL GF@tmp GF@arg int@1000
+IDIV GF@tmp GF@tmp GF@yi
+ADD GF@yip1 GF@tmp GF@yi
+IDIV GF@yip1 GF@yip1 int@2
+SUB GF@delta GF@yip1 GF@yi
+LT GF@in GF@delta int@0
+JUMPIFEQ sqrt_positive GF@in bool@false
+SUB GF@delta int@0 GF@delta
+LABEL sqrt_positive
+MOVE GF@yi GF@yip1
+GT GF@in GF@delta int@1
+JUMPIFEQ sqrt_loop GF@in bool@true
+MOVE GF@ret GF@yi
+RETURN
+
+# GF@in = GF@lo < GF@t < GF@hi
+LABEL is_in_range
+GT GF@in GF@t GF@lo
+JUMPIFEQ is_in_range_end GF@in bool@false
+LT GF@in GF@t GF@hi
+LABEL is_in_range_end
+RETURN
+
+# GF@pixel = character for GF@lightness
+LABEL pixel_color
+MOVE GF@pixel string@\\035
+GT GF@in GF@lightness int@900
+JUMPIFEQ pixel_end GF@in bool@true
+MOVE GF@pixel string@*
+GT GF@in GF@lightness int@700
+JUMPIFEQ pixel_end GF@in bool@true
+MOVE GF@pixel string@+
+GT GF@in GF@lightness int@500
+JUMPIFEQ pixel_end GF@in bool@true
+MOVE GF@pixel string@-
+GT GF@in GF@lightness int@300
+JUMPIFEQ pixel_end GF@in bool@true
+MOVE GF@pixel string@.
+GT GF@in GF@lightness int@100
+JUMPIFEQ pixel_end GF@in bool@true
+MOVE GF@pixel string@\\032
+LABEL pixel_end
+RETURN
+
+# +------+ line of the width of the picture
+LABEL print_line
+MOVE GF@line string@+
+MOVE GF@x int@0
+LABEL print_line_loop
+CONCAT GF@line GF@line string@-
+ADD GF@x GF@x int@1
+JUMPIFNEQ print_line_loop GF@x int@%(resx)d
+CONCAT GF@line GF@line string@+
+WRITE GF@line
+WRITE string@\\010
+RETURN
+''' % {'defvars': '\n'.join('DEFVAR GF@%s' % name for name in variables), 'spheres': '\n'.join(spheres),
+       'resx': resx, 'resy': resy}, ''
+
+# name: (function, kind, default size), the default sizes take roughly a second in interpret.py
+WORKLOADS = {
+    'arithmetic': (arithmetic, 'micro', 10000),
+    'string': (string, 'micro', 10000),
+    'frames': (frames, 'micro', 10000),
+    'stack': (stack, 'micro', 10000),
+    'io': (io, 'micro', 10000),
+    'recursion': (recursion, 'macro', 18),
+    'koule': (koule, 'macro', 20),
+}
@@ -7,9 +7,13 @@
 # ---------------------------------------------------------------------------
 """ Implementation of interpret""" 
 # ---------------------------------------------------------------------------
-from enum import IntEnum, Enum
-import re, argparse, os, sys
-import xml.etree.ElementTree as ET
+# only cheap modules are imported here, the others (argparse, re, json, xml.etree.ElementTree, ...)
+# are imported by the functions which need them, so a short program starts fast
+import os, sys, io, stat, array, atexit, time
+
+# integers are exact and of any size, int literals, READ and WRITE are not limited to 4300 digits (Python 3.11+)
+if hasattr(sys, 'set_int_max_str_digits'):
+    sys.set_int_max_str_digits(0)
 
 # dictionary with keys which represents number of arguments for each instruction which are displayed in the dictonary as values 
 # this part is also implemented in parser / syntactic check
@@ -60,8 +64,98 @@ instructionArgumentsTypes = {
     'SETCHAR'     :  ['VAR', 'SYMB', 'SYMB'],
 }
 
+class CallStack:
+    """ Stack of return addresses of CALL and RETURN. Equal neighbouring addresses are stored once
+    with their count, so a recursion from one call site takes constant memory. Addresses and counts
+    are kept in arrays of machine integers. Iterating goes from the bottom to the top. """
+
+    def __init__(self, positions=()):
+        self._positions = array.array('q')
+        self._counts = array.array('q')
+        self._length = 0
+        self.extend(positions)
+
+    def append(self, pos):
+        if self._positions and self._positions[-1] == pos:
+            self._counts[-1] += 1
+        else:
+            self._positions.append(pos)
+            self._counts.append(1)
+        self._length += 1
+
+    def extend(self, positions):
+        for pos in positions:
+            self.append(pos)
+
+    def extendRuns(self, runs):
+        """ Appends (address, count) pairs returned by runs() """
+
+        for pos, count in runs:
+            if self._positions and self._positions[-1] == pos:
+                self._counts[-1] += count
+            else:
+                self._positions.append(pos)
+                self._counts.append(count)
+            self._length += count
+
+    def pop(self):
+        if not self._length:
+            raise IndexError('pop from empty call stack')
+        pos = self._positions[-1]
+        if self._counts[-1] == 1:
+            self._positions.pop()
+            self._counts.pop()
+        else:
+            self._counts[-1] -= 1
+        self._length -= 1
+        return pos
+
+    def top(self):
+        """ Returns the top address and how many times it is repeated on the top """
+
+        return (self._positions[-1], self._counts[-1]) if self._length else (None, 0)
+
+    def popRepeated(self, count):
+        """ Removes count copies of the top address, there must be as many of them """
+
+        if count == self._counts[-1]:
+            self._positions.pop()
+            self._counts.pop()
+        else:
+            self._counts[-1] -= count
+        self._length -= count
+
+    def runCount(self):
+        """ Returns the number of stored (address, count) pairs """
+
+        return len(self._positions)
+
+    def runs(self):
+        """ Returns (address, count) pairs from the bottom """
+
+        return list(zip(self._positions, self._counts))
+
+    def clear(self):
+        del self._positions[:]
+        del self._counts[:]
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for pos, count in zip(self._positions, self._counts):
+            for _ in range(count):
+                yield pos
+
+    def __reversed__(self):
+        for pos, count in zip(reversed(self._positions), reversed(self._counts)):
+            for _ in range(count):
+                yield pos
+
 #### DATA STRUCTURES AND IMPORTANT VARIABLES ####
 insNum = 0 # loop counter
+executedIns = 0 # number of executed instructions
 numberOfLFs = 0 # number of Local Frames
 IsTempFrameCreated = False
 existsTempFrame = False
@@ -70,16 +164,69 @@ tempDict = {} # dictonary used for swapping variables between varList and varSta
 varList = {} # dictonary for all available variables
 labelList = {} 
 dataStack = [] # stack used by instructions PUSHS and POPS
-callList = [] # stack used by instructions CALL and RETURN
+callList = CallStack() # stack used by instructions CALL and RETURN
 varStack = [] # stack for LF variables which are currenly not available
 sortedIns = []
+stepHooks = [] # functions called before every executed instruction, used by the profiler
+traceBuffer = None # last executed instructions shown by BREAK, enabled by --trace
+readHook = None # called before READ with the input stream, returns the stream to read from
+maxSteps = None # --max-steps, limit of executed instructions
+timeLimit = None # --timeout, limit of the run in seconds
+deadline = None # time.monotonic() when timeLimit expires, set when the run starts
+memoryAccounting = None # tracks memory and depths of stacks, enabled by the limits or --peak-usage
+coverage = None # bitmap of executed instructions, enabled by --coverage
+statistics = None # counters written by --stats
+memoryStatistics = None # tracemalloc measurements of phases of the run, enabled by --memstats
+timeSlice = None # instructions between yields of executeSteps, set by interpret_async.py
+linesRead = 0 # lines read by READ from the input stream, the input position kept by --checkpoint
+checkpoint = None # periodic saving of the state of the run, enabled by --checkpoint
+sliceEnd = None # executed instructions at which the current time slice ends
+
+# return codes of runs stopped by --max-steps, --timeout, --max-memory and the depth limits
+STEP_LIMIT_EXIT_CODE = 60
+TIMEOUT_EXIT_CODE = 61
+MEMORY_LIMIT_EXIT_CODE = 62
+DEPTH_LIMIT_EXIT_CODE = 63
+
+class Nil:
+    """ The nil value. It is written as 'Val.NIL' like a member of an Enum, which the WRITE
+    instruction relies on, and it is pickled by name, so it stays a singleton. """
+
+    value = 'nil'
+    def __repr__(self):
+        return 'Val.NIL'
+    def __reduce__(self):
+        return 'Val.NIL'
 
-class Val(Enum):
-    NIL = 'nil'
-class Var(IntEnum):
+class Val:
+    NIL = Nil()
+class Var:
     VALUE = 0   
     TYPE = 1
 
+# program arguments other than --source and --input with their default values
+DEFAULT_ARGUMENTS = {
+    'profile': None, 'sample': None, 'sampleInterval': 1.0, 'trace': None, 'batch': None,
+    'batchOutput': 'batch_results', 'jobs': os.cpu_count() or 1, 'forkAtRead': False,
+    'maxSteps': None, 'timeout': None, 'maxMemory': None, 'maxStackDepth': None,
+    'maxCallDepth': None, 'peakUsage': False, 'coverage': None, 'sourceFormat': 'xml',
+    'optimize': False, 'gc': 'default', 'memstats': None, 'checkpoint': None, 'checkpointEvery': None,
+    'resume': False,
+}
+
+SOURCE_FORMATS = ('xml', 'text')
+STATS_GROUPS = ('--insts', '--hot', '--vars', '--frequent')
+GC_MODES = ('default', 'freeze', 'off')
+
+class SimpleArguments:
+    """ Arguments parsed without argparse, options which were not given have their defaults """
+
+    def __init__(self, source, input, sourceFormat):
+        self.__dict__.update(DEFAULT_ARGUMENTS)
+        self.source = source
+        self.input = input
+        self.sourceFormat = sourceFormat
+
 class ProgramArgs:
     # this class takes care of program arguments, their parsing and checks correctness
 
@@ -90,6 +237,29 @@ class ProgramArgs:
         self.inputToBeRead = None
         self.sourceBool = False
         self.inputBool = False
+        self.profileFile = None
+        self.sampleFile = None
+        self.sampleInterval = None
+        self.traceLength = None
+        self.batch = None
+        self.batchOutput = None
+        self.jobs = None
+        self.forkAtRead = False
+        self.maxSteps = None
+        self.timeout = None
+        self.maxMemory = None
+        self.maxStackDepth = None
+        self.maxCallDepth = None
+        self.peakUsage = False
+        self.coverageFile = None
+        self.sourceFormat = 'xml'
+        self.optimize = False
+        self.statsFiles = []
+        self.gcMode = 'default'
+        self.memstatsFile = None
+        self.checkpointFile = None
+        self.checkpointEvery = None
+        self.resume = False
     
     def executeProgramParams(self):
         self.parseProgramsArgumets()
@@ -100,10 +270,90 @@ class ProgramArgs:
     # parses arguments with argParse
         if '--help' in sys.argv and len(sys.argv) > 2: exit(10)
         if '-h' in sys.argv and len(sys.argv) > 2: exit(10)
+        argv = self.parseStatsArguments(sys.argv[1:])
+        self._arguments = self.parseSimpleArguments(argv)
+        if self._arguments is not None:
+            return
+        import argparse
         self._parser = argparse.ArgumentParser(description="IPP/2022 Interpret")
         self._parser.add_argument("--source",  action="store", dest="source")
         self._parser.add_argument("--input", action="store", dest="input")
-        self._arguments = self._parser.parse_args()
+        self._parser.add_argument("--profile", action="store", dest="profile", nargs="?", const="-",
+                                  help="write an opcode profile at exit to the file (.json for JSON, stderr if omitted)")
+        self._parser.add_argument("--sample", action="store", dest="sample", nargs="?", const="-",
+                                  help="sample the call stack and write collapsed stacks at exit to the file (stderr if omitted)")
+        self._parser.add_argument("--sample-interval", action="store", dest="sampleInterval", type=float,
+                                  help="sampling interval in milliseconds of CPU time (default 1)")
+        self._parser.add_argument("--trace", action="store", dest="trace", type=int,
+                                  help="remember the given number of last executed instructions for BREAK")
+        self._parser.add_argument("--batch", action="store", dest="batch",
+                                  help="run the program for every *.in file in the directory or every file listed in the file")
+        self._parser.add_argument("--batch-output", action="store", dest="batchOutput",
+                                  help="directory for results of --batch (default batch_results)")
+        self._parser.add_argument("--jobs", action="store", dest="jobs", type=int,
+                                  help="number of processes used by --batch")
+        self._parser.add_argument("--fork-at-read", action="store_true", dest="forkAtRead",
+                                  help="with --batch, run the program once up to its first READ and fork a process per input there")
+        self._parser.add_argument("--max-steps", action="store", dest="maxSteps", type=int,
+                                  help="stop after about the given number of executed instructions with return code 60")
+        self._parser.add_argument("--timeout", action="store", dest="timeout", type=float,
+                                  help="stop a run longer than the given number of seconds with return code 61")
+        self._parser.add_argument("--max-memory", action="store", dest="maxMemory", type=int,
+                                  help="stop when frames, stacks and strings take about more than the given number of bytes, with return code 62")
+        self._parser.add_argument("--max-stack-depth", action="store", dest="maxStackDepth", type=int,
+                                  help="stop when the data stack gets deeper than the given depth with return code 63")
+        self._parser.add_argument("--max-call-depth", action="store", dest="maxCallDepth", type=int,
+                                  help="stop when the call stack or the frame stack gets deeper than the given depth with return code 63")
+        self._parser.add_argument("--peak-usage", action="store_true", dest="peakUsage",
+                                  help="write the peak memory usage and depths of stacks to stderr at the end of every run")
+        self._parser.add_argument("--coverage", action="store", dest="coverage",
+                                  help="merge executed instructions of every run into the coverage file, see interpret_coverage.py")
+        self._parser.add_argument("--source-format", action="store", dest="sourceFormat", choices=SOURCE_FORMATS,
+                                  help="format of the source, XML from the parser (default) or IPPcode23 text")
+        self._parser.add_argument("--optimize", action="store_true", dest="optimize",
+                                  help="rewrite PUSHS and POPS of constants to MOVE at load time, the number of rewritten pairs is written to stderr")
+        self._parser.add_argument("--gc", action="store", dest="gc", choices=GC_MODES,
+                                  help="freeze the loaded program out of the cyclic garbage collector and collect rarely (freeze) or never (off)")
+        self._parser.add_argument("--memstats", action="store", dest="memstats", nargs="?", const="-",
+                                  help="write peak memory of loading, the program, frames, the data stack and the run at exit (.json for JSON, stderr if omitted)")
+        self._parser.add_argument("--checkpoint", action="store", dest="checkpoint",
+                                  help="save the state of the run to the file, replaced atomically, see --checkpoint-every; the output has to be redirected to a regular file")
+        self._parser.add_argument("--checkpoint-every", action="store", dest="checkpointEvery", type=int,
+                                  help="executed instructions between two checkpoints (default %d)" % CHECKPOINT_EVERY)
+        self._parser.add_argument("--resume", action="store_true", dest="resume",
+                                  help="continue the run saved in the --checkpoint file if it exists, with the same program and input and the output appended (>>) to the same file")
+        self._parser.set_defaults(**DEFAULT_ARGUMENTS)
+        self._arguments = self._parser.parse_args(argv)
+
+    def parseStatsArguments(self, argv):
+        # takes --stats=file options, each followed by its groups in the order of their lines in the
+        # file, which argparse does not keep, returns the other arguments
+        rest = []
+        for arg in argv:
+            name, _, value = arg.partition('=')
+            if name == '--stats':
+                if not value: exit(10)
+                if value in (statsFile for statsFile, _ in self.statsFiles): exit(12)
+                self.statsFiles.append((value, []))
+            elif arg in STATS_GROUPS:
+                if not self.statsFiles: exit(10) # a group without --stats
+                self.statsFiles[-1][1].append(arg[2:])
+            else:
+                rest.append(arg)
+        return rest
+
+    def parseSimpleArguments(self, argv):
+        # parses the usual --source=file, --input=file and --source-format=format without importing
+        # argparse, returns None for anything else, which is left to argparse
+        arguments = {'--source': None, '--input': None, '--source-format': 'xml'}
+        for arg in argv:
+            name, _, value = arg.partition('=')
+            if name not in arguments or not value:
+                return None
+            arguments[name] = value
+        if arguments['--source-format'] not in SOURCE_FORMATS:
+            return None
+        return SimpleArguments(arguments['--source'], arguments['--input'], arguments['--source-format'])
     
     def checkProgramArguments(self):
     # checks if user entered correct arguments
@@ -122,6 +372,31 @@ class ProgramArgs:
             self.inputToBeExecuted = self._arguments.source
             self.inputToBeRead = open(self._arguments.input, "r")
             self.sourceBool, self.inputBool = True, True
+        self.profileFile = self._arguments.profile
+        self.sampleFile = self._arguments.sample
+        self.sampleInterval = self._arguments.sampleInterval / 1000
+        self.traceLength = self._arguments.trace
+        self.batch = self._arguments.batch
+        self.batchOutput = self._arguments.batchOutput
+        self.jobs = max(1, self._arguments.jobs)
+        self.forkAtRead = self._arguments.forkAtRead
+        self.maxSteps = self._arguments.maxSteps
+        self.timeout = self._arguments.timeout
+        self.maxMemory = self._arguments.maxMemory
+        self.maxStackDepth = self._arguments.maxStackDepth
+        self.maxCallDepth = self._arguments.maxCallDepth
+        self.peakUsage = self._arguments.peakUsage
+        self.coverageFile = self._arguments.coverage
+        self.sourceFormat = self._arguments.sourceFormat
+        self.optimize = self._arguments.optimize
+        self.gcMode = self._arguments.gc
+        self.memstatsFile = self._arguments.memstats
+        self.checkpointFile = self._arguments.checkpoint
+        self.checkpointEvery = self._arguments.checkpointEvery
+        self.resume = self._arguments.resume
+        if self.checkpointFile is None and (self.checkpointEvery is not None or self.resume): exit(10)
+        if self.checkpointFile is not None and self.batch: exit(10) # checkpoints are kept for a single run
+        if self.checkpointEvery is not None and self.checkpointEvery < 1: exit(10)
     
     def checkProgramsArgumentsPath(self):
     # this method is checking the existence of file(s)
@@ -135,6 +410,8 @@ class ProgramArgs:
             isExists = os.path.exists(self._arguments.input)
             if not isExists:
                 exit(11)
+        if self.batch and not os.path.exists(self.batch):
+            exit(11)
 
 class Instruction:
     arg1, arg2, arg3 = None, None, None
@@ -209,7 +486,8 @@ class Argument:
         by their queal representation in ASCII. If the string is empty this method is not performed.
         """
 
-        if self._typ == 'STRING' and self._value != None:
+        if self._typ == 'STRING' and self._value != None and '\\' in self._value:
+            import re
             x = re.findall(r"\\[0-9]{3}", self._value)
             x = [string[1:] for string in x]
             x = list(map(int, x))
@@ -240,9 +518,20 @@ class Argument:
 class Program:
     
     sortedIns = []
-    def __init__(self, treeToBeParsed):
-        if os.stat(treeToBeParsed).st_size == 0:
+    def __init__(self, treeToBeParsed, sourceFormat='xml'):
+        if sourceFormat == 'text':
+            self._root = parseText(treeToBeParsed)
+            return
+        if isinstance(treeToBeParsed, str) and os.stat(treeToBeParsed).st_size == 0:
             exit(0)
+        if isinstance(treeToBeParsed, str):
+            with open(treeToBeParsed, 'rb') as f:
+                data = f.read()
+            if isEmptyProgram(data): # nothing to execute, the XML parser is not needed
+                self._root = None
+                return
+            treeToBeParsed = io.BytesIO(data)
+        import xml.etree.ElementTree as ET
         try:
             self._tree = ET.parse(treeToBeParsed)
         except ET.ParseError:
@@ -250,6 +539,8 @@ class Program:
         self._root = self._tree.getroot()
     
     def executeProgram(self):
+        if self._root is None:
+            return
         self.checkStructionOfXMLTree()
         self.orderInstructions()
         self.findLabels()
@@ -266,7 +557,7 @@ class Program:
                 assert ins.attrib['order'] 
                 numOfArgs = 0 
                 for arg in ins:
-                    assert re.match(r"^arg[1-3]$", arg.tag)
+                    assert arg.tag in ('arg1', 'arg2', 'arg3')
                     assert arg.attrib['type']
                     numOfArgs = numOfArgs + 1
             assert self._root.tag == 'program'
@@ -301,20 +592,924 @@ class Program:
                 labelList[ins[0].text] = cycle
             cycle = cycle + 1
 
+    def optimize(self):
+        """ Rewrites the loaded program, see rewriteStackPairs(), and reports the number of rewrites """
+
+        if self._root is None:
+            return
+        print('Rewritten PUSHS/POPS pairs: %d' % rewriteStackPairs(), file=sys.stderr)
+
+EMPTY_PROGRAMS = (b'<program language="IPPcode22"/>', b'<program language="IPPcode22" />',
+                  b'<program language="IPPcode22"></program>')
+
+def isEmptyProgram(data):
+    """ Recognizes a program without instructions in the form written by the parser, other forms
+    of an empty program are left to the XML parser """
+
+    data = data.strip()
+    declaration = b'<?xml version="1.0" encoding="UTF-8"?>'
+    if data.startswith(declaration):
+        data = data[len(declaration):].strip()
+    return data in EMPTY_PROGRAMS
+
+class TextElement:
+    """ Program, instruction or argument read by the text front-end. It has the part of the interface
+    of ElementTree elements used by the interpret, so the rest of the interpret does not see a difference. """
+
+    __slots__ = ('tag', 'attrib', 'text', 'get', '_children')
+
+    def __init__(self, tag, attrib, text=None, children=()):
+        self.tag = tag
+        self.attrib = attrib
+        self.text = text
+        self.get = attrib.get # get(key, default=None) of an element, without a call of a Python method
+        self._children = children
+
+    def __len__(self):
+        return len(self._children)
+
+    def __iter__(self):
+        return iter(self._children)
+
+    def __getitem__(self, index):
+        return self._children[index]
+
+# kinds of operands of instructions in the text, as in instructionArgumentsTypes, where conditional jumps
+# have a label as their first operand
+textOperands = {opcode: tuple(kind.lower() for kind in kinds if kind is not None) for opcode, kinds in instructionArgumentsTypes.items()}
+textOperands['JUMPIFEQ'] = textOperands['JUMPIFNEQ'] = ('label', 'symb', 'symb')
+
+TEXT_IDENTIFIER = r'[A-Za-z_\-$&%*!?][0-9A-Za-z_\-$&%*!?]*'
+TEXT_OPERANDS = {
+    'var': r'(?:GF|LF|TF)@' + TEXT_IDENTIFIER,
+    'label': TEXT_IDENTIFIER,
+    'type': r'int|string|bool|nil',
+    'int': r'int@[+-]?(?:0[xX][0-9a-fA-F]+|0[oO]?[0-7]+|[0-9]+)',
+    'string': r'string@(?:[^\s#\\]|\\[0-9]{3})*',
+    'bool': r'bool@(?:true|false)',
+    'nil': r'nil@nil',
+}
+
+def parseText(source):
+    """ Text front-end, reads IPPcode23 source (a file name or a stream) and returns the program
+    as TextElements in the form of the XML written by the parser. Lexical and syntax errors end the
+    interpret with the codes of the parser: 21 for a missing or wrong header, 22 for an unknown
+    opcode and 23 for other errors. """
+
+    import re, gc
+    if isinstance(source, str):
+        with open(source, 'r') as f:
+            text = f.read()
+    else:
+        text = source.read()
+    matchers = {kind: re.compile(pattern).fullmatch for kind, pattern in TEXT_OPERANDS.items()}
+    constant = re.compile('|'.join('(?P<%s>%s)' % (kind, TEXT_OPERANDS[kind])
+                                   for kind in ('var', 'int', 'string', 'bool', 'nil'))).fullmatch
+    gcEnabled = gc.isenabled()
+    gc.disable() # the records have no cycles, collections triggered by their allocation only cost time
+    try:
+        header = False
+        instructions = []
+        for line in text.splitlines():
+            tokens = line.split('#', 1)[0].split()
+            if not tokens:
+                continue
+            if not header:
+                if len(tokens) != 1 or tokens[0].upper() != '.IPPCODE23': exit(21)
+                header = True
+                continue
+            opcode = tokens[0].upper()
+            kinds = textOperands.get(opcode)
+            if kinds is None: exit(22)
+            if len(tokens) - 1 != len(kinds): exit(23)
+            args = []
+            for num, (kind, token) in enumerate(zip(kinds, tokens[1:]), 1):
+                if kind == 'symb':
+                    match = constant(token)
+                    if match is None: exit(23)
+                    typ = match.lastgroup
+                else:
+                    typ = kind
+                    if not matchers[typ](token): exit(23)
+                if typ not in ('var', 'label', 'type'):
+                    token = token.partition('@')[2] or None # an empty XML element has no text
+                args.append(TextElement('arg%d' % num, {'type': typ}, token))
+            instructions.append(TextElement('instruction', {'order': str(len(instructions) + 1), 'opcode': opcode},
+                                            children=tuple(args)))
+    finally:
+        if gcEnabled: gc.enable()
+    if not header: exit(21)
+    return TextElement('program', {'language': 'IPPcode22'}, children=instructions)
+
+# opcodes after which the next instruction starts a new basic block, BREAK shows the data stack
+BLOCK_ENDS = ('JUMP', 'JUMPIFEQ', 'JUMPIFNEQ', 'CALL', 'RETURN', 'EXIT', 'BREAK')
+
+def stackConstant(ins):
+    """ Returns the argument of PUSHS ins if it is a constant which PUSHS always pushes without an
+    error, otherwise None. PUSHS of a variable pushes its name (not its value), it is not rewritten. """
+
+    if ins.get('opcode', '').upper() != 'PUSHS' or len(ins) != 1 or ins[0].tag != 'arg1':
+        return None
+    arg = ins[0]
+    typ = (arg.get('type') or '').upper()
+    if typ == 'INT':
+        try:
+            int(arg.text)
+        except (TypeError, ValueError):
+            return None
+    elif typ not in ('STRING', 'BOOL', 'NIL'):
+        return None
+    return arg
+
+def rewriteStackPairs():
+    """ Data-flow pass over basic blocks of sortedIns. It tracks the symbolic contents of the data
+    stack pushed in the block and rewrites PUSHS of a constant and the POPS which takes the value
+    in the same block into one MOVE at the place of POPS, the PUSHS is removed. Pairs are matched
+    in stack order, so other POPS get the same values and POPS on an empty stack still ends with 56.
+    A block ends with a jump, CALL, RETURN, EXIT or BREAK and a new one starts after every label
+    target. Returns the number of rewritten pairs, labelList is updated to the shorter program. """
+
+    labels = set(labelList.values())
+    targets = set(pos + 1 for pos in labels) # execution continues after the LABEL
+    removed = set()
+    stack = [] # (position, constant) of PUSHS in the current block, None for other values
+    for pos, ins in enumerate(sortedIns):
+        if pos in targets:
+            stack = []
+        opcode = ins.get('opcode', '').upper()
+        if opcode == 'PUSHS':
+            constant = stackConstant(ins)
+            stack.append((pos, constant) if constant is not None else None)
+        elif opcode == 'POPS':
+            pushed = stack.pop() if stack else None
+            if pushed is not None and len(ins) == 1 and (ins[0].get('type') or '').upper() == 'VAR':
+                push, constant = pushed
+                sortedIns[pos] = TextElement('instruction', {'order': ins.get('order'), 'opcode': 'MOVE'},
+                                             children=(ins[0], TextElement('arg2', {'type': constant.get('type')}, constant.text)))
+                removed.add(push)
+        elif opcode in BLOCK_ENDS:
+            stack = []
+    if removed:
+        shift = [0] * (len(sortedIns) + 1) # number of removed instructions before a position
+        for pos in range(len(sortedIns)):
+            shift[pos + 1] = shift[pos] + (pos in removed)
+        for label, pos in labelList.items():
+            labelList[label] = pos - shift[pos]
+        sortedIns[:] = [ins for pos, ins in enumerate(sortedIns) if pos not in removed]
+    return len(removed)
+
+def resetState(keepProgram=False):
+    """ Restores the initial state of the interpret, so more programs (or more runs of the loaded
+    program when keepProgram is set) can be executed in one process """
+
+    global insNum, executedIns, numberOfLFs, IsTempFrameCreated, existsTempFrame, isEOF, tempDict, traceBuffer, linesRead
+    insNum, executedIns, numberOfLFs, linesRead = 0, 0, 0, 0
+    IsTempFrameCreated, existsTempFrame, isEOF = False, False, False
+    tempDict = {}
+    traceBuffer = None
+    for container in (varList, dataStack, callList, varStack, stepHooks):
+        container.clear()
+    if memoryAccounting is not None:
+        memoryAccounting.reset()
+    if not keepProgram:
+        labelList.clear()
+        sortedIns.clear()
+
+def restoreState(state):
+    """ Sets the state of the interpret from a dictionary, e.g. to continue a run started
+    elsewhere. The program itself has to be loaded already. """
+
+    global insNum, executedIns, numberOfLFs, IsTempFrameCreated, existsTempFrame, isEOF
+    resetState(keepProgram=True)
+    insNum, executedIns, numberOfLFs = state['insNum'], state['executedIns'], state['numberOfLFs']
+    IsTempFrameCreated, existsTempFrame = state['IsTempFrameCreated'], state['existsTempFrame']
+    isEOF = state['isEOF']
+    varList.update(state['varList'])
+    dataStack.extend(state['dataStack'])
+    if 'callRuns' in state: # compact call stack of a checkpoint
+        callList.extendRuns(state['callRuns'])
+    else:
+        callList.extend(state['callList'])
+    varStack.extend(state['varStack'])
+
+def enclosingLabels():
+    """ Returns the name of the nearest preceding label for every instruction position,
+    instructions before the first label belong to '<main>' """
+
+    labels, label = [], '<main>'
+    for ins in sortedIns:
+        if ins.get('opcode').upper() == 'LABEL':
+            label = ins[0].text
+        labels.append(label)
+    return labels
+
+class Profiler:
+    """ Counts executions and time spent per instruction. The time of an instruction is measured
+    from the start of its step to the start of the next one, so it includes loading of its arguments.
+    Counters are kept per instruction position and aggregated per opcode, order and label in the report. """
+
+    def __init__(self, reportFile):
+        self._reportFile = reportFile
+        self._counts = [0] * len(sortedIns)
+        self._times = [0.0] * len(sortedIns)
+        self._last = None
+        self._lastTime = time.perf_counter()
+        self._startTime = self._lastTime
+
+    def step(self):
+        now = time.perf_counter()
+        if self._last is not None:
+            self._times[self._last] += now - self._lastTime
+        self._counts[insNum] += 1
+        self._last = insNum
+        self._lastTime = now
+
+    def collect(self):
+        """ Aggregates counters into dictionaries for the report """
+
+        if self._last is not None: # the last instruction ends at exit
+            self._times[self._last] += time.perf_counter() - self._lastTime
+            self._last = None
+        byOpcode, byLabel, byOrder = {}, {}, {}
+        labels = enclosingLabels()
+        for pos, ins in enumerate(sortedIns):
+            count, spent = self._counts[pos], self._times[pos]
+            if count == 0:
+                continue
+            for key, table in ((ins.get('opcode').upper(), byOpcode), (labels[pos], byLabel)):
+                entry = table.setdefault(key, {'count': 0, 'time': 0.0})
+                entry['count'] += count
+                entry['time'] += spent
+            byOrder[int(ins.get('order'))] = {'opcode': ins.get('opcode').upper(), 'label': labels[pos],
+                                              'count': count, 'time': spent}
+        return {
+            'instructions': sum(self._counts),
+            'time': time.perf_counter() - self._startTime,
+            'opcodes': byOpcode,
+            'labels': byLabel,
+            'orders': byOrder,
+        }
+
+    def formatText(self, report, limit=20):
+        lines = ['Executed instructions: %d, total time: %.6f s' % (report['instructions'], report['time'])]
+        for title, table in (('Opcode', report['opcodes']), ('Label', report['labels'])):
+            lines.append('')
+            lines.append('%-24s %12s %12s' % (title, 'count', 'time [s]'))
+            for key, entry in sorted(table.items(), key=lambda item: -item[1]['time']):
+                lines.append('%-24s %12d %12.6f' % (key, entry['count'], entry['time']))
+        lines.append('')
+        lines.append('%-8s %-12s %-24s %12s %12s' % ('Order', 'Opcode', 'Label', 'count', 'time [s]'))
+        for order, entry in sorted(report['orders'].items(), key=lambda item: -item[1]['time'])[:limit]:
+            lines.append('%-8d %-12s %-24s %12d %12.6f' % (order, entry['opcode'], entry['label'],
+                                                          entry['count'], entry['time']))
+        return '\n'.join(lines) + '\n'
+
+    def report(self):
+        import json
+        report = self.collect()
+        if self._reportFile.endswith('.json'):
+            text = json.dumps(report, indent=2)
+        else:
+            text = self.formatText(report)
+        if self._reportFile == '-':
+            print(text, end='', file=sys.stderr)
+        else:
+            with open(self._reportFile, 'w') as f:
+                f.write(text)
+
+class SamplingProfiler:
+    """ Records the call stack of the interpreted program on a CPU time timer signal, so the main
+    loop runs unchanged. A stack consists of labels enclosing the return addresses in callList
+    and the current instruction. At exit the stacks are written as collapsed stack lines
+    ('<main>;function;callee count') which are read by flame graph tools. """
+
+    def __init__(self, outputFile, interval):
+        self._outputFile = outputFile
+        self._interval = interval
+        self._labels = enclosingLabels()
+        self._stacks = {}
+
+    def start(self):
+        import signal
+        signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self._interval, self._interval)
+
+    def stop(self):
+        import signal
+        signal.setitimer(signal.ITIMER_PROF, 0)
+
+    def sample(self, signum, frame):
+        if not self._labels:
+            return
+        last = len(self._labels) - 1
+        stack = [self._labels[pos] for pos in callList]
+        stack.append(self._labels[min(insNum, last)])
+        key = ';'.join(stack)
+        self._stacks[key] = self._stacks.get(key, 0) + 1
+
+    def report(self):
+        self.stop()
+        text = ''.join('%s %d\n' % (key, count) for key, count in sorted(self._stacks.items()))
+        if self._outputFile == '-':
+            print(text, end='', file=sys.stderr)
+        else:
+            with open(self._outputFile, 'w') as f:
+                f.write(text)
+
+def formatValue(value, typ):
+    """ Formats a value with its type the way it is written in IPPcode, e.g. int@5 """
+
+    if value is None:
+        return '<uninitialized>'
+    if typ == 'BOOL':
+        value = 'true' if value else 'false'
+    elif typ == 'NIL':
+        value = 'nil'
+    return '%s@%s' % (typ.lower(), value)
+
+def formatOperand(arg):
+    """ Formats an argument of a not yet executed instruction together with the current value
+    of the variable """
+
+    typ = arg.get('type').upper()
+    if typ != 'VAR':
+        return '%s@%s' % (typ.lower(), arg.text if arg.text is not None else '')
+    if arg.text not in varList:
+        return '%s=<undefined>' % arg.text
+    return '%s=%s' % (arg.text, formatValue(*varList[arg.text]))
+
+class TraceBuffer:
+    """ Ring buffer with the last executed instructions, their orders, opcodes and operand values
+    at the time of their execution """
+
+    def __init__(self, length):
+        import collections
+        self._entries = collections.deque(maxlen=length)
+
+    def step(self):
+        r = sortedIns[insNum]
+        self._entries.append((r.get('order'), r.get('opcode').upper(),
+                              [formatOperand(arg) for arg in sorted(r, key=lambda x: x.tag)]))
+
+    def lines(self):
+        return [('  order %s: %s %s' % (order, opcode, ', '.join(operands))).rstrip()
+                for order, opcode, operands in self._entries]
+
+class Coverage:
+    """ Marks executed instructions in a bitmap indexed by their position. The bitmap is merged
+    into the coverage file after every run, the file is locked meanwhile, so runs of a batch and
+    separate processes may share one file. An instruction is marked when it is fetched, so also
+    an instruction which ends the run with an error counts as executed. The file is JSON with the program, its instructions
+    (order and opcode), the number of merged runs and a string of 0/1 for executed instructions. """
+
+    def __init__(self, coverageFile, program):
+        self._coverageFile = coverageFile
+        self._program = program
+        self.bitmap = bytearray(len(sortedIns))
+
+    def save(self, runs=1):
+        import fcntl, json
+        instructions = [[ins.get('order'), ins.get('opcode').upper()] for ins in sortedIns]
+        with open(os.open(self._coverageFile, os.O_RDWR | os.O_CREAT, 0o644), 'r+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            text = f.read()
+            data = json.loads(text) if text else {'program': self._program, 'instructions': instructions,
+                                                  'runs': 0, 'executed': '0' * len(instructions)}
+            if data['instructions'] != instructions:
+                print('Coverage file %s belongs to another program, not updated' % self._coverageFile, file=sys.stderr)
+                return
+            data['runs'] += runs
+            data['executed'] = ''.join('1' if bit or old == '1' else '0' for bit, old in zip(self.bitmap, data['executed']))
+            f.seek(0)
+            f.truncate()
+            json.dump(data, f)
+        self.bitmap[:] = bytes(len(self.bitmap))
+
+def dumpState():
+    """ Writes the state of the interpret to stderr, used by the BREAK instruction """
+
+    labels = enclosingLabels()
+    lines = ['BREAK at order %s, executed instructions: %d' % (sortedIns[insNum].get('order'), executedIns)]
+    for title, prefix in (('Global frame', 'GF@'), ('Local frame', 'LF@'), ('Temporary frame', 'TF@')):
+        if (prefix == 'LF@' and numberOfLFs == 0) or (prefix == 'TF@' and not existsTempFrame):
+            lines.append('%s: undefined' % title)
+            continue
+        lines.append('%s:' % title)
+        lines.extend('  %s = %s' % (name, formatValue(*value)) for name, value in varList.items()
+                     if name.startswith(prefix))
+    lines.append('Local frames on the frame stack: %d' % numberOfLFs)
+    lines.append('Data stack (depth %d, top first):' % len(dataStack))
+    lines.extend('  %s' % formatValue(*value) for value in reversed(dataStack))
+    lines.append('Call stack (depth %d, top first):' % len(callList))
+    lines.extend('  return to order %s in %s%s' % (sortedIns[pos].get('order'), labels[pos], ' (%d times)' % count if count > 1 else '')
+                 for pos, count in reversed(callList.runs()))
+    if traceBuffer is not None:
+        lines.append('Last executed instructions (oldest first):')
+        lines.extend(traceBuffer.lines())
+    print('\n'.join(lines), file=sys.stderr)
+
+def popFrame():
+    """ Executes POPFRAME, the caller checks that a local frame exists """
+
+    global numberOfLFs, IsTempFrameCreated, existsTempFrame
+    if existsTempFrame == True: # deletes variables in current TF if it already exists
+        if statistics is not None: statistics.discardTempFrame()
+        [varList.pop(var) for var in list(varList.keys()) if var.startswith('TF')]
+
+    # moves current LF values to TF 
+    for var in list(varList.keys()):
+        newKey = var.replace('LF', 'TF')
+        varList[newKey] = varList.pop(var)
+
+    # moves variables from stack to current LF, if any exists
+    varList.update(varStack.pop())
+    
+    numberOfLFs -= 1
+    IsTempFrameCreated = True
+    existsTempFrame = True
+
+def tailShape(pos):
+    """ Returns the opcodes following the CALL at pos when they are RETURN or POPFRAME and RETURN
+    (a tail call), which always execute without an error while a frame and a return address exist """
+
+    following = sortedIns[pos + 1:pos + 3]
+    opcodes = tuple(ins.get('opcode', '').upper() if len(ins) == 0 else None for ins in following)
+    if opcodes[:1] == ('RETURN',):
+        return opcodes[:1]
+    if opcodes == ('POPFRAME', 'RETURN'):
+        return opcodes
+    return None
+
+def unwindTailCalls(pos):
+    """ Called by RETURN which returned to the CALL at pos while more returns to the same CALL are
+    on the top of the call stack, as in a recursion. When the CALL is a tail call, the interpret would
+    execute the RETURN (or POPFRAME and RETURN) after it once for every such return address. These
+    repetitions are done here at once with the same result and the same count of executed
+    instructions, the last one (which returns elsewhere) is left to the main loop. """
+
+    global executedIns
+    shape = tailShape(pos)
+    if shape is None:
+        return
+    count = callList.top()[1]
+    if len(shape) == 2:
+        count = min(count, numberOfLFs) # the rest fails in POPFRAME in the main loop
+        for _ in range(count):
+            popFrame()
+    callList.popRepeated(count)
+    executedIns += count * len(shape)
+    if statistics is not None:
+        for num in range(len(shape)):
+            statistics.counts[pos + 1 + num] += count
+
+def dropLocalFrame():
+    """ Discards LF and makes the frame below it on the frame stack local, TF stays """
+
+    global numberOfLFs
+    for var in [var for var in varList if var.startswith('LF')]:
+        del varList[var]
+    varList.update(varStack.pop())
+    numberOfLFs -= 1
+
+def labelOperand(ins):
+    """ Returns the label of a CALL or a jump, None if the instruction has no first argument """
+
+    return next((arg.text for arg in ins if arg.tag == 'arg1'), None)
+
+def framesBalanced():
+    """ Returns True when every function of the program pushes its frame first and pops it just
+    before it returns: every CALL target label is followed by PUSHFRAME, it is not a jump target
+    and the instruction before it does not continue to it, there is no other PUSHFRAME, and every
+    POPFRAME is followed by RETURN and every RETURN follows POPFRAME. A function then never sees
+    the frame of its caller. """
+
+    opcodes = [ins.get('opcode', '').upper() for ins in sortedIns]
+    called = set(labelOperand(ins) for ins, opcode in zip(sortedIns, opcodes) if opcode == 'CALL')
+    jumped = set(labelOperand(ins) for ins, opcode in zip(sortedIns, opcodes) if opcode in ('JUMP', 'JUMPIFEQ', 'JUMPIFNEQ'))
+    entries = set()
+    for label in called & labelList.keys():
+        pos = labelList[label]
+        if label in jumped or pos == 0 or opcodes[pos - 1] not in ('JUMP', 'RETURN', 'EXIT') or opcodes[pos + 1:pos + 2] != ['PUSHFRAME']:
+            return False
+        entries.add(pos + 1)
+    for pos, opcode in enumerate(opcodes):
+        if (opcode == 'PUSHFRAME' and pos not in entries or
+            opcode == 'POPFRAME' and opcodes[pos + 1:pos + 2] != ['RETURN'] or
+            opcode == 'RETURN' and (pos == 0 or opcodes[pos - 1] != 'POPFRAME')):
+            return False
+    return True
+
+def findTailCalls():
+    """ Returns {position: frame} of the CALLs the main loop executes as tail calls. Such a CALL
+    does not push its return address, the callee returns straight to the caller's return address
+    and the RETURN after the CALL is not executed. That is safe for every CALL followed by RETURN
+    (frame False) when the call stack is not empty. A CALL followed by POPFRAME and RETURN (frame
+    True) is a tail call only when frames are balanced (see framesBalanced()) and the caller's
+    return address is a CALL of the same kind: the POPFRAME after that CALL replaces TF by the LF
+    of this call, so LF is dead and is discarded at the tail CALL instead of being pushed by the
+    callee. A tail recursion then keeps one return address and one frame of every kind. """
+
+    balanced = None
+    tails = {}
+    for pos, ins in enumerate(sortedIns):
+        if ins.get('opcode', '').upper() != 'CALL':
+            continue
+        shape = tailShape(pos)
+        if shape == ('RETURN',):
+            tails[pos] = False
+        elif shape is not None:
+            if balanced is None:
+                balanced = framesBalanced()
+            if balanced:
+                tails[pos] = True
+    return tails
+
+# instructions which write their first argument, a variable
+VARIABLE_WRITERS = frozenset(opcode for opcode, types in instructionArgumentsTypes.items()
+                             if types[0] == 'VAR' and opcode not in ('DEFVAR', 'JUMPIFEQ', 'JUMPIFNEQ'))
+
+class Statistics:
+    """ Counters of --stats: executions per instruction position and the peak number of initialized
+    variables in all frames. The number of initialized variables changes only when an instruction
+    writes an uninitialized variable (checked in the next step) and when TF is discarded, so it
+    is kept up to date without going through the frames in every step. """
+
+    def __init__(self, statsFiles):
+        self.statsFiles = statsFiles
+        self.counts = [0] * len(sortedIns)
+        self.written = None # variable uninitialized before the last executed instruction
+        self.variables = 0
+        self.peakVariables = 0
+
+    def countWritten(self):
+        value = varList.get(self.written)
+        self.written = None
+        if value is not None and value[Var.TYPE] is not None:
+            self.variables += 1
+            self.peakVariables = max(self.peakVariables, self.variables)
+
+    def discardTempFrame(self):
+        if self.written is not None:
+            self.countWritten()
+        self.variables -= sum(1 for var, value in varList.items() if var.startswith('TF') and value[Var.TYPE] is not None)
+
+    def group(self, name):
+        """ Returns the line of the group in the statistics file """
+
+        if name == 'insts': # LABEL, DPRINT and BREAK are not counted
+            return str(sum(count for ins, count in zip(sortedIns, self.counts)
+                           if ins.get('opcode').upper() not in ('LABEL', 'DPRINT', 'BREAK')))
+        if name == 'hot': # the smallest order of the most executed instructions
+            executed = [(-count, int(ins.get('order'))) for ins, count in zip(sortedIns, self.counts) if count]
+            return str(min(executed)[1]) if executed else ''
+        if name == 'vars':
+            return str(self.peakVariables)
+        opcodes = {} # 'frequent', the opcodes which occur most often in the source code, not executed
+        for ins in sortedIns:
+            opcode = ins.get('opcode').upper()
+            opcodes[opcode] = opcodes.get(opcode, 0) + 1
+        most = max(opcodes.values(), default=0)
+        return ','.join(sorted(opcode for opcode, count in opcodes.items() if count == most))
+
+    def report(self):
+        """ Writes the statistics files, called at exit, so EXIT and errors are included """
+
+        if self.written is not None:
+            self.countWritten()
+        for statsFile, groups in self.statsFiles:
+            try:
+                with open(statsFile, 'w') as f:
+                    f.writelines(self.group(name) + '\n' for name in groups)
+            except OSError:
+                print('Cannot write the statistics file %s' % statsFile, file=sys.stderr)
+                os._exit(12)
+
+def stopRun(code, reason):
+    """ Ends the run stopped by one of the limits, with the position in the program """
+
+    print('%s at order %s, executed instructions: %d' % (reason, sortedIns[insNum].get('order'), executedIns),
+          file=sys.stderr)
+    exit(code)
+
+def checkBudget():
+    """ Ends the run when --max-steps or --timeout is exceeded. It is called only on backward jumps
+    and CALL, which every loop or recursion passes, so straight code between two checks may exceed
+    the step limit by at most the length of the program. Returns True when the time slice of
+    a coroutine run is used up, then the next slice starts. """
+
+    global sliceEnd
+    if maxSteps is not None and executedIns > maxSteps:
+        stopRun(STEP_LIMIT_EXIT_CODE, 'Step limit of %d instructions exceeded' % maxSteps)
+    if deadline is not None and time.monotonic() > deadline:
+        stopRun(TIMEOUT_EXIT_CODE, 'Timeout after %g s' % timeLimit)
+    if checkpoint is not None and executedIns >= checkpoint.next:
+        checkpoint.save()
+    if timeSlice is not None and executedIns >= sliceEnd:
+        sliceEnd = executedIns + timeSlice
+        return True
+    return False
+
+CHECKPOINT_EVERY = 1000000 # default of --checkpoint-every
+CHECKPOINT_VERSION = 3
+
+def outputOffset():
+    """ Returns the byte offset of the standard output when it is a regular file, otherwise None """
+
+    try:
+        sys.stdout.flush()
+        fd = sys.stdout.fileno()
+        if stat.S_ISREG(os.fstat(fd).st_mode):
+            return os.lseek(fd, 0, os.SEEK_CUR)
+    except (OSError, ValueError): # io.UnsupportedOperation is a ValueError
+        pass
+    return None
+
+def programDigest():
+    """ Returns a hash of the loaded instructions, a checkpoint is resumed only by the same program """
+
+    import hashlib
+    digest = hashlib.sha256()
+    for ins in sortedIns:
+        digest.update(ins.get('opcode', '').encode() + b'\0')
+        for arg in ins:
+            digest.update(('%s\1%s\1%s\0' % (arg.tag, arg.get('type'), arg.text)).encode())
+        digest.update(b'\2')
+    return digest.digest()
+
+class Checkpoint:
+    """ --checkpoint: the state of the run is saved at least every `every` executed instructions, at
+    a backward jump or CALL like the limits are checked, pickled and compressed. The file is
+    written to a temporary file and renamed over the old one, so an interrupted run always leaves
+    a complete checkpoint. The instruction at insNum is not executed yet in the saved state,
+    a resumed run starts by executing it again.
+
+    The output is not saved, only its byte offset, so the standard output has to be a regular file.
+    A run resumed with the output appended to the same file (>>) cuts the file at the offset,
+    which removes what the interrupted run wrote after its last checkpoint. Output written to
+    a pipe or a terminal cannot be taken back, such a run ends with 12 before it starts.
+    A run which does not resume saves a checkpoint before its first instruction, so a run killed
+    before the next one still resumes at the right offset. """
+
+    def __init__(self, fileName, every):
+        if outputOffset() is None:
+            print('--checkpoint needs the output redirected to a regular file', file=sys.stderr)
+            exit(12)
+        self.fileName = fileName
+        self.every = every
+        self.digest = programDigest()
+        self.next = executedIns + every
+
+    def save(self, pending=1):
+        """ Saves the state, the last pending executed instructions are counted again when resumed """
+
+        import pickle, zlib
+        state = {
+            'version': CHECKPOINT_VERSION, 'program': self.digest, 'insNum': insNum, 'executedIns': executedIns - pending,
+            'numberOfLFs': numberOfLFs, 'IsTempFrameCreated': IsTempFrameCreated, 'existsTempFrame': existsTempFrame,
+            'isEOF': isEOF, 'varList': varList, 'dataStack': dataStack, 'callRuns': callList.runs(),
+            'varStack': varStack, 'linesRead': linesRead, 'outputOffset': outputOffset(),
+        }
+        data = zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL), 1)
+        temporary = '%s.%d.tmp' % (self.fileName, os.getpid())
+        try:
+            with open(temporary, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self.fileName)
+        except OSError:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            print('Cannot write the checkpoint %s' % self.fileName, file=sys.stderr)
+            exit(12)
+        self.next = executedIns + self.every
+
+    def resume(self, inputToBeRead):
+        """ Restores the state saved in the file, skips the input read so far and cuts the output
+        file at the saved offset. Returns False when there is no checkpoint yet. """
+
+        import pickle, zlib
+        global linesRead
+        try:
+            with open(self.fileName, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        except OSError:
+            exit(11)
+        try:
+            state = pickle.loads(zlib.decompress(data))
+        except Exception:
+            exit(11) # not a checkpoint
+        if state.get('version') != CHECKPOINT_VERSION or state.get('program') != self.digest:
+            exit(11) # a checkpoint of another program
+        restoreState(state)
+        for _ in range(state['linesRead']):
+            inputToBeRead.readline()
+        linesRead = state['linesRead']
+        offset, fd = state['outputOffset'], sys.stdout.fileno()
+        if os.fstat(fd).st_size < offset:
+            print('Output before the checkpoint is missing in the output file, append to it (>>) to resume',
+                  file=sys.stderr)
+            exit(12)
+        os.ftruncate(fd, offset)
+        os.lseek(fd, offset, os.SEEK_SET)
+        self.next = executedIns + self.every
+        return True
+
+VALUE_SIZE = 64 # approximate bytes taken by a variable or a stack item, without the characters of a string
+CALL_SIZE = 8 # an item of the call stack
+FRAME_SIZE = 232 # an empty frame on the frame stack
+
+def valueSize(value):
+    return VALUE_SIZE + len(value) if isinstance(value, str) else VALUE_SIZE
+
+def memoryUsage():
+    """ Returns the approximate number of bytes taken by frames, stacks and strings """
+
+    total = sum(valueSize(value[Var.VALUE]) for value in varList.values())
+    total += sum(FRAME_SIZE + sum(valueSize(value[Var.VALUE]) for value in frame.values()) for frame in varStack)
+    total += sum(valueSize(value[Var.VALUE]) for value in dataStack)
+    return total + 2 * CALL_SIZE * callList.runCount()
+
+class MemoryAccounting:
+    """ Enforces --max-memory, --max-stack-depth and --max-call-depth and remembers peaks of the run.
+    Instructions which grow the state report an estimate of the new allocation, the whole state
+    is measured again only when the allocations since the last measurement exceed 1/16 of the usage,
+    so the limit may be exceeded by about that much. """
+
+    def __init__(self, maxMemory, maxStackDepth, maxCallDepth, peakUsage):
+        self.maxMemory = maxMemory
+        self.maxStackDepth = maxStackDepth
+        self.maxCallDepth = maxCallDepth
+        self.peakUsage = peakUsage
+        self.reset()
+
+    def reset(self):
+        self.peakMemory = 0
+        self.peakStackDepth = 0
+        self.peakCallDepth = 0
+        self.peakFrameDepth = 0
+        self._credit = 0 # bytes which may be allocated before the next measurement
+
+    def allocate(self, size):
+        """ Called by DEFVAR, PUSHS, CALL, PUSHFRAME, READ and CONCAT with the estimated size """
+
+        if len(dataStack) > self.peakStackDepth:
+            self.peakStackDepth = len(dataStack)
+            if self.maxStackDepth is not None and self.peakStackDepth > self.maxStackDepth:
+                stopRun(DEPTH_LIMIT_EXIT_CODE, 'Data stack depth limit of %d exceeded' % self.maxStackDepth)
+        if len(callList) > self.peakCallDepth or len(varStack) > self.peakFrameDepth:
+            self.peakCallDepth = max(self.peakCallDepth, len(callList))
+            self.peakFrameDepth = max(self.peakFrameDepth, len(varStack))
+            if self.maxCallDepth is not None and max(len(callList), len(varStack)) > self.maxCallDepth:
+                stopRun(DEPTH_LIMIT_EXIT_CODE, 'Call depth limit of %d exceeded' % self.maxCallDepth)
+        self._credit -= size
+        if self._credit < 0:
+            self.measure()
+
+    def measure(self):
+        usage = memoryUsage()
+        self.peakMemory = max(self.peakMemory, usage)
+        if memoryStatistics is not None:
+            memoryStatistics.sample()
+        self._credit = max(usage // 16, 4096)
+        if self.maxMemory is not None and usage > self.maxMemory:
+            stopRun(MEMORY_LIMIT_EXIT_CODE, 'Memory limit of %d bytes exceeded (about %d bytes used)' % (self.maxMemory, usage))
+
+    def report(self):
+        """ Writes the peaks of the run to stderr when --peak-usage is given """
+
+        if not self.peakUsage:
+            return
+        self.peakMemory = max(self.peakMemory, memoryUsage())
+        print('Peak usage: about %d bytes, data stack depth %d, call depth %d, frame depth %d' % (
+            self.peakMemory, self.peakStackDepth, self.peakCallDepth, self.peakFrameDepth), file=sys.stderr)
+
+GC_THRESHOLD = 100000 # allocations between collections of the youngest generation with --gc=freeze
+
+def applyGcMode(mode):
+    """ Frames, stacks and the decoded program have no reference cycles and are freed by reference
+    counting, the cyclic garbage collector only traverses them. With --gc=freeze the loaded program
+    is moved out of the collected generations and collections are rare, with --gc=off they are
+    disabled for the run. """
+
+    if mode == 'default':
+        return
+    import gc
+    gc.freeze()
+    if mode == 'off':
+        gc.disable()
+    else:
+        gc.set_threshold(GC_THRESHOLD, *gc.get_threshold()[1:])
+
+def deepSize(roots):
+    """ Returns the number of bytes of the objects reachable from roots through containers,
+    every object is counted once """
+
+    seen, total, pending = set(), 0, [roots]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            pending.extend(obj)
+    return total
+
+class MemoryStatistics:
+    """ Measures memory of phases of a run for --memstats. Loading of the source is the peak of
+    tracemalloc while Program reads it, the decoded program is what stays allocated after its
+    checks. Frames and the data stack are measured by their deep size whenever MemoryAccounting
+    measures the state (after about every 1/16 of growth) and at exit, the run is the peak of
+    tracemalloc above the decoded program. """
+
+    def __init__(self, reportFile):
+        import tracemalloc
+        self._tracemalloc = tracemalloc
+        self._reportFile = reportFile
+        tracemalloc.start()
+        self._start = tracemalloc.get_traced_memory()[0]
+        self._runStart = self._start
+        self.phases = {'load': 0, 'program': 0, 'frames': 0, 'dataStack': 0, 'run': 0}
+
+    def loaded(self):
+        """ Called after the source is read and parsed """
+
+        self.phases['load'] = self._tracemalloc.get_traced_memory()[1] - self._start
+        self._tracemalloc.reset_peak()
+
+    def decoded(self):
+        """ Called after the program is checked and sorted, before the run """
+
+        self._runStart = self._tracemalloc.get_traced_memory()[0]
+        self.phases['program'] = self._runStart - self._start
+        self._tracemalloc.reset_peak()
+
+    def sample(self):
+        self.phases['frames'] = max(self.phases['frames'], deepSize([varList, varStack]))
+        self.phases['dataStack'] = max(self.phases['dataStack'], deepSize(dataStack))
+
+    def report(self):
+        import json
+        self.sample()
+        self.phases['run'] = max(0, self._tracemalloc.get_traced_memory()[1] - self._runStart)
+        if self._reportFile.endswith('.json'):
+            text = json.dumps(self.phases, indent=2) + '\n'
+        else:
+            text = ''.join('%-24s %12d B\n' % (title, self.phases[key]) for key, title in (
+                ('load', 'Source load (peak)'), ('program', 'Decoded program'), ('frames', 'Frames (peak)'),
+                ('dataStack', 'Data stack (peak)'), ('run', 'Run (peak)')))
+        if self._reportFile == '-':
+            print(text, end='', file=sys.stderr)
+        else:
+            with open(self._reportFile, 'w') as f:
+                f.write(text)
+
 #### PROGRAM STARTS EXECUTING HERE ####
-if __name__ == "__main__":
-    argParse = ProgramArgs()
-    argParse.executeProgramParams()
-    program = Program(argParse.inputToBeExecuted)
-    program.executeProgram()
+INPUT_REQUEST = 'READ' # yielded by executeSteps when READ needs a line
 
-    # main loop executing instructions
+def runProgram(inputToBeRead):
+    """ Runs the program to its end, the loop ends by calling exit() """
+
+    for _ in executeSteps(inputToBeRead):
+        pass
+
+def executeSteps(inputToBeRead):
+    """ Main loop executing instructions. Module level variables keep the state of the interpret,
+    the loop ends by calling exit(). It is a generator for interpret_async.py: with timeSlice set
+    it yields None on a backward jump or CALL after every timeSlice instructions, and when
+    inputToBeRead is None READ yields INPUT_REQUEST and reads the line sent to the generator.
+    Otherwise it does not yield at all. """
+
+    global insNum, executedIns, numberOfLFs, IsTempFrameCreated, existsTempFrame, isEOF, tempDict, insOpCode, rootLength, deadline, sliceEnd, linesRead
+    hooks = stepHooks # empty unless a profiler is active, then the loop only tests it
+    deadline = None if timeLimit is None else time.monotonic() + timeLimit
+    sliceEnd = None if timeSlice is None else executedIns + timeSlice
+    budget = maxSteps is not None or deadline is not None or timeSlice is not None or checkpoint is not None # checked on backward jumps and CALL
+    # tail calls skip instructions, not with hooks (profiler, --trace), --stats and --coverage which show every executed instruction
+    tails = findTailCalls() if not hooks and statistics is None and coverage is None else {}
+    memory = memoryAccounting # None unless memory is accounted
+    bitmap = coverage.bitmap if coverage is not None else None
+    counts = statistics.counts if statistics is not None else None
     while True:
         # tries to load new instruction and execute it, otherwise throws exit(0)
         try:    
             r = sortedIns[insNum]
         except: 
             exit(0)
+        executedIns += 1
+        if bitmap is not None:
+            bitmap[insNum] = 1
+        if counts is not None:
+            counts[insNum] += 1
+            if statistics.written is not None: statistics.countWritten()
+        if hooks:
+            for hook in hooks: hook()
 
         tempDict = {} # used for swapping variables between varStack and varList
         insOpCode  = r.get('opcode').upper() # obtains current instruction's operation code
@@ -332,6 +1527,8 @@ if __name__ == "__main__":
         if ins.arg3:
             valueArg3 = ins.arg3.getValue()
             typeArg3  = ins.arg3.getType()
+        if counts is not None and insOpCode in VARIABLE_WRITERS and valueArg1 in varList and varList[valueArg1][Var.TYPE] is None:
+            statistics.written = valueArg1 # may initialize the variable, counted in the next step
         
         # **** (INSTRUCTIONS EXECUTION) ****
         # **** Working with Frames, Functions Calls ****
@@ -343,6 +1540,7 @@ if __name__ == "__main__":
         # CREATEFRAME
         elif insOpCode == 'CREATEFRAME':
             if existsTempFrame: # deletes variables in current TF if it already exists
+                if statistics is not None: statistics.discardTempFrame()
                 [varList.pop(var) for var in list(varList.keys()) if var.startswith('TF')]
             IsTempFrameCreated = True 
             existsTempFrame = True
@@ -357,6 +1555,7 @@ if __name__ == "__main__":
                 if var.startswith('LF'):
                     tempDict[var] = varList.pop(var)
             varStack.append(tempDict)
+            if memory: memory.allocate(FRAME_SIZE)
 
             # change every current TF to LF
             for var in list(varList.keys()):
@@ -369,20 +1568,7 @@ if __name__ == "__main__":
         # POPFRAME
         elif insOpCode == "POPFRAME":
             if numberOfLFs == 0: exit(55)
-            if existsTempFrame == True: # deletes variables in current TF if it already exists
-                [varList.pop(var) for var in list(varList.keys()) if var.startswith('TF')]
-
-            # moves current LF values to TF 
-            for var in list(varList.keys()):
-                newKey = var.replace('LF', 'TF')
-                varList[newKey] = varList.pop(var)
-
-            # moves variables from stack to current LF, if any exists
-            varList.update(varStack.pop())
-            
-            numberOfLFs -= 1
-            IsTempFrameCreated = True
-            existsTempFrame = True
+            popFrame()
     
         # DEFVAR 
         elif insOpCode == 'DEFVAR':
@@ -395,17 +1581,26 @@ if __name__ == "__main__":
                 varList[valueArg1] = [None , None]
             else: 
                 exit(55)           
+            if memory: memory.allocate(VALUE_SIZE)
 
         # CALL
         elif insOpCode == 'CALL':
             if not valueArg1 in labelList: exit(52)
-            callList.append(insNum)
+            if budget and checkBudget(): yield None
+            tail = tails.get(insNum) if callList else None
+            if tail is False or (tail and numberOfLFs > 1 and tails.get(callList.top()[0])):
+                if tail: dropLocalFrame() # a tail call, see findTailCalls()
+            else:
+                callList.append(insNum)
+                if memory: memory.allocate(CALL_SIZE)
             insNum = labelList[valueArg1] 
 
         # RETURN
         elif insOpCode == 'RETURN':
             if not callList: exit(56) 
             insNum = callList.pop()
+            if not hooks and callList.top()[0] == insNum: # more returns to the same CALL follow
+                unwindTailCalls(insNum)
 
         # **** Working with the data stack ****
         # PUSHS
@@ -416,6 +1611,7 @@ if __name__ == "__main__":
                 dataStack.append([valueArg1, typeArg1])
             else:
                 dataStack.append([valueArg1, typeArg1])
+            if memory: memory.allocate(valueSize(valueArg1))
 
         # POPS 
         elif insOpCode == 'POPS':           
@@ -436,7 +1632,7 @@ if __name__ == "__main__":
                 varList[valueArg1][Var.VALUE] = valueArg2 * valueArg3
             elif insOpCode == 'IDIV':
                 if valueArg3 == 0: exit(57)
-                varList[valueArg1][Var.VALUE] = int(valueArg2 / valueArg3)
+                varList[valueArg1][Var.VALUE] = valueArg2 // valueArg3 # floor division, exact unlike a float quotient
             varList[valueArg1][Var.TYPE] = 'INT'
 
         # LT, GT, EQ
@@ -517,7 +1713,14 @@ if __name__ == "__main__":
         # READ
         elif insOpCode == 'READ':
             typeArg2 = (arg[1].text).upper()
-            inputValue = argParse.inputToBeRead.readline() 
+            if inputToBeRead is None: # coroutine run, the line is sent by interpret_async.py
+                inputValue = yield INPUT_REQUEST
+            else:
+                if readHook is not None:
+                    inputToBeRead = readHook(inputToBeRead)
+                inputValue = inputToBeRead.readline()
+                linesRead += 1
+            if memory: memory.allocate(len(inputValue))
             if not inputValue: isEOF = True
             if isEOF == False and inputValue[-1] == '\n':
                 inputValue = inputValue[:-1] # cuts the newline  
@@ -559,6 +1762,7 @@ if __name__ == "__main__":
             if typeArg2 != 'STRING' or typeArg3 != 'STRING': exit(53)
             varList[valueArg1][Var.VALUE] = valueArg2 + valueArg3
             varList[valueArg1][Var.TYPE]  = 'STRING'
+            if memory: memory.allocate(len(valueArg2) + len(valueArg3))
 
         # STRLEN
         elif insOpCode == 'STRLEN':  
@@ -600,6 +1804,7 @@ if __name__ == "__main__":
         # JUMP - unconditional jump
         elif insOpCode == 'JUMP':
             if not valueArg1 in labelList: exit(52) 
+            if budget and labelList[valueArg1] < insNum and checkBudget(): yield None
             insNum = labelList[valueArg1]
 
         # JUMPIFEQ, JUMPIFNEQ - conditional jump
@@ -611,8 +1816,10 @@ if __name__ == "__main__":
                     else:
                         exit(53) # Bad operand types     
             if insOpCode == 'JUMPIFEQ'  and valueArg2 == valueArg3:  
+                if budget and labelList[valueArg1] < insNum and checkBudget(): yield None
                 insNum = labelList[valueArg1]
             if insOpCode == 'JUMPIFNEQ' and valueArg2 != valueArg3:
+                if budget and labelList[valueArg1] < insNum and checkBudget(): yield None
                 insNum = labelList[valueArg1]
         
         # EXIT - terminates program execution
@@ -636,6 +1843,238 @@ if __name__ == "__main__":
         
         # BREAK
         elif insOpCode == 'BREAK':
-            print("Předpokládá se, že na standardní chybový výstup vypíše stav interpretu." , file = sys.stderr)
+            dumpState()
+
+        insNum = insNum + 1;
+
+def exitCode(e):
+    """ Converts SystemExit raised by exit() into a return code """
 
-        insNum = insNum + 1;
\ No newline at end of file
+    if e.code is None:
+        return 0
+    return e.code if isinstance(e.code, int) else 1
+
+def runCaptured(inputToBeRead, state=None):
+    """ Runs the loaded program from the beginning (or from the state, see restoreState) with
+    captured stdout and stderr, returns the return code and both outputs """
+
+    import traceback
+    resetState(keepProgram=True)
+    if state is not None:
+        restoreState(state)
+    stdout, stderr = io.StringIO(), io.StringIO()
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        runProgram(inputToBeRead)
+        rc = 0
+    except SystemExit as e:
+        rc = exitCode(e)
+    except Exception:
+        traceback.print_exc()
+        rc = 1
+    finally:
+        if memoryAccounting is not None:
+            memoryAccounting.report()
+        if coverage is not None:
+            coverage.save()
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    return rc, stdout.getvalue(), stderr.getvalue()
+
+def findBatchInputs(batch):
+    """ Returns input files of the batch, *.in files of a directory or files listed in a file """
+
+    if os.path.isdir(batch):
+        return sorted(os.path.join(batch, name) for name in os.listdir(batch) if name.endswith('.in'))
+    with open(batch) as f:
+        return [line.strip() for line in f if line.strip()]
+
+def runBatchInput(inputFile, outputDir):
+    """ Executes one run of the batch and writes its .out, .rc and (non-empty) .err files """
+
+    start = time.perf_counter()
+    with open(inputFile, 'r') as f:
+        rc, stdout, stderr = runCaptured(f)
+    writeRunResult(inputFile, outputDir, rc, stdout, stderr)
+    return inputFile, rc, time.perf_counter() - start
+
+def runBatch(batch, outputDir, jobs):
+    """ Runs the loaded program for all inputs of the batch in a pool of forked processes,
+    which inherit the already loaded and checked program. Writes summary.json with return codes
+    and throughput. """
+
+    import multiprocessing
+    inputs = findBatchInputs(batch)
+    missing = [inputFile for inputFile in inputs if not os.path.isfile(inputFile)]
+    if missing:
+        print('Input file not found: %s' % missing[0], file=sys.stderr)
+        exit(11)
+    os.makedirs(outputDir, exist_ok=True)
+
+    start = time.perf_counter()
+    if jobs == 1:
+        results = [runBatchInput(inputFile, outputDir) for inputFile in inputs]
+    else:
+        with multiprocessing.get_context('fork').Pool(jobs) as pool:
+            results = pool.starmap(runBatchInput, [(inputFile, outputDir) for inputFile in inputs], chunksize=1)
+    writeBatchSummary(outputDir, results, jobs, time.perf_counter() - start)
+
+def writeBatchSummary(outputDir, results, jobs, elapsed):
+    """ Writes summary.json of a batch, results are tuples (input file, return code, time) """
+
+    import json
+    summary = {
+        'runs': len(results),
+        'jobs': jobs,
+        'time': elapsed,
+        'runsPerSecond': len(results) / elapsed if elapsed else 0.0,
+        'nonZeroExits': sum(1 for _, rc, _ in results if rc != 0),
+        'results': [{'input': inputFile, 'rc': rc, 'time': spent} for inputFile, rc, spent in results],
+    }
+    with open(os.path.join(outputDir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    print('%d runs in %.3f s (%.1f runs/s), %d with non-zero return code' % (
+        summary['runs'], elapsed, summary['runsPerSecond'], summary['nonZeroExits']), file=sys.stderr)
+
+def writeRunResult(inputFile, outputDir, rc, stdout, stderr):
+    """ Writes .out, .rc and (non-empty) .err files of one run of a batch """
+
+    name = os.path.join(outputDir, os.path.splitext(os.path.basename(inputFile))[0])
+    with open(name + '.out', 'w') as f:
+        f.write(stdout)
+    with open(name + '.rc', 'w') as f:
+        f.write(str(rc))
+    if stderr:
+        with open(name + '.err', 'w') as f:
+            f.write(stderr)
+
+class BatchServed(Exception):
+    """ Ends the run of the fork server when all its children finished """
+
+def runForkServer(batch, outputDir, jobs):
+    """ Runs the program once up to its first READ, which does not depend on the input. There
+    a child is forked for every input of the batch, at most jobs of them at once, and each child
+    continues from the warm state with its own input and a copy of the output written so far.
+    A program which ends before any READ gives the same result for all inputs. """
+
+    global readHook
+    import traceback
+    inputs = findBatchInputs(batch)
+    missing = [inputFile for inputFile in inputs if not os.path.isfile(inputFile)]
+    if missing:
+        print('Input file not found: %s' % missing[0], file=sys.stderr)
+        exit(11)
+    os.makedirs(outputDir, exist_ok=True)
+
+    serverPid = os.getpid()
+    results = []
+    currentInput = None
+
+    def forkInputs(inputToBeRead):
+        """ Forks the children at the first READ, returns the input of the child in the child
+        and ends the run in the server """
+
+        global readHook, deadline
+        nonlocal currentInput
+        readHook = None
+        warmStdout, warmStderr = sys.stdout.getvalue(), sys.stderr.getvalue()
+        running = {}
+        for inputFile in inputs + [None]:
+            while running and (inputFile is None or len(running) >= jobs):
+                pid, status = os.wait()
+                finished, startTime = running.pop(pid)
+                results.append((finished, os.waitstatus_to_exitcode(status), time.perf_counter() - startTime))
+            if inputFile is None:
+                break
+            startTime = time.perf_counter()
+            pid = os.fork()
+            if pid == 0:
+                currentInput = inputFile
+                if timeLimit is not None: # the child may have waited for a free job
+                    deadline = time.monotonic() + timeLimit
+                sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+                sys.stdout.write(warmStdout)
+                sys.stderr.write(warmStderr)
+                return open(inputFile, 'r')
+            running[pid] = (inputFile, startTime)
+        raise BatchServed() # all children finished, the server does not continue
+
+    start = time.perf_counter()
+    readHook = forkInputs
+    sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+    try:
+        runProgram(sys.stdin)
+        rc = 0
+    except SystemExit as e:
+        rc = exitCode(e)
+    except BatchServed:
+        rc = None
+    except Exception:
+        traceback.print_exc()
+        rc = 1
+    if rc is not None and memoryAccounting is not None:
+        memoryAccounting.report()
+    if rc is not None and coverage is not None:
+        coverage.save(1 if os.getpid() != serverPid else len(inputs))
+    stdout, stderr = sys.stdout.getvalue(), sys.stderr.getvalue()
+    sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+
+    if os.getpid() != serverPid: # a child finished its input
+        writeRunResult(currentInput, outputDir, rc, stdout, stderr)
+        os._exit(rc)
+    if rc is not None: # the program ended before its first READ
+        for inputFile in inputs:
+            writeRunResult(inputFile, outputDir, rc, stdout, stderr)
+            results.append((inputFile, rc, 0.0))
+    results.sort()
+    writeBatchSummary(outputDir, results, jobs, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    argParse = ProgramArgs()
+    argParse.executeProgramParams()
+    if argParse.memstatsFile is not None:
+        memoryStatistics = MemoryStatistics(argParse.memstatsFile)
+    program = Program(argParse.inputToBeExecuted, argParse.sourceFormat)
+    if memoryStatistics is not None:
+        memoryStatistics.loaded()
+    program.executeProgram()
+    if argParse.optimize:
+        program.optimize()
+    if memoryStatistics is not None:
+        memoryStatistics.decoded()
+        atexit.register(memoryStatistics.report)
+    applyGcMode(argParse.gcMode)
+    maxSteps, timeLimit = argParse.maxSteps, argParse.timeout
+    if argParse.peakUsage or memoryStatistics is not None or (argParse.maxMemory, argParse.maxStackDepth, argParse.maxCallDepth) != (None, None, None):
+        memoryAccounting = MemoryAccounting(argParse.maxMemory, argParse.maxStackDepth, argParse.maxCallDepth, argParse.peakUsage)
+    if argParse.coverageFile is not None:
+        coverage = Coverage(argParse.coverageFile, os.path.abspath(argParse.inputToBeExecuted)
+                            if argParse.sourceBool else '<stdin>')
+    if argParse.checkpointFile is not None:
+        checkpoint = Checkpoint(argParse.checkpointFile, argParse.checkpointEvery or CHECKPOINT_EVERY)
+        if not (argParse.resume and checkpoint.resume(argParse.inputToBeRead)): # before hooks, restoring the state resets them
+            checkpoint.save(pending=0)
+    if argParse.batch and argParse.forkAtRead:
+        runForkServer(argParse.batch, argParse.batchOutput, argParse.jobs)
+        exit(0)
+    if argParse.batch:
+        runBatch(argParse.batch, argParse.batchOutput, argParse.jobs)
+        exit(0)
+    if argParse.profileFile is not None:
+        profiler = Profiler(argParse.profileFile)
+        stepHooks.append(profiler.step)
+        atexit.register(profiler.report)
+    if argParse.traceLength:
+        traceBuffer = TraceBuffer(argParse.traceLength)
+        stepHooks.append(traceBuffer.step)
+    if argParse.sampleFile is not None:
+        sampler = SamplingProfiler(argParse.sampleFile, argParse.sampleInterval)
+        atexit.register(sampler.report)
+        sampler.start()
+    if memoryAccounting is not None:
+        atexit.register(memoryAccounting.report)
+    if coverage is not None:
+        atexit.register(coverage.save)
+    if argParse.statsFiles:
+        statistics = Statistics(argParse.statsFiles)
+        atexit.register(statistics.report)
+    runProgram(argParse.inputToBeRead)
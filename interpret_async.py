@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Asyncio server of interactive sessions. It loads the program of --source once and runs it for
+every connection on a UNIX socket (or a TCP port with --port) in the same process: lines received
+from the connection are the input of the program and its output is sent back as it is written,
+the connection is closed when the program ends.
+
+Every session is a coroutine driving the generator interpret.executeSteps: READ awaits the next
+line of the connection and the run yields to the event loop after every --slice instructions (on
+a backward jump or CALL), so hundreds of programs waiting for input take no process each and a long
+computation does not starve the other sessions. The state of the interpret, module variables of
+interpret.py, is swapped in before a session continues and out when it yields. """
+# ---------------------------------------------------------------------------
+import os, io, sys, signal, asyncio, argparse, traceback
+import interpret
+
+DEFAULT_SOCKET = '/tmp/ipp-interpret-async.sock'
+BACKLOG = 1024 # connections waiting for accept, hundreds of sessions may connect at once
+
+# module variables of interpret.py which keep the state of one run
+SESSION_VARIABLES = ('insNum', 'executedIns', 'numberOfLFs', 'IsTempFrameCreated', 'existsTempFrame', 'isEOF',
+                     'tempDict', 'insOpCode', 'rootLength', 'deadline', 'sliceEnd', 'varList', 'dataStack',
+                     'callList', 'varStack', 'sortedIns', 'labelList')
+
+def loadProgram(source, sourceFormat='xml'):
+    """ Loads and checks the program, returns its instructions and labels """
+
+    interpret.resetState()
+    program = interpret.Program(source, sourceFormat)
+    program.executeProgram()
+    return list(interpret.sortedIns), dict(interpret.labelList)
+
+class Session:
+    """ One run of the program with its own state of the interpret and its own outputs """
+
+    def __init__(self, sortedIns, labelList):
+        self._state = {
+            'insNum': 0, 'executedIns': 0, 'numberOfLFs': 0, 'IsTempFrameCreated': False, 'existsTempFrame': False,
+            'isEOF': False, 'tempDict': {}, 'insOpCode': None, 'rootLength': 0, 'deadline': None, 'sliceEnd': None,
+            'varList': {}, 'dataStack': [], 'callList': interpret.CallStack(), 'varStack': [],
+            'sortedIns': sortedIns, 'labelList': labelList,
+        }
+        self._stdout, self._stderr = io.StringIO(), io.StringIO()
+        self._steps = interpret.executeSteps(None)
+
+    def resume(self, line=None):
+        """ Continues the run until it yields, line is the input requested by the last READ.
+        Returns what executeSteps yielded and None, or None and the return code of the ended run. """
+
+        namespace = vars(interpret)
+        namespace.update(self._state)
+        streams = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = self._stdout, self._stderr
+        try:
+            return self._steps.send(line), None
+        except SystemExit as e:
+            return None, interpret.exitCode(e)
+        except StopIteration:
+            return None, 0
+        except Exception:
+            traceback.print_exc()
+            return None, 1
+        finally:
+            for name in SESSION_VARIABLES:
+                self._state[name] = namespace[name]
+            sys.stdout, sys.stderr = streams
+
+    def takeOutput(self):
+        """ Returns the output written since the last call, and the same for the error output """
+
+        outputs = self._stdout.getvalue(), self._stderr.getvalue()
+        for stream in (self._stdout, self._stderr):
+            stream.seek(0)
+            stream.truncate()
+        return outputs
+
+async def runSession(session, readline, write):
+    """ Runs the session to its end and returns the return code. readline() is a coroutine
+    returning the next line of the input ('' at its end), write(text) a coroutine sending output. """
+
+    line = None
+    while True:
+        request, rc = session.resume(line)
+        output, errors = session.takeOutput()
+        if errors:
+            sys.stderr.write(errors)
+        if output:
+            await write(output)
+        if rc is not None:
+            return rc
+        if request == interpret.INPUT_REQUEST:
+            line = await readline()
+        else:
+            line = None
+            await asyncio.sleep(0) # the time slice is used up, other sessions continue
+
+async def serveConnection(program, reader, writer):
+    async def readline():
+        return (await reader.readline()).decode()
+
+    async def write(text):
+        writer.write(text.encode())
+        await writer.drain()
+
+    try:
+        await runSession(Session(*program), readline, write)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def serve(program, arguments):
+    """ Accepts connections until SIGTERM or SIGINT """
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    handler = lambda reader, writer: serveConnection(program, reader, writer)
+    if arguments.port is not None:
+        server = await asyncio.start_server(handler, arguments.host, arguments.port, backlog=BACKLOG)
+    else:
+        if os.path.exists(arguments.socket):
+            os.unlink(arguments.socket)
+        server = await asyncio.start_unix_server(handler, arguments.socket, backlog=BACKLOG)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        if arguments.port is None and os.path.exists(arguments.socket):
+            os.unlink(arguments.socket)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IPP Interpret of interactive sessions")
+    parser.add_argument("--source", action="store", dest="source", required=True)
+    parser.add_argument("--source-format", action="store", dest="sourceFormat", choices=interpret.SOURCE_FORMATS,
+                        default='xml')
+    parser.add_argument("--socket", action="store", dest="socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--host", action="store", dest="host", default='127.0.0.1')
+    parser.add_argument("--port", action="store", dest="port", type=int, help="listen on TCP instead of the socket")
+    parser.add_argument("--slice", action="store", dest="slice", type=int, default=1000,
+                        help="instructions executed by a session before other sessions continue")
+    parser.add_argument("--max-steps", action="store", dest="maxSteps", type=int,
+                        help="limit of executed instructions of every session")
+    parser.add_argument("--timeout", action="store", dest="timeout", type=float,
+                        help="wall clock limit of every session in seconds, including waiting for input")
+    arguments = parser.parse_args()
+    if not os.path.isfile(arguments.source):
+        exit(11)
+    program = loadProgram(arguments.source, arguments.sourceFormat)
+    interpret.timeSlice = max(1, arguments.slice)
+    interpret.maxSteps, interpret.timeLimit = arguments.maxSteps, arguments.timeout
+    asyncio.run(serve(program, arguments))
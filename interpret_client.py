@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Thin client of the interpret daemon (interpret_daemon.py). It accepts the same
+--source and --input arguments as interpret.py, sends the program and its input over
+a UNIX socket and reproduces stdout, stderr and the return code of the run. When no
+daemon is listening, interpret.py is executed directly instead. With --source and without --input
+the stdin, stdout and stderr of the client are passed to the daemon (socket.send_fds), so the
+program reads its input only when it executes READ and writes its output directly, as interpret.py
+does. Where descriptors cannot be passed, the client reads the whole stdin before the program starts.
+
+Environment: IPP_INTERPRET_SOCKET - path of the socket (default /tmp/ipp-interpret.sock),
+IPP_INTERPRET_TIMEOUT - wall clock limit of the run in seconds. """
+# ---------------------------------------------------------------------------
+import os, sys, json, socket
+
+DEFAULT_SOCKET = '/tmp/ipp-interpret.sock'
+# the first byte of a request, the stdin, stdout and stderr of the client are attached to PASSED_FDS
+PASSED_FDS, NO_FDS = b'F', b'-'
+INTERPRET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'interpret.py')
+
+def sendMessage(sock, header, payloads=()):
+    """ Sends one message - a JSON header line followed by raw payloads, their sizes
+    are stored in the header """
+
+    header = dict(header, sizes=[len(payload) for payload in payloads])
+    sock.sendall(json.dumps(header).encode() + b'\n' + b''.join(payloads))
+
+def receiveMessage(sock):
+    """ Receives one message sent by sendMessage, returns the header and the list of payloads """
+
+    stream = sock.makefile('rb')
+    line = stream.readline()
+    if not line:
+        raise ConnectionError('connection closed')
+    header = json.loads(line)
+    payloads = []
+    for size in header['sizes']:
+        payload = stream.read(size)
+        if len(payload) != size:
+            raise ConnectionError('incomplete message')
+        payloads.append(payload)
+    return header, payloads
+
+def parseArguments(argv):
+    """ Parses --source and --input the same way as interpret.py, without argparse
+    to keep the start of the client short """
+
+    arguments = {}
+    for arg in argv:
+        name, _, value = arg.partition('=')
+        if name not in ('--source', '--input') or not value:
+            return None
+        arguments[name[2:]] = value
+    return arguments
+
+def main():
+    socketPath = os.environ.get('IPP_INTERPRET_SOCKET', DEFAULT_SOCKET)
+    arguments = parseArguments(sys.argv[1:])
+    if arguments is None or ('source' not in arguments and 'input' not in arguments):
+        os.execv(sys.executable, [sys.executable, INTERPRET] + sys.argv[1:])
+    for name in ('source', 'input'):
+        if name in arguments and not os.path.exists(arguments[name]):
+            exit(11)
+
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socketPath)
+    except OSError: # no daemon, run the interpret in this process
+        os.execv(sys.executable, [sys.executable, INTERPRET] + sys.argv[1:])
+
+    timeout = os.environ.get('IPP_INTERPRET_TIMEOUT')
+    header = {'timeout': float(timeout) if timeout else None}
+    passFds = 'source' in arguments and 'input' not in arguments and hasattr(socket, 'send_fds')
+    if 'source' in arguments:
+        header['source'] = os.path.abspath(arguments['source'])
+        program = b''
+    else:
+        program = sys.stdin.buffer.read()
+    if 'input' in arguments:
+        with open(arguments['input'], 'rb') as f:
+            inputData = f.read()
+    elif passFds: # the program reads stdin itself
+        inputData = b''
+    else:
+        inputData = sys.stdin.buffer.read()
+
+    if passFds:
+        header['writeThrough'] = sys.stdout.write_through # python -u or PYTHONUNBUFFERED
+        sys.stdout.flush()
+        sys.stderr.flush()
+        socket.send_fds(sock, [PASSED_FDS], [sys.stdin.fileno(), sys.stdout.fileno(), sys.stderr.fileno()])
+    else:
+        sock.sendall(NO_FDS)
+    sendMessage(sock, header, (program, inputData))
+    response, (stdout, stderr) = receiveMessage(sock)
+    sock.close()
+    sys.stdout.buffer.write(stdout)
+    sys.stderr.buffer.write(stderr)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    exit(response['rc'])
+
+if __name__ == "__main__":
+    main()
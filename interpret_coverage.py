@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Reports coverage files written by interpret.py --coverage. For every program it shows the
+executed part of its instructions and the instructions never executed, for all programs together
+it shows per opcode how many of its instructions were executed and which opcode handlers of the
+interpret no program exercised. """
+# ---------------------------------------------------------------------------
+import sys, json, argparse
+from interpret import instructionArgumentsTypes
+
+def loadCoverage(coverageFile):
+    with open(coverageFile) as f:
+        data = json.load(f)
+    data['file'] = coverageFile
+    return data
+
+def programReport(data):
+    executed = data['executed'].count('1')
+    return {
+        'program': data['program'],
+        'file': data['file'],
+        'runs': data['runs'],
+        'instructions': len(data['instructions']),
+        'executed': executed,
+        'missed': [{'order': order, 'opcode': opcode}
+                   for (order, opcode), bit in zip(data['instructions'], data['executed']) if bit == '0'],
+    }
+
+def opcodeReport(coverages):
+    """ Aggregates instructions per opcode over all programs, opcodes of the interpret which do not
+    occur in any program are included with zero counts """
+
+    opcodes = {opcode: {'instructions': 0, 'executed': 0, 'programs': 0} for opcode in instructionArgumentsTypes}
+    for data in coverages:
+        seen = set()
+        for (order, opcode), bit in zip(data['instructions'], data['executed']):
+            entry = opcodes.setdefault(opcode, {'instructions': 0, 'executed': 0, 'programs': 0})
+            entry['instructions'] += 1
+            entry['executed'] += bit == '1'
+            seen.add(opcode)
+        for opcode in seen:
+            opcodes[opcode]['programs'] += 1
+    return opcodes
+
+def percent(part, whole):
+    return 100.0 * part / whole if whole else 0.0
+
+def formatText(programs, opcodes, limit):
+    lines = ['%-50s %6s %12s %8s' % ('Program', 'runs', 'executed', '%')]
+    for report in programs:
+        lines.append('%-50s %6d %5d/%-6d %8.1f' % (report['program'], report['runs'], report['executed'],
+                                                   report['instructions'], percent(report['executed'], report['instructions'])))
+        missed = report['missed']
+        if missed and limit:
+            shown = ', '.join('%s %s' % (entry['order'], entry['opcode']) for entry in missed[:limit])
+            lines.append('    not executed: %s%s' % (shown, ', ...' if len(missed) > limit else ''))
+    lines.append('')
+    lines.append('%-12s %10s %12s %8s' % ('Opcode', 'programs', 'executed', '%'))
+    for opcode, entry in sorted(opcodes.items(), key=lambda item: (percent(item[1]['executed'], item[1]['instructions']), item[0])):
+        lines.append('%-12s %10d %5d/%-6d %8.1f' % (opcode, entry['programs'], entry['executed'], entry['instructions'],
+                                                    percent(entry['executed'], entry['instructions'])))
+    never = sorted(opcode for opcode, entry in opcodes.items() if entry['executed'] == 0)
+    lines.append('')
+    lines.append('Opcode handlers never executed: %s' % (' '.join(never) if never else 'none'))
+    return '\n'.join(lines) + '\n'
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IPP Interpret coverage report")
+    parser.add_argument("files", nargs="+", help="coverage files written by interpret.py --coverage")
+    parser.add_argument("--json", action="store_true", dest="json", help="write the report as JSON")
+    parser.add_argument("--missed", action="store", dest="missed", type=int, default=10,
+                        help="number of not executed instructions listed per program (default 10)")
+    arguments = parser.parse_args()
+
+    coverages = [loadCoverage(coverageFile) for coverageFile in arguments.files]
+    programs = [programReport(data) for data in coverages]
+    opcodes = opcodeReport(coverages)
+    if arguments.json:
+        json.dump({'programs': programs, 'opcodes': opcodes}, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        sys.stdout.write(formatText(programs, opcodes, arguments.missed))
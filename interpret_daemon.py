@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Interpret daemon. It imports interpret.py once, forks warm worker processes which accept
+requests on a UNIX socket and keep a cache of loaded and checked programs. Every run is executed
+in a child forked from the worker, so the state of the interpret and a possible endless loop
+never outlive the request. Requests are sent by interpret_client.py. """
+# ---------------------------------------------------------------------------
+import os, io, sys, json, time, signal, socket, select, hashlib, argparse, traceback, collections
+import interpret
+from interpret_client import DEFAULT_SOCKET, PASSED_FDS, sendMessage, receiveMessage
+
+TIMEOUT_EXIT_CODE = interpret.TIMEOUT_EXIT_CODE # the run was killed after the timeout given in the request
+
+class ProgramCache:
+    """ LRU cache of programs loaded by one worker, keyed by a hash of the XML. Each entry holds
+    the sorted instructions and labels, or the return code of a program which failed to load. """
+
+    def __init__(self, size):
+        self._size = size
+        self._programs = collections.OrderedDict()
+
+    def load(self, data):
+        key = hashlib.sha256(data).digest()
+        if key in self._programs:
+            self._programs.move_to_end(key)
+            return self._programs[key]
+        program = self.compile(data)
+        self._programs[key] = program
+        if len(self._programs) > self._size:
+            self._programs.popitem(last=False)
+        return program
+
+    def compile(self, data):
+        interpret.resetState()
+        if not data: # an empty file is an empty program
+            return None, None, 0
+        try:
+            program = interpret.Program(io.BytesIO(data))
+            program.executeProgram()
+        except SystemExit as e:
+            return None, None, interpret.exitCode(e)
+        return list(interpret.sortedIns), dict(interpret.labelList), None
+
+def runLoaded(sortedIns, labelList, inputData):
+    """ Runs a loaded program in the current process, returns the return code, stdout and stderr """
+
+    interpret.resetState()
+    interpret.sortedIns[:] = sortedIns
+    interpret.labelList.update(labelList)
+    rc, stdout, stderr = interpret.runCaptured(io.TextIOWrapper(io.BytesIO(inputData)))
+    return rc, stdout.encode(), stderr.encode()
+
+def outputStream(fd, lineBuffering, writeThrough):
+    binary = open(fd, 'wb', buffering=0 if writeThrough else -1, closefd=False)
+    return io.TextIOWrapper(binary, line_buffering=lineBuffering, write_through=writeThrough)
+
+def runOnFds(sortedIns, labelList, fds, writeThrough):
+    """ Runs a loaded program in the current process on the stdin, stdout and stderr passed by
+    the client, the input is read when READ needs it and the output is written directly.
+    The outputs are buffered like the standard streams of interpret.py started instead of the
+    client: line buffered on a terminal, stderr always, unbuffered with writeThrough (python -u).
+    Returns the return code. """
+
+    interpret.resetState()
+    interpret.sortedIns[:] = sortedIns
+    interpret.labelList.update(labelList)
+    inputFd, outputFd, errorFd = fds
+    sys.stdout = outputStream(outputFd, os.isatty(outputFd), writeThrough)
+    sys.stderr = outputStream(errorFd, True, writeThrough)
+    try:
+        interpret.runProgram(open(inputFd, 'r', closefd=False))
+        rc = 0
+    except SystemExit as e:
+        rc = interpret.exitCode(e)
+    except Exception:
+        traceback.print_exc()
+        rc = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except OSError: # the client closed its end
+        pass
+    return rc
+
+def execute(sortedIns, labelList, inputData, timeout, fds=None, writeThrough=False):
+    """ Runs the program in a forked child and collects its result through a pipe, the child
+    is killed when it does not finish in time. With fds (stdin, stdout and stderr of the client)
+    the child uses them instead of inputData and the captured outputs. """
+
+    readFd, writeFd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(readFd)
+        if fds:
+            rc, stdout, stderr = runOnFds(sortedIns, labelList, fds, writeThrough), b'', b''
+        else:
+            rc, stdout, stderr = runLoaded(sortedIns, labelList, inputData)
+        with os.fdopen(writeFd, 'wb') as f:
+            f.write(json.dumps({'rc': rc, 'sizes': [len(stdout), len(stderr)]}).encode() + b'\n' + stdout + stderr)
+        os._exit(0)
+
+    os.close(writeFd)
+    chunks, finished = [], False
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with os.fdopen(readFd, 'rb') as f:
+        while not finished:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            ready, _, _ = select.select([f], [], [], remaining)
+            if not ready:
+                break
+            chunk = os.read(f.fileno(), 65536)
+            chunks.append(chunk)
+            finished = not chunk
+    if not finished:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        return TIMEOUT_EXIT_CODE, b'', b'Timeout after %g s\n' % timeout
+    os.waitpid(pid, 0)
+
+    data = b''.join(chunks)
+    line, _, body = data.partition(b'\n')
+    result = json.loads(line)
+    stdoutSize = result['sizes'][0]
+    return result['rc'], body[:stdoutSize], body[stdoutSize:]
+
+def handleConnection(conn, cache):
+    # the first byte tells whether the client passed its stdin, stdout and stderr
+    if hasattr(socket, 'recv_fds'):
+        marker, fds, _, _ = socket.recv_fds(conn, 1, 3)
+    else:
+        marker, fds = conn.recv(1), []
+    try:
+        if marker == PASSED_FDS and len(fds) != 3:
+            raise ValueError('expected 3 file descriptors, received %d' % len(fds))
+        serveRequest(conn, cache, fds)
+    finally:
+        for fd in fds:
+            os.close(fd)
+
+def serveRequest(conn, cache, fds):
+    header, (program, inputData) = receiveMessage(conn)
+    if header.get('source') is not None:
+        try:
+            with open(header['source'], 'rb') as f:
+                program = f.read()
+        except OSError:
+            sendMessage(conn, {'rc': 11}, (b'', b''))
+            return
+    sortedIns, labelList, rc = cache.load(program)
+    if rc is not None:
+        sendMessage(conn, {'rc': rc}, (b'', b''))
+        return
+    rc, stdout, stderr = execute(sortedIns, labelList, inputData, header.get('timeout'), fds,
+                                 header.get('writeThrough', False))
+    sendMessage(conn, {'rc': rc}, (stdout, stderr))
+
+def serveWorker(sock, cacheSize):
+    """ Main loop of a worker process, workers accept connections on the shared socket """
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    cache = ProgramCache(cacheSize)
+    while True:
+        conn, _ = sock.accept()
+        with conn:
+            try:
+                handleConnection(conn, cache)
+            except (OSError, ValueError, KeyError) as e:
+                print('interpret_daemon: bad request: %s' % e, file=sys.stderr)
+
+class Daemon:
+    """ Owns the socket and keeps the configured number of workers running """
+
+    def __init__(self, socketPath, workers, cacheSize):
+        self._socketPath = socketPath
+        self._workers = workers
+        self._cacheSize = cacheSize
+        self._pids = set()
+        self._running = True
+
+    def spawnWorker(self, sock):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                serveWorker(sock, self._cacheSize)
+            finally:
+                os._exit(0)
+        self._pids.add(pid)
+
+    def stop(self, signum, frame):
+        self._running = False
+        for pid in self._pids:
+            os.kill(pid, signal.SIGTERM)
+
+    def serve(self):
+        if os.path.exists(self._socketPath):
+            os.unlink(self._socketPath)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self._socketPath)
+        sock.listen(128)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        try:
+            for _ in range(self._workers):
+                self.spawnWorker(sock)
+            while self._pids:
+                try:
+                    pid, _ = os.wait()
+                except ChildProcessError:
+                    break
+                except InterruptedError:
+                    continue
+                self._pids.discard(pid)
+                if self._running: # replace a crashed worker
+                    self.spawnWorker(sock)
+        finally:
+            sock.close()
+            os.unlink(self._socketPath)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IPP Interpret daemon")
+    parser.add_argument("--socket", action="store", dest="socket",
+                        default=os.environ.get('IPP_INTERPRET_SOCKET', DEFAULT_SOCKET))
+    parser.add_argument("--workers", action="store", dest="workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cache-size", action="store", dest="cacheSize", type=int, default=64,
+                        help="number of loaded programs kept by every worker")
+    arguments = parser.parse_args()
+    Daemon(arguments.socket, arguments.workers, arguments.cacheSize).serve()
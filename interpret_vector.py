@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Experimental lock-step engine. It runs one program for many inputs at once, every variable
+holds a NumPy array with one value per instance and ADD, SUB, MUL, IDIV, LT, GT, EQ, AND, OR and
+NOT are executed as vector operations. Instances stay in lock-step as long as they take the same
+branches, an instance whose outcome of JUMPIFEQ/JUMPIFNEQ differs from the majority (or whose
+READ gives a different type) is split off and finished by the scalar interpret from its state.
+
+The engine never reports errors itself - whenever an instruction is not supported, or any
+instance could fail, overflow 64 bits or behave differently than in interpret.py, all remaining
+instances continue in the scalar interpret from that instruction, so the results are the same.
+Requires NumPy. """
+# ---------------------------------------------------------------------------
+import os, sys, time, argparse
+import interpret
+from interpret import Var, Val
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+INT_LIMIT = 2 ** 62 # bound of operands of ADD, SUB and IDIV which cannot overflow int64
+MUL_LIMIT = 2 ** 31 # bound of operands of MUL
+
+class Fallback(Exception):
+    """ The current instruction has to be executed by the scalar interpret for all instances """
+
+class LockStep:
+    """ State of the interpret shared by all instances, values of variables are arrays """
+
+    def __init__(self, inputs):
+        self.ids = list(range(len(inputs)))
+        self.inputs = list(inputs)
+        self.outputs = [[] for _ in inputs]
+        self.isEOF = [False] * len(inputs)
+        self.results = [None] * len(inputs)
+        self.insNum = 0
+        self.executedIns = 0
+        self.numberOfLFs = 0
+        self.IsTempFrameCreated = False
+        self.existsTempFrame = False
+        self.varList = {}
+        self.varStack = []
+        self.dataStack = []
+        self.callList = []
+        self.vectorSteps = 0
+        self.splitInstances = 0
+        self._decoded = {}
+
+    #### instances ####
+    def size(self):
+        return len(self.ids)
+
+    def scalarValue(self, values, typ, k):
+        if values is None:
+            return None
+        if typ == 'INT':
+            return int(values[k])
+        if typ == 'BOOL':
+            return bool(values[k])
+        return Val.NIL
+
+    def scalarFrame(self, frame, k):
+        return {name: [self.scalarValue(value[Var.VALUE], value[Var.TYPE], k), value[Var.TYPE]]
+                for name, value in frame.items()}
+
+    def instanceState(self, k):
+        """ State of the k-th active instance in the format of interpret.restoreState """
+
+        return {
+            'insNum': self.insNum, 'executedIns': self.executedIns, 'numberOfLFs': self.numberOfLFs,
+            'IsTempFrameCreated': self.IsTempFrameCreated, 'existsTempFrame': self.existsTempFrame,
+            'isEOF': self.isEOF[k],
+            'varList': self.scalarFrame(self.varList, k),
+            'varStack': [self.scalarFrame(frame, k) for frame in self.varStack],
+            'dataStack': [[self.scalarValue(value, typ, k), typ] for value, typ in self.dataStack],
+            'callList': list(self.callList),
+        }
+
+    def finishScalar(self, k, state):
+        """ Finishes the k-th active instance in the scalar interpret """
+
+        rc, stdout, stderr = interpret.runCaptured(self.inputs[k], state)
+        self.results[self.ids[k]] = (rc, ''.join(self.outputs[k]) + stdout, stderr)
+        self.splitInstances += 1
+
+    def split(self, mask, patch=None):
+        """ Finishes instances selected by the boolean mask in the scalar interpret and removes them.
+        Patch is called with the state and the instance index, e.g. to store a value read by READ. """
+
+        keep = []
+        for k in range(self.size()):
+            if mask[k]:
+                state = self.instanceState(k)
+                if patch is not None:
+                    patch(state, k)
+                self.finishScalar(k, state)
+            else:
+                keep.append(k)
+        if len(keep) == self.size():
+            return
+        index = np.array(keep, dtype=np.intp)
+        compact = lambda value: [value[Var.VALUE][index], value[Var.TYPE]]
+        for frame in [self.varList] + self.varStack:
+            for name, value in frame.items():
+                if value[Var.VALUE] is not None:
+                    frame[name] = compact(value)
+        self.dataStack = [compact(value) for value in self.dataStack]
+        for attribute in ('ids', 'inputs', 'outputs', 'isEOF'):
+            setattr(self, attribute, [getattr(self, attribute)[k] for k in keep])
+
+    def finishAll(self, rc=None):
+        """ Ends all active instances with the return code, or continues them in the scalar interpret """
+
+        for k in range(self.size()):
+            if rc is None:
+                self.finishScalar(k, self.instanceState(k))
+            else:
+                self.results[self.ids[k]] = (rc, ''.join(self.outputs[k]), '')
+        self.ids = []
+
+    #### operands ####
+    def decode(self, r):
+        """ Decodes an instruction once, returns the opcode and its arguments as (kind, value) pairs,
+        raises Fallback for anything the engine does not handle exactly like interpret.py """
+
+        key = id(r)
+        if key not in self._decoded:
+            try:
+                self._decoded[key] = self.decodeInstruction(r)
+            except Fallback:
+                self._decoded[key] = None
+        if self._decoded[key] is None:
+            raise Fallback()
+        return self._decoded[key]
+
+    def decodeInstruction(self, r):
+        opcode = r.get('opcode').upper()
+        if opcode not in interpret.instructionNumOfArguments.get(len(r), ()):
+            raise Fallback()
+        args = []
+        for num, arg in enumerate(sorted(r, key=lambda x: x.tag), 1):
+            expected = interpret.instructionArgumentsTypes[opcode][num - 1]
+            if opcode in ('JUMPIFEQ', 'JUMPIFNEQ') and num == 1: # listed as VAR in interpret.py
+                expected = 'LABEL'
+            typ, text = arg.get('type').upper(), arg.text
+            if text is None or typ not in {'VAR': ('VAR',), 'SYMB': ('VAR', 'INT', 'BOOL', 'NIL'),
+                                           'LABEL': ('LABEL',), 'TYPE': ('TYPE',)}[expected]:
+                raise Fallback()
+            if typ == 'INT':
+                try:
+                    text = int(text)
+                except ValueError:
+                    raise Fallback()
+                if not -INT_LIMIT < text < INT_LIMIT:
+                    raise Fallback()
+            elif typ == 'BOOL':
+                text = text == 'true'
+            args.append((typ, text))
+        return opcode, args
+
+    def checkVar(self, name):
+        if name.startswith('TF') and not self.existsTempFrame: raise Fallback()
+        if name.startswith('LF') and self.numberOfLFs == 0: raise Fallback()
+        if name not in self.varList: raise Fallback()
+
+    def symbol(self, operand):
+        """ Returns values and type of a source operand """
+
+        typ, value = operand
+        if typ == 'VAR':
+            self.checkVar(value)
+            values, typ = self.varList[value]
+            if values is None: raise Fallback()
+            return values, typ
+        if typ == 'INT':
+            return np.full(self.size(), value, dtype=np.int64), typ
+        if typ == 'BOOL':
+            return np.full(self.size(), value, dtype=np.bool_), typ
+        return np.zeros(self.size(), dtype=np.int8), typ
+
+    def bounded(self, values, limit):
+        return values.size == 0 or (int(values.min()) > -limit and int(values.max()) < limit)
+
+    #### execution ####
+    def run(self):
+        """ Runs all instances, returns a list of (return code, stdout, stderr) in order of inputs """
+
+        sortedIns, labelList = interpret.sortedIns, interpret.labelList
+        while self.ids:
+            if self.insNum >= len(sortedIns):
+                self.finishAll(0)
+                break
+            r = sortedIns[self.insNum]
+            try:
+                opcode, args = self.decode(r)
+                self.execute(opcode, args, labelList)
+            except Fallback:
+                self.finishAll()
+                break
+            self.vectorSteps += 1
+            self.insNum += 1
+        return self.results
+
+    def execute(self, opcode, args, labelList):
+        """ Executes one instruction for all instances, the state is not changed when Fallback
+        is raised. A split removes the affected instances before the instruction is executed,
+        so they execute it in the scalar interpret. """
+
+        varList = self.varList
+        if opcode in ('ADD', 'SUB', 'MUL', 'IDIV', 'LT', 'GT', 'EQ', 'AND', 'OR', 'NOT', 'MOVE'):
+            self.checkVar(args[0][1])
+            a, typeA = self.symbol(args[1])
+            b, typeB = self.symbol(args[2]) if len(args) == 3 else (None, None)
+            if opcode in ('ADD', 'SUB', 'MUL', 'IDIV'):
+                if typeA != 'INT' or typeB != 'INT': raise Fallback()
+                limit = MUL_LIMIT if opcode == 'MUL' else INT_LIMIT
+                if not self.bounded(a, limit) or not self.bounded(b, limit): raise Fallback()
+                if opcode == 'IDIV' and not b.all(): # instances dividing by zero end in the scalar interpret
+                    self.split(b == 0)
+                    return self.execute(opcode, args, labelList)
+            elif opcode in ('LT', 'GT'):
+                if typeA != typeB or typeA == 'NIL': raise Fallback()
+            elif opcode in ('AND', 'OR'):
+                if typeA != 'BOOL' or typeB != 'BOOL': raise Fallback()
+            elif opcode == 'NOT':
+                if typeA != 'BOOL': raise Fallback()
+
+            if   opcode == 'ADD':  result, typ = a + b, 'INT'
+            elif opcode == 'SUB':  result, typ = a - b, 'INT'
+            elif opcode == 'MUL':  result, typ = a * b, 'INT'
+            elif opcode == 'IDIV': result, typ = np.floor_divide(a, b), 'INT'
+            elif opcode == 'LT':   result, typ = a < b, 'BOOL'
+            elif opcode == 'GT':   result, typ = a > b, 'BOOL'
+            elif opcode == 'EQ':   result, typ = self.equal(a, typeA, b, typeB), 'BOOL'
+            elif opcode == 'AND':  result, typ = a & b, 'BOOL'
+            elif opcode == 'OR':   result, typ = a | b, 'BOOL'
+            elif opcode == 'NOT':  result, typ = ~a, 'BOOL'
+            else:                  result, typ = a, typeA
+            varList[args[0][1]] = [result, typ]
+            self.executedIns += 1
+            return
+
+        if opcode in ('JUMPIFEQ', 'JUMPIFNEQ'):
+            if args[0][1] not in labelList: raise Fallback()
+            a, typeA = self.symbol(args[1])
+            b, typeB = self.symbol(args[2])
+            condition = self.equal(a, typeA, b, typeB)
+            if opcode == 'JUMPIFNEQ':
+                condition = ~condition
+            taken, count = int(condition.sum()), self.size()
+            if 0 < taken < count: # instances in the minority continue in the scalar interpret
+                majority = taken * 2 >= count
+                self.split(condition != majority)
+                condition = np.full(self.size(), majority)
+            self.executedIns += 1
+            if condition[0]:
+                self.insNum = labelList[args[0][1]]
+            return
+
+        if opcode == 'READ':
+            name, typ = args[0][1], args[1][1].upper()
+            if typ not in ('INT', 'BOOL'): raise Fallback()
+            self.checkVar(name)
+            self.read(name, typ)
+            return
+
+        if opcode == 'WRITE':
+            values, typ = self.symbol(args[0])
+            self.executedIns += 1
+            for k in range(self.size()):
+                if typ == 'INT':    self.outputs[k].append(str(int(values[k])))
+                elif typ == 'BOOL': self.outputs[k].append('true' if values[k] else 'false')
+            return
+
+        if opcode == 'DEFVAR':
+            name = args[0][1]
+            if name in varList: raise Fallback()
+            if not (name.startswith('GF') or (name.startswith('TF') and self.existsTempFrame)
+                    or (name.startswith('LF') and self.numberOfLFs != 0)):
+                raise Fallback()
+            varList[name] = [None, None]
+        elif opcode == 'LABEL':
+            pass
+        elif opcode == 'JUMP':
+            if args[0][1] not in labelList: raise Fallback()
+            self.insNum = labelList[args[0][1]]
+        elif opcode == 'CALL':
+            if args[0][1] not in labelList: raise Fallback()
+            self.callList.append(self.insNum)
+            self.insNum = labelList[args[0][1]]
+        elif opcode == 'RETURN':
+            if not self.callList: raise Fallback()
+            self.insNum = self.callList.pop()
+        elif opcode == 'PUSHS':
+            if args[0][0] == 'VAR': raise Fallback()
+            self.dataStack.append(list(self.symbol(args[0])))
+        elif opcode == 'POPS':
+            self.checkVar(args[0][1])
+            if not self.dataStack: raise Fallback()
+            varList[args[0][1]] = self.dataStack.pop()
+        elif opcode == 'CREATEFRAME':
+            if self.existsTempFrame:
+                [varList.pop(var) for var in list(varList.keys()) if var.startswith('TF')]
+            self.IsTempFrameCreated = True
+            self.existsTempFrame = True
+        elif opcode == 'PUSHFRAME':
+            if not self.IsTempFrameCreated: raise Fallback()
+            self.numberOfLFs += 1
+            tempDict = {}
+            for var in list(varList.keys()):
+                if var.startswith('LF'):
+                    tempDict[var] = varList.pop(var)
+            self.varStack.append(tempDict)
+            for var in list(varList.keys()):
+                varList[var.replace('TF', 'LF')] = varList.pop(var)
+            self.IsTempFrameCreated = False
+            self.existsTempFrame = False
+        elif opcode == 'POPFRAME':
+            if self.numberOfLFs == 0: raise Fallback()
+            if self.existsTempFrame:
+                [varList.pop(var) for var in list(varList.keys()) if var.startswith('TF')]
+            for var in list(varList.keys()):
+                varList[var.replace('LF', 'TF')] = varList.pop(var)
+            varList.update(self.varStack.pop())
+            self.numberOfLFs -= 1
+            self.IsTempFrameCreated = True
+            self.existsTempFrame = True
+        else:
+            raise Fallback()
+        self.executedIns += 1
+
+    def equal(self, a, typeA, b, typeB):
+        """ Elementwise EQ with the type rules of interpret.py, nil equals only nil """
+
+        if typeA != typeB:
+            if typeA != 'NIL' and typeB != 'NIL': raise Fallback()
+            return np.zeros(self.size(), dtype=np.bool_)
+        if typeA == 'NIL':
+            return np.ones(self.size(), dtype=np.bool_)
+        return a == b
+
+    def read(self, name, typ):
+        """ READ of int or bool, instances whose result has another type than the majority
+        (or an int out of range) are finished in the scalar interpret after the READ """
+
+        values, types = [], []
+        for k in range(self.size()):
+            inputValue = self.inputs[k].readline()
+            if not inputValue: self.isEOF[k] = True
+            if self.isEOF[k] == False and inputValue[-1] == '\n':
+                inputValue = inputValue[:-1]
+            if typ == 'BOOL':
+                values.append(inputValue.lower() == 'true')
+                types.append('BOOL')
+                continue
+            try:
+                values.append(int(inputValue))
+                types.append('INT')
+            except:
+                values.append(Val.NIL)
+                types.append('NIL')
+
+        self.executedIns += 1
+        majority = max(('INT', 'NIL', 'BOOL'), key=types.count)
+        fits = lambda k: types[k] != 'INT' or -INT_LIMIT < values[k] < INT_LIMIT
+        ok = [types[k] == majority and fits(k) for k in range(self.size())]
+        if not all(ok):
+            def patch(state, k):
+                state['varList'][name] = [values[k], types[k]]
+                state['insNum'] += 1
+            selected = [k for k in range(self.size()) if ok[k]]
+            self.split([not flag for flag in ok], patch)
+            values = [values[k] for k in selected]
+        if not self.ids:
+            return
+        if majority == 'INT':
+            self.varList[name] = [np.array(values, dtype=np.int64), 'INT']
+        elif majority == 'BOOL':
+            self.varList[name] = [np.array(values, dtype=np.bool_), 'BOOL']
+        else:
+            self.varList[name] = [np.zeros(self.size(), dtype=np.int8), 'NIL']
+
+def runVector(inputFiles):
+    """ Runs the loaded program for all input files in lock-step, returns the results
+    and the engine with its counters """
+
+    inputs = [open(inputFile, 'r') for inputFile in inputFiles]
+    engine = LockStep(inputs)
+    results = engine.run()
+    for f in inputs:
+        f.close()
+    return results, engine
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IPP Interpret, experimental lock-step engine")
+    parser.add_argument("--source", action="store", dest="source", required=True)
+    parser.add_argument("--batch", action="store", dest="batch", required=True,
+                        help="directory with *.in files or a file listing the input files")
+    parser.add_argument("--batch-output", action="store", dest="batchOutput", default="batch_results")
+    arguments = parser.parse_args()
+    if np is None:
+        print('interpret_vector.py requires NumPy', file=sys.stderr)
+        exit(99)
+    if not os.path.exists(arguments.source) or not os.path.exists(arguments.batch):
+        exit(11)
+
+    program = interpret.Program(arguments.source)
+    program.executeProgram()
+    inputFiles = interpret.findBatchInputs(arguments.batch)
+    os.makedirs(arguments.batchOutput, exist_ok=True)
+
+    start = time.perf_counter()
+    results, engine = runVector(inputFiles)
+    elapsed = time.perf_counter() - start
+    for inputFile, (rc, stdout, stderr) in zip(inputFiles, results):
+        interpret.writeRunResult(inputFile, arguments.batchOutput, rc, stdout, stderr)
+    interpret.writeBatchSummary(arguments.batchOutput, [(inputFile, rc, 0.0) for inputFile, (rc, _, _) in zip(inputFiles, results)],
+                                1, elapsed)
+    print('%d vector steps, %d of %d instances split off' % (engine.vectorSteps, engine.splitInstances, len(inputFiles)),
+          file=sys.stderr)
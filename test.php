@@ -13,8 +13,21 @@ function printHelp_EN() {
     echo "  --int-only  - Test only interpreter\n";
     echo "  --jexampath=[path]  - Path to directory containing jexamxml.jar\n";
     echo "  --noclean  - Don't remove temporary files\n";
+    echo "  --manifest=[file]  - Write a JSON manifest of discovered tests with expected durations and exit\n";
+    echo "  --durations=[file]  - JSON results (--json or --jsonl) or manifest of a previous run used as historical durations\n";
+    echo "  --shard=[i/n]  - Run only the i-th of n shards balanced by expected duration (1 <= i <= n)\n";
+    echo "  --json=[file]  - Write test results as JSON\n";
+    echo "  --jsonl=[file]  - Append every test result to the file as a JSON line as soon as the test finishes\n";
+    echo "  --junit=[file]  - Write test results as JUnit XML, also as soon as each test finishes\n";
+    echo "  --merge=[file,...]  - Merge JSON results (--json or --jsonl, also of an interrupted run) into one report, no tests are run\n";
+    echo "  --index=[file]  - Index of discovered tests, by default in the temporary directory\n";
 }
 
+// Extensions of files of a test
+const TEST_EXTENSIONS = array("src", "in", "out", "rc");
+// Version of the format of the discovery index
+const DISCOVERY_INDEX_VERSION = 1;
+
 //$flag_directory = true;
 $flag_recursive = false;
 $flag_parseScript = false;
@@ -23,23 +36,47 @@ $flag_parseOnly = false;
 $flag_intOnly = false;
 $flag_jexampath = false;
 $flag_noClean = false;
+$flag_manifest = false;
+$flag_durations = false;
+$flag_shard = false;
+$flag_json = false;
+$flag_merge = false;
+$flag_index = false;
+$flag_jsonl = false;
+$flag_junit = false;
 $flag_directoryPath = ".";
 $flag_parseScriptFile = "parse.php";
 $flag_intScriptFile = "interpret.py";
 $flag_jexampathPath = "/pub/courses/ipp/jexamxml/";
+$flag_manifestFile = "";
+$flag_durationsFile = "";
+$flag_shardIndex = 1;
+$flag_shardCount = 1;
+$flag_jsonFile = "";
+$flag_mergeFiles = array();
+$flag_indexFile = "";
+$flag_jsonlFile = "";
+$flag_junitFile = "";
 
 
 /**
- * Check if flag format is correct
+ * Return value of the flag, the value must not be empty
  */
-function checkFlag($arg) {
+function getFlagValue($arg) {
     $flagText = explode("=", $arg, 2);
     if(sizeof($flagText) == 1 || $flagText[1] == "") {
         printHelp_EN();
         fwrite(STDERR, "Incomplete flag: " . $arg . "\n");
         exit(41);
     }
-    $fileName = $flagText[1];
+    return $flagText[1];
+}
+
+/**
+ * Check if flag format is correct
+ */
+function checkFlag($arg) {
+    $fileName = getFlagValue($arg);
     
     if(!file_exists($fileName)) {
         fwrite(STDERR, "$fileName not found");
@@ -49,6 +86,18 @@ function checkFlag($arg) {
     return $fileName;
 }
 
+/**
+ * Check format of the --shard=i/n flag and return [i, n]
+ */
+function checkShardFlag($arg) {
+    $value = getFlagValue($arg);
+    if(!preg_match("/^([0-9]+)\/([0-9]+)$/", $value, $match) || intval($match[1]) < 1 || intval($match[1]) > intval($match[2])) {
+        fwrite(STDERR, "Invalid shard: " . $value . ", expected i/n with 1 <= i <= n\n");
+        exit(10);
+    }
+    return array(intval($match[1]), intval($match[2]));
+}
+
 /**
  * Parse command line input flags
  */
@@ -64,7 +113,24 @@ function parseFlags($argv) {
             $flag_directoryPath,
             $flag_parseScriptFile,
             $flag_intScriptFile,
-            $flag_jexampathPath;
+            $flag_jexampathPath,
+            $flag_manifest,
+            $flag_durations,
+            $flag_shard,
+            $flag_json,
+            $flag_merge,
+            $flag_manifestFile,
+            $flag_durationsFile,
+            $flag_shardIndex,
+            $flag_shardCount,
+            $flag_jsonFile,
+            $flag_mergeFiles,
+            $flag_index,
+            $flag_indexFile,
+            $flag_jsonl,
+            $flag_jsonlFile,
+            $flag_junit,
+            $flag_junitFile;
 
     for($i = 1; $i < sizeof($argv); $i++) {
         switch($argv[$i]) {
@@ -104,12 +170,56 @@ function parseFlags($argv) {
             if(!str_ends_with($flag_jexampathPath, "/")) {
                 $flag_jexampathPath = $flag_jexampathPath."/";
             }
+        } else if($flagName == "--manifest") {
+            $flag_manifest = true;
+            $flag_manifestFile = getFlagValue($argv[$i]);
+        } else if($flagName == "--durations") {
+            $flag_durations = true;
+            $flag_durationsFile = checkFlag($argv[$i]);
+        } else if($flagName == "--shard") {
+            $flag_shard = true;
+            list($flag_shardIndex, $flag_shardCount) = checkShardFlag($argv[$i]);
+        } else if($flagName == "--json") {
+            $flag_json = true;
+            $flag_jsonFile = getFlagValue($argv[$i]);
+        } else if($flagName == "--merge") {
+            $flag_merge = true;
+            foreach(explode(",", getFlagValue($argv[$i])) as $mergeFile) {
+                if(!file_exists($mergeFile)) {
+                    fwrite(STDERR, "$mergeFile not found");
+                    exit(41);
+                }
+                array_push($flag_mergeFiles, $mergeFile);
+            }
+        } else if($flagName == "--index") {
+            $flag_index = true;
+            $flag_indexFile = getFlagValue($argv[$i]);
+        } else if($flagName == "--jsonl") {
+            $flag_jsonl = true;
+            $flag_jsonlFile = getFlagValue($argv[$i]);
+        } else if($flagName == "--junit") {
+            $flag_junit = true;
+            $flag_junitFile = getFlagValue($argv[$i]);
         } else {
             fwrite(STDERR, "Unknown flag: " . $argv[$i]);
             exit(10);
         }
     }
 
+    // Merging only reads JSON results, no scripts are needed
+    if($flag_merge) {
+        if($flag_manifest || $flag_shard) {
+            fwrite(STDERR, "Incorrect flag combination [--merge && (--manifest || --shard)]");
+            exit(10);
+        }
+        // The stream of results is truncated before the merged files are read
+        if($flag_jsonl && in_array(realpath($flag_jsonlFile), array_map("realpath", $flag_mergeFiles), true)) {
+            fwrite(STDERR, "Incorrect flag combination [--jsonl is one of the --merge files]");
+            exit(10);
+        }
+        return;
+    }
+
     // Check incorrect flag combinations and missing files
     if($flag_intOnly) {
         if($flag_parseOnly || $flag_parseScript || $flag_jexampath) {
@@ -207,57 +317,145 @@ class TestFile {
         $this->outFile = NULL;
         $this->rcFile = NULL;
     }
+
+    // Input file of the test, a missing .in file is an empty input
+    public function getInputFile(): string {
+        if($this->inFile == NULL) {
+            return DIRECTORY_SEPARATOR == "\\" ? "NUL" : "/dev/null";
+        }
+        return $this->inFile->getName().".in";
+    }
+
+    // Expected output, a missing .out file is an empty output
+    public function getExpectedOut() {
+        return $this->outFile == NULL ? NULL : getFileContent($this->outFile->getName().".out");
+    }
+
+    // Expected return code, a missing .rc file is 0
+    public function getExpectedRc() {
+        return $this->rcFile == NULL ? "0" : getFileContent($this->rcFile->getName().".rc");
+    }
 }
 
 /**
- * Wrapper for RecursiveDirectoryIterator
- * finds only src/rc/out/in files 
+ * Finds tests (src/in/out/rc files) by scandir, nothing is written into the test tree.
+ * Listings of directories are kept in an index file outside of the tree, a directory
+ * is listed again only if its mtime changed, otherwise only its mtime is read.
  */
-class RecursiveDirectoryIteratorWrapper {
+class TestDiscovery {
     private $testFiles;
+    private $root;         // Tested directory
+    private $index;        // Path relative to the root => listing of the directory
+    private $indexFile;
+    private $indexChanged;
 
     private int $current;
 
-    public function __construct() {
+    public function __construct(string $indexFile) {
         $this->current = 0;
         $this->testFiles = array();
+        $this->root = rtrim($GLOBALS["flag_directoryPath"], "/\\");
+        if($this->root == "") {
+            $this->root = "/";
+        }
+        $this->indexFile = $indexFile;
+        $this->index = $this->loadIndex();
+        $this->indexChanged = false;
+
+        $this->discoverFiles();
+        if($this->indexChanged) {
+            $this->saveIndex();
+        }
+    }
+
+    private function loadIndex() {
+        if(!is_file($this->indexFile)) {
+            return array();
+        }
+        $data = json_decode(file_get_contents($this->indexFile), true);
+        if(!is_array($data) || ($data["version"] ?? NULL) !== DISCOVERY_INDEX_VERSION
+            || ($data["root"] ?? NULL) !== realpath($this->root) || !is_array($data["directories"] ?? NULL)) {
+            return array();
+        }
+        return $data["directories"];
+    }
 
-        $this->iterateFiles();
+    // The index is only a cache, it is not written if the temporary directory is not writable
+    private function saveIndex() {
+        $data = array("version" => DISCOVERY_INDEX_VERSION, "root" => realpath($this->root), "directories" => $this->index);
+        $tempFile = $this->indexFile.".".getmypid();
+        if(@file_put_contents($tempFile, json_encode($data, JSON_UNESCAPED_SLASHES)) !== false) {
+            @rename($tempFile, $this->indexFile);
+        }
     }
 
-    private function iterateFiles() {
-        $rdi = new RecursiveDirectoryIterator($GLOBALS["flag_directoryPath"]);
-        $iterators = array();
+    private function getDirectory(string $relative): string {
+        return $relative == "" ? $this->root : $this->root."/".$relative;
+    }
 
-        array_push($iterators, $rdi);
+    /**
+     * Return the listing of the directory, the indexed one if the directory did not change.
+     * A change in the same second as the listing does not change the mtime, so such a listing
+     * is not trusted and the directory is listed again next time.
+     */
+    private function listDirectory(string $relative) {
+        $dir = $this->getDirectory($relative);
+        $mtime = @filemtime($dir);
+
+        if(array_key_exists($relative, $this->index)) {
+            $listing = $this->index[$relative];
+            if($listing["mtime"] === $mtime && $mtime < $listing["listed"]) {
+                return $listing;
+            }
+        }
 
-        while(!empty($iterators)) {
-            $it = array_pop($iterators);
-            $dirFiles = array();
+        $listing = array("mtime" => $mtime, "listed" => time(), "real" => realpath($dir), "files" => array(), "dirs" => array());
+        foreach(@scandir($dir) ?: array() as $name) {
+            if($name == "." || $name == "..") {
+                continue;
+            }
+            if(in_array(pathinfo($name, PATHINFO_EXTENSION), TEST_EXTENSIONS)) {
+                array_push($listing["files"], $name);
+            } else if(is_dir($dir."/".$name) && !is_link($dir."/".$name)) {
+                array_push($listing["dirs"], $name);
+            }
+        }
+        $this->index[$relative] = $listing;
+        $this->indexChanged = true;
+        return $listing;
+    }
 
-            while($it->valid()) {
-                // Directory
-                if($it->hasChildren() && $GLOBALS["flag_recursive"]) {
-                    array_push($iterators, $it->getChildren());
-                } else {
-                    $name = new FileName($it->getRealPath(), $it->getPath());
-                    $extension = $name->getExt();
+    private function discoverFiles() {
+        $listed = array();
+        $directories = array("");
 
-                    if($extension == "src" || $extension == "rc" || $extension == "in" || $extension == "out") {
-                        array_push($dirFiles, $name);
-                    }
+        while(!empty($directories)) {
+            $relative = array_pop($directories);
+            $listing = $this->listDirectory($relative);
+            $listed[$relative] = $listing;
+
+            if($GLOBALS["flag_recursive"]) {
+                foreach($listing["dirs"] as $name) {
+                    array_push($directories, $relative == "" ? $name : $relative."/".$name);
                 }
-                $it->next();
             }
-            $this->addTestFiles($dirFiles);
+            $this->addTestFiles($this->getDirectory($relative), $listing);
+        }
+
+        // Directories removed from the tree are removed from the index
+        if($GLOBALS["flag_recursive"] && count($listed) != count($this->index)) {
+            $this->index = $listed;
+            $this->indexChanged = true;
         }
     }
 
-    private function addTestFiles($dirFiles) {
+    // Missing .in, .out and .rc files are left NULL, TestFile gives their default values
+    private function addTestFiles(string $dir, $listing) {
         $found = array();
 
         // Go through each file found in directory and add them
-        foreach($dirFiles as $file) {
+        foreach($listing["files"] as $fileName) {
+            $file = new FileName($listing["real"]."/".$fileName, $dir);
             $extension = $file->getExt();
             $name = $file->getName();
 
@@ -276,40 +474,17 @@ class RecursiveDirectoryIteratorWrapper {
             }
         }
 
-        // Go through each test and create .in, .out or .rc files as needed
-        foreach($found as &$testFile) {
-            if($testFile->srcFile == NULL) {
-                continue;
-            }
-
-            if($testFile->inFile == NULL) {
-                $inFileName = $testFile->srcFile->getName().".in";
-                $f = fopen($inFileName, "w");
-                fclose($f);
-
-                $testFile->inFile = new FileName($inFileName, $testFile->srcFile->getPath());
-            }
-
-            if($testFile->outFile == NULL) {
-                $outFileName = $testFile->srcFile->getName().".out";
-                $f = fopen($outFileName, "w");
-                fclose($f);
-
-                $testFile->outFile = new FileName($outFileName, $testFile->srcFile->getPath());
-            }
-
-            if($testFile->rcFile == NULL) {
-                $rcFileName = $testFile->srcFile->getName().".rc";
-                $f = fopen($rcFileName, "w");
-                fwrite($f, "0");
-                fclose($f);
-
-                $testFile->rcFile = new FileName($rcFileName, $testFile->srcFile->getPath());
+        foreach($found as $testFile) {
+            if($testFile->srcFile != NULL) {
+                array_push($this->testFiles, $testFile);
             }
-            array_push($this->testFiles, $testFile);
         }
     }
 
+    public function getTestFiles() {
+        return $this->testFiles;
+    }
+
     public function next() {
         if($this->current == count($this->testFiles)) {
             return NULL;
@@ -331,6 +506,9 @@ class Test {
     public $expectedOut;
     public $expectedRc;
 
+    public $testId;
+    public $duration;
+
     public function __construct($testName, $testPath, $output, $returnCode, $expectedOut, $expectedRc) {
         $this->testName = $testName;
         $this->testPath = $testPath;
@@ -343,27 +521,53 @@ class Test {
 }
 
 /**
- * Holds all the test results
+ * Counts test results and writes every result as soon as it is added: a JSON line to the stream
+ * of results and optionally a test case of JUnit XML. Results are not kept in memory, reports are
+ * generated afterwards by reading the stream back, so an interrupted run leaves its results so far.
  */
 class TestEnv {
-    private $tests;
     private $okTestCount;
     private $failedTestCount;
+    private $resultsFile;
+    private $results; // JSON lines, one result per line
+    private $junit;   // JUnit XML or NULL
 
-    public function __construct() {
-        $this->tests = array();
+    private $currentId;
+    private $currentStart;
+
+    public function __construct(string $resultsFile, $junitFile) {
         $this->okTestCount = 0;
         $this->failedTestCount = 0;
+        $this->currentId = NULL;
+        $this->currentStart = hrtime(true);
+
+        $this->resultsFile = $resultsFile;
+        $this->results = openOutputFile($resultsFile);
+        $this->junit = NULL;
+        if($junitFile !== NULL) {
+            $this->junit = openOutputFile($junitFile);
+            fwrite($this->junit, "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<testsuites>\n<testsuite name=\"test.php\">\n");
+            fflush($this->junit);
+        }
+    }
+
+    // Start measuring duration of the test added next
+    public function begin($testId) {
+        $this->currentId = $testId;
+        $this->currentStart = hrtime(true);
     }
 
+    // Add the result of a test which has just finished and write it out
     public function add($testName, $testPath, $out, $rc, $expectedOut, $expectedRc, $forceResult = NULL) {
-        $t = new Test($testName, $testPath, $out, $rc, $expectedOut, $expectedRc);
+        $this->write($this->createTest($testName, $testPath, $out, $rc, $expectedOut, $expectedRc, $forceResult));
+    }
 
-        if(!array_key_exists($testPath, $this->tests)) {
-            $this->tests[$testPath] = array();
-        }
+    private function createTest($testName, $testPath, $out, $rc, $expectedOut, $expectedRc, $forceResult) {
+        $t = new Test($testName, $testPath, $out, $rc, $expectedOut, $expectedRc);
+        $t->testId = $this->currentId;
+        $t->duration = (hrtime(true) - $this->currentStart) / 1e9;
 
-        if($forceResult == NULL) {
+        if($forceResult === NULL) {
             // Check output and return codes
             if($out == $expectedOut && strval($rc) == $expectedRc) {
                 $t->isOk = True;
@@ -381,16 +585,94 @@ class TestEnv {
                 $this->failedTestCount++;
             }
         }
-        array_push($this->tests[$testPath], $t);
+        return $t;
     }
-    
-    // Generate html from the test results
-    public function getHtml() {
+
+    // Add a test result loaded from a JSON results file (see getRecord)
+    public function addRecord($record) {
+        $this->currentId = $record["id"];
+        $t = $this->createTest($record["name"], $record["path"], $record["output"], $record["rc"],
+                               $record["expectedOutput"], $record["expectedRc"], (bool)$record["ok"]);
+        $t->duration = floatval($record["duration"]);
+        $this->write($t);
+    }
+
+    // JSON record of the test result, paths are relative to the tested directory
+    private function getRecord(Test $t) {
+        $path = dirname($t->testId);
+        return array(
+            "id" => $t->testId,
+            "name" => $t->testName,
+            "path" => $path == "." ? "" : $path,
+            "ok" => $t->isOk,
+            "rc" => $t->returnCode,
+            "expectedRc" => $t->expectedRc,
+            "output" => $t->output,
+            "expectedOutput" => $t->expectedOut,
+            "duration" => $t->duration,
+        );
+    }
+
+    // Append the result to the stream and the JUnit XML, flushed so they are complete if the run is killed
+    private function write(Test $t) {
+        $record = $this->getRecord($t);
+        fwrite($this->results, json_encode($record, JSON_UNESCAPED_SLASHES | JSON_INVALID_UTF8_SUBSTITUTE)."\n");
+        fflush($this->results);
+
+        if($this->junit !== NULL) {
+            $case = "<testcase classname=\"".xmlText($record["path"] == "" ? "." : $record["path"])."\" name=\"".
+                    xmlText($t->testName)."\" time=\"".sprintf("%.6F", $t->duration)."\"";
+            if($t->isOk) {
+                $case = $case."/>\n";
+            } else {
+                $case = $case.">\n<failure message=\"".xmlText("Return code ".$t->returnCode.", expected ".$t->expectedRc)."\">".
+                        xmlText("Output:\n".$t->output."\nExpected output:\n".$t->expectedOut)."</failure>\n</testcase>\n";
+            }
+            fwrite($this->junit, $case);
+            fflush($this->junit);
+        }
+    }
+
+    // Close the stream of results and the JUnit XML after the last test
+    public function finish() {
+        fclose($this->results);
+        if($this->junit !== NULL) {
+            fwrite($this->junit, "</testsuite>\n</testsuites>\n");
+            fclose($this->junit);
+        }
+    }
+
+    // Read the results back from the stream, one record at a time
+    private function readResults() {
+        $f = fopen($this->resultsFile, "r");
+        while(($line = fgets($f)) !== false) {
+            $record = json_decode($line, true);
+            if(is_array($record)) {
+                yield $record;
+            }
+        }
+        fclose($f);
+    }
+
+    // Write the results as one JSON document, record by record
+    public function writeJson(string $fileName) {
+        $f = openOutputFile($fileName);
+        $separator = "\n";
+        fwrite($f, "{\"tests\": [");
+        foreach($this->readResults() as $record) {
+            fwrite($f, $separator.json_encode($record, JSON_UNESCAPED_SLASHES | JSON_INVALID_UTF8_SUBSTITUTE));
+            $separator = ",\n";
+        }
+        fwrite($f, "\n]}\n");
+        fclose($f);
+    }
+
+    // Print the html report, the tables are printed while the stream of results is read
+    public function printHtml() {
         $testCount = $this->okTestCount + $this->failedTestCount;
 
-        // Generate html page
         // Beginning of HTML Page
-        $html = "<!DOCTYPE html>
+        print("<!DOCTYPE html>
 <head>
     <meta charset=\"UTF-8\">
     <meta name=\"description\" content=\"Test results\">
@@ -408,79 +690,96 @@ class TestEnv {
     <h2>Passed: ". $this->okTestCount ." </h2>
     <h2>Failed: ". $this->failedTestCount ." </h2>
     <hr>
-    <h3 style=\"text-align: center; color:red\">Failed tests</h3>";
-
-        // Go through each directory and find failed tests
-        foreach ($this->tests as $testPath => $arr) {
-            $first = True;
-            // Go through each test in a directory
-            foreach ($arr as $val) {
-                if($val->isOk) {
-                    continue;
-                }
-                // Only add new table, when a failed test exists
-                if($first) {
-                    $first = False;
-                    $html = $html."<hr><h4>".$testPath."</h4>".
-                    "<table>".
-                    "<tr>".
-                    "<th>Test name</th>".
-                    "<th>Return code</th>".
-                    "<th>Expected return code</th>".
-                    "<th>Output</th>".
-                    "<th>Expected output</th>".
-                    "</tr>";
-                }
+    <h3 style=\"text-align: center; color:red\">Failed tests</h3>");
+
+        $this->printTables(False);
+        print("<hr><h3 style=\"text-align: center; color:green\">Passed tests</h3>");
+        $this->printTables(True);
+        print("</body></html>");
+    }
 
-                $html = $html.
-                "\n<tr>".
-                "<td>".$val->testName."</td>".
-                "<td>".$val->returnCode."</td>".
-                "<td>".$val->expectedRc."</td>".
-                "<td><textarea readonly rows=5 cols=50>".$val->output."</textarea></td>".
-                "<td><textarea readonly rows=5 cols=50>".$val->expectedOut."</textarea></td>".
-                "</tr>\n";
+    // Byte offsets of the failed or passed records in the stream, grouped by directory.
+    // Sorted by id like the manifest, so merged shards give the same report as one run.
+    private function groupResults(bool $passed) {
+        $entries = array();
+        $f = fopen($this->resultsFile, "r");
+        while(true) {
+            $offset = ftell($f);
+            if(($line = fgets($f)) === false) {
+                break;
             }
-            if(!$first) {
-                $html = $html."\n</table>\n";
+            $record = json_decode($line, true);
+            if(is_array($record) && $record["ok"] == $passed) {
+                array_push($entries, array($record["id"], $record["path"] == "" ? "." : $record["path"], $offset));
             }
         }
+        fclose($f);
 
-        $html = $html."<hr><h3 style=\"text-align: center; color:green\">Passed tests</h3>";
+        usort($entries, fn($a, $b) => strcmp($a[0], $b[0]));
+        $groups = array();
+        foreach($entries as $entry) {
+            $groups[$entry[1]][] = $entry[2];
+        }
+        return $groups;
+    }
 
-        // Go through each directory and find passed tests
-        foreach ($this->tests as $testPath => $arr) {
-            $first = True;
-            // Go through each test in a directory
-            foreach ($arr as $val) {
-                if(!$val->isOk) {
-                    continue;
-                }
-                // Only add new table, when a successful test exists
-                if($first) {
-                    $first = False;
-                    $html = $html."<hr><h4>".$testPath."</h4><table>".
-                    "<tr>".
-                    "<th>Test name</th>".
-                    "<th>Return code</th>".
-                    "<th>Output</th>".
-                    "</tr>";
+    // Print tables of failed or passed tests, one table per directory, the records are read back one at a time
+    private function printTables(bool $passed) {
+        $f = fopen($this->resultsFile, "r");
+        foreach($this->groupResults($passed) as $testPath => $offsets) {
+            print("<hr><h4>".$testPath."</h4>".
+                "<table>".
+                "<tr>".
+                "<th>Test name</th>".
+                "<th>Return code</th>".
+                ($passed ? "" : "<th>Expected return code</th>").
+                "<th>Output</th>".
+                ($passed ? "" : "<th>Expected output</th>").
+                "</tr>");
+
+            foreach($offsets as $offset) {
+                fseek($f, $offset);
+                $record = json_decode(fgets($f), true);
+                if($passed) {
+                    print("\n<tr>".
+                    "<td>".$record["name"]."</td>".
+                    "<td>".$record["rc"]."</td>".
+                    "<td><textarea readonly rows=5 cols=50>".$record["expectedOutput"]."</textarea></td>".
+                    "</tr>\n");
+                } else {
+                    print("\n<tr>".
+                    "<td>".$record["name"]."</td>".
+                    "<td>".$record["rc"]."</td>".
+                    "<td>".$record["expectedRc"]."</td>".
+                    "<td><textarea readonly rows=5 cols=50>".$record["output"]."</textarea></td>".
+                    "<td><textarea readonly rows=5 cols=50>".$record["expectedOutput"]."</textarea></td>".
+                    "</tr>\n");
                 }
-
-                $html = $html.
-                "\n<tr>".
-                "<td>".$val->testName."</td>".
-                "<td>".$val->returnCode."</td>".
-                "<td><textarea readonly rows=5 cols=50>".$val->expectedOut."</textarea></td>".
-                "</tr>\n";
-            }
-            if(!$first) {
-                $html = $html."\n</table>\n";
             }
+            print("\n</table>\n");
         }
+        fclose($f);
+    }
+}
 
-        return $html."</body></html>";
+/**
+ * Open a file for writing, exit if it cannot be written
+ */
+function openOutputFile(string $name) {
+    $f = @fopen($name, "w");
+    if($f === false) {
+        fwrite(STDERR, "Cannot write ".$name."\n");
+        exit(12);
     }
+    return $f;
+}
+
+/**
+ * Escape text for XML, invalid UTF-8 is substituted and characters not allowed in XML are removed
+ */
+function xmlText($text) {
+    $text = htmlspecialchars(strval($text), ENT_XML1 | ENT_QUOTES | ENT_SUBSTITUTE, "UTF-8");
+    return preg_replace('/[\x00-\x08\x0B\x0C\x0E-\x1F]/', "", $text);
 }
 
 /**
@@ -498,35 +797,187 @@ function getFileContent(string $name) {
 }
 
 /**
- * Invoke diff and return true, if the 2 files have the same content
+ * Run the parser on the source and the interpreter on its XML. The standard output of the parser
+ * is connected to the standard input of the interpreter by a pipe, so the interpreter loads the
+ * program while the parser writes it and no temporary file is needed. Return the output of the
+ * interpreter and the return code of the parser if it failed, otherwise of the interpreter.
  */
-function diff2files(string $fileName1, string $fileName2) {
-    // Setup diff
-    $diffOutput = NULL;
-    $diffRc = NULL;
-    if (strtoupper(substr(PHP_OS, 0, 3)) === 'WIN') {
-        $diffCmd = "FC ".$fileName1." ".$fileName2; // Windows "diff"
-    } else {
-        $diffCmd = "diff ".$fileName1." ".$fileName2; // diff
+function parseAndInterpret(string $parseScript, string $intScript, string $srcFile, string $inFile) {
+    $parser = proc_open(array("php", $parseScript), array(0 => array("file", $srcFile, "r"), 1 => array("pipe", "w")), $parserPipes);
+    $interpreter = proc_open(array("python3", $intScript, "--input=".$inFile), array(0 => $parserPipes[1], 1 => array("pipe", "w")), $intPipes);
+    fclose($parserPipes[1]); // the interpreter has its own end of the pipe
+
+    $output = stream_get_contents($intPipes[1]);
+    fclose($intPipes[1]);
+    $intRc = proc_close($interpreter);
+    $parseRc = proc_close($parser);
+    return array($output, $parseRc != 0 ? $parseRc : $intRc);
+}
+
+/**
+ * Read a JSON results file (--json or --jsonl) or a manifest (--manifest), exit if it is not valid.
+ * The last line of JSON lines may be cut by an interrupted run, such a line is skipped.
+ */
+function loadJsonTests(string $fileName) {
+    $text = file_get_contents($fileName);
+    $data = json_decode($text, true);
+    if(is_array($data) && array_key_exists("tests", $data) && is_array($data["tests"])) {
+        return $data["tests"];
+    }
+
+    $tests = array();
+    foreach(explode("\n", $text) as $line) {
+        $record = json_decode($line, true);
+        if(is_array($record) && array_key_exists("id", $record)) {
+            array_push($tests, $record);
+        }
+    }
+    if(empty($tests) && trim($text) != "") {
+        fwrite(STDERR, "Invalid JSON test file: ".$fileName."\n");
+        exit(41);
     }
+    return $tests;
+}
+
+/**
+ * Test identifier, path of the test relative to the tested directory without extension
+ */
+function getTestId(TestFile $testFile) {
+    $root = realpath($GLOBALS["flag_directoryPath"]);
+    $name = str_replace("\\", "/", $testFile->srcFile->getName());
+    $root = rtrim(str_replace("\\", "/", $root), "/")."/";
 
-    exec($diffCmd, $diffOutput, $diffRc);
+    if(str_starts_with($name, $root)) {
+        $name = substr($name, strlen($root));
+    }
+    return $name;
+}
 
-    return ($diffRc == 0);
+/**
+ * Pair every discovered test with its expected duration, tests without history get
+ * the average duration of the known ones. Sorted by id, so every machine gets the same order.
+ */
+function buildManifest($testFiles, $durations) {
+    $average = count($durations) > 0 ? array_sum($durations) / count($durations) : 1.0;
+    $manifest = array();
+
+    foreach($testFiles as $testFile) {
+        $id = getTestId($testFile);
+        $known = array_key_exists($id, $durations);
+        array_push($manifest, array(
+            "id" => $id,
+            "duration" => $known ? $durations[$id] : $average,
+            "known" => $known,
+            "file" => $testFile,
+        ));
+    }
+    usort($manifest, fn($a, $b) => strcmp($a["id"], $b["id"]));
+    return $manifest;
+}
+
+/**
+ * Split the manifest into shards with similar expected runtime and return the selected one.
+ * Longest tests go first, each test is given to the shard with the lowest total so far.
+ */
+function selectShard($manifest, int $index, int $count) {
+    $byDuration = $manifest;
+    usort($byDuration, function($a, $b) {
+        if($a["duration"] == $b["duration"]) {
+            return strcmp($a["id"], $b["id"]);
+        }
+        return $a["duration"] < $b["duration"] ? 1 : -1;
+    });
+
+    $loads = array_fill(0, $count, 0.0);
+    $selected = array();
+    foreach($byDuration as $entry) {
+        $lightest = 0;
+        for($s = 1; $s < $count; $s++) {
+            if($loads[$s] < $loads[$lightest]) {
+                $lightest = $s;
+            }
+        }
+        $loads[$lightest] += $entry["duration"];
+        if($lightest == $index - 1) {
+            array_push($selected, $entry);
+        }
+    }
+    usort($selected, fn($a, $b) => strcmp($a["id"], $b["id"]));
+    return $selected;
+}
+
+/**
+ * Finish the stream of results, write the JSON results and print the html report from the stream
+ */
+function writeReports(TestEnv $testEnv, string $resultsFile) {
+    global $flag_json, $flag_jsonFile, $flag_jsonl, $flag_noClean;
+
+    $testEnv->finish();
+    if($flag_json) {
+        $testEnv->writeJson($flag_jsonFile);
+    }
+    $testEnv->printHtml();
+
+    // Without --jsonl the stream of results is a temporary file
+    if(!$flag_jsonl && !$flag_noClean) {
+        unlink($resultsFile);
+    }
 }
 
 // Parse command line arguments
 parseFlags($argv);
 
-// Init directory iterator
-$rdi = new RecursiveDirectoryIteratorWrapper();
-$file = $rdi->next();
+$resultsFile = $flag_jsonl ? $flag_jsonlFile : sys_get_temp_dir()."/ipp-test-results-".getmypid().".jsonl";
+$junitFile = $flag_junit ? $flag_junitFile : NULL;
+
+// Merge results of several shards into one report
+if($flag_merge) {
+    $testEnv = new TestEnv($resultsFile, $junitFile);
+    foreach($flag_mergeFiles as $mergeFile) {
+        foreach(loadJsonTests($mergeFile) as $record) {
+            $testEnv->addRecord($record);
+        }
+    }
+    writeReports($testEnv, $resultsFile);
+    exit(0);
+}
+
+// Discover tests
+if(!$flag_index) {
+    $flag_indexFile = sys_get_temp_dir()."/ipp-test-index-".md5(realpath($flag_directoryPath)).".json";
+}
+$rdi = new TestDiscovery($flag_indexFile);
+
+// Historical durations of the tests
+$durations = array();
+if($flag_durations) {
+    foreach(loadJsonTests($flag_durationsFile) as $record) {
+        $durations[$record["id"]] = floatval($record["duration"]);
+    }
+}
+$manifest = buildManifest($rdi->getTestFiles(), $durations);
+
+if($flag_manifest) {
+    $entries = array();
+    foreach($manifest as $entry) {
+        array_push($entries, array("id" => $entry["id"], "duration" => $entry["duration"], "known" => $entry["known"]));
+    }
+    file_put_contents($flag_manifestFile, json_encode(array("tests" => $entries), JSON_PRETTY_PRINT | JSON_UNESCAPED_SLASHES));
+    exit(0);
+}
+
+if($flag_shard) {
+    $manifest = selectShard($manifest, $flag_shardIndex, $flag_shardCount);
+}
 
-$testEnv = new TestEnv();
+$testEnv = new TestEnv($resultsFile, $junitFile);
 $filesToRemove = array();
 
 // Go through each testfile
-while($file != NULL) {
+foreach($manifest as $entry) {
+    $file = $entry["file"];
+    $testEnv->begin($entry["id"]);
+
     if($flag_intOnly) {
         // Setup
         $output = NULL;
@@ -534,38 +985,33 @@ while($file != NULL) {
         $srcFile = $file->srcFile->getName();
         $outputFile = $srcFile."_tempOut.temp";
         $cmd = "python3 " . $flag_intScriptFile . " --source=" . $srcFile . ".src --input="
-                . $file->inFile->getName() . ".in";
+                . $file->getInputFile();
         // Execute interpreter
         exec($cmd, $output, $rc);
         $output = implode("\n", $output);
 
-        // Write it to the temporary file
-        $f = fopen($outputFile, "w");
-        fwrite($f, $output);
-        fclose($f);
+        // Keep the output for inspection
+        if($flag_noClean) {
+            file_put_contents($outputFile, $output);
+        }
 
         // Get expected output and return code
-        $expectedOut = getFileContent($file->outFile->getName().".out");
-        $expectedRc = getFileContent($file->rcFile->getName().".rc");
+        $expectedOut = $file->getExpectedOut();
+        $expectedRc = $file->getExpectedRc();
 
         // Add the test
         $testName = $file->srcFile->getNameNoPath();
         $testPath = $file->srcFile->getPath();
         $testEnv->add($testName, $testPath, $output, $rc, $expectedOut, $expectedRc);
-
-        // Cleanup
-        if(!$flag_noClean) {
-            if(file_exists($outputFile)) {
-                array_push($filesToRemove, $outputFile);
-            }
-        }
     } else if($flag_parseOnly) {
         // Setup
         $output = NULL;
         $rc = NULL;
         $srcFile = $file->srcFile->getName();
-        $outputFile = $srcFile."_tempOut.xml";
-        $deltaFile = $srcFile."_tempDelta.xml";
+        // Temporary files are kept next to the test only with --noclean, the test tree may be read-only
+        $tempName = $flag_noClean ? $srcFile : sys_get_temp_dir()."/".getmypid()."_".md5($srcFile);
+        $outputFile = $tempName."_tempOut.xml";
+        $deltaFile = $tempName."_tempDelta.xml";
 
         $cmd = "php ". $flag_parseScriptFile ." < ". $srcFile .".src";
 
@@ -579,10 +1025,10 @@ while($file != NULL) {
         fclose($f);
 
         // Get expected output and return code
-        $expectedOut = getFileContent($file->outFile->getName().".out");
-        $expectedRc = getFileContent($file->rcFile->getName().".rc");
+        $expectedOut = $file->getExpectedOut();
+        $expectedRc = $file->getExpectedRc();
 
-        if($expectedRc != "0") {
+        if($expectedRc != "0" || $file->outFile == NULL) {
             // Add the test
             $testName = $file->srcFile->getNameNoPath();
             $testPath = $file->srcFile->getPath();
@@ -627,34 +1073,29 @@ while($file != NULL) {
         $testName = $file->srcFile->getNameNoPath();
         $testPath = $file->srcFile->getPath();
 
-        // Setup parser
-        $output = NULL;
-        $rc = NULL;
-        $srcFile = $file->srcFile->getName();
-        $outputFile = $srcFile."_tempOut.temp";
-
-        $cmd = "php ".$flag_parseScriptFile." < ".$srcFile.".src | python3 ".$flag_intScriptFile." --input=".$srcFile.".in > ".$outputFile;
-
         // Execute parser and interpreter
-        exec($cmd, $output, $rc);
+        $srcFile = $file->srcFile->getName();
+        list($output, $rc) = parseAndInterpret($flag_parseScriptFile, $flag_intScriptFile, $srcFile.".src", $file->getInputFile());
 
         // Get expected output and return code
-        $expectedOut = getFileContent($file->outFile->getName().".out");
-        $expectedRc = getFileContent($file->rcFile->getName().".rc");
-        $output = getFileContent($outputFile);
+        $expectedOut = $file->getExpectedOut();
+        $expectedRc = $file->getExpectedRc();
 
-        if(diff2files($outputFile, $srcFile.".out") && $expectedRc == strval($rc)) {
+        // Keep the output for inspection
+        if($flag_noClean) {
+            file_put_contents($srcFile."_tempOut.temp", $output);
+        }
+
+        if($output === strval($expectedOut) && $expectedRc == strval($rc)) {
             // Outputs and return codes are equal
             $testEnv->add($testName, $testPath, $output, $rc, $expectedOut, $expectedRc, True);
         } else {
             $testEnv->add($testName, $testPath, $output, $rc, $expectedOut, $expectedRc, False);
         }
     }
-
-    $file = $rdi->next();
 }
 
-print($testEnv->getHtml());
+writeReports($testEnv, $resultsFile);
 
 // Clean up
 if(!$flag_noClean) {
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Kills a run with --checkpoint after a checkpoint was saved, continues it by --resume and compares
+the output and the return code byte for byte with an uninterrupted run. The killed run blocks in READ
+on a pipe which is not written, so it is killed at a known point, after the output it wrote since its
+last checkpoint reached the output file. A pipe cannot be the output of a run with --checkpoint. """
+# ---------------------------------------------------------------------------
+import os, sys, time, signal, tempfile, unittest, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+from workloads import toXml
+
+INTERPRET = os.path.join(ROOT, 'interpret.py')
+EVERY = 100 # --checkpoint-every, the loop saves several checkpoints before READ
+
+def program(*loops):
+    """ For every count of loops writes count lines in a loop, then 'wait' and the number of the READ,
+    reads a line and writes it. Ends by EXIT 3. """
+
+    code = '.IPPcode22\nDEFVAR GF@i\nDEFVAR GF@line\n'
+    for n, count in enumerate(loops):
+        code += '''MOVE GF@i int@%d
+JUMPIFEQ read%d GF@i int@0
+LABEL loop%d
+WRITE GF@i
+WRITE string@\\010
+SUB GF@i GF@i int@1
+JUMPIFNEQ loop%d GF@i int@0
+LABEL read%d
+WRITE string@wait%d\\010
+READ GF@line string
+WRITE GF@line
+WRITE string@\\010
+''' % (count, n, n, n, n, n)
+    return code + 'EXIT int@3\n'
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = self.path('program.xml')
+        self.checkpoint = self.path('program.ckpt')
+        self.output = self.path('program.out')
+        self.input = self.path('program.in')
+        with open(self.input, 'w') as f:
+            f.write('first\nsecond\n')
+        open(self.output, 'w').close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def command(self, *options):
+        return [sys.executable, INTERPRET, '--source=' + self.source] + list(options)
+
+    def checkpointed(self, *options):
+        return self.command('--checkpoint=' + self.checkpoint, '--checkpoint-every=%d' % EVERY, *options)
+
+    def write(self, *loops):
+        with open(self.source, 'w') as f:
+            f.write(toXml(program(*loops), 'IPPcode22'))
+
+    def uninterrupted(self):
+        with open(self.input) as f:
+            result = subprocess.run(self.command(), stdin=f, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        return result.stdout, result.returncode
+
+    def killAtRead(self, read, *options):
+        """ Runs the program appending to the output file until it waits in the given READ, the lines
+        of the earlier READs are written to its stdin. Then it is killed. """
+
+        env = dict(os.environ, PYTHONUNBUFFERED='1') # the output after the checkpoint reaches the file
+        marker = b'wait%d\n' % read
+        with open(self.output, 'ab') as output:
+            process = subprocess.Popen(self.checkpointed(*options), stdin=subprocess.PIPE, stdout=output,
+                                       stderr=subprocess.DEVNULL, env=env)
+        with open(self.input, 'rb') as f:
+            process.stdin.write(b''.join(f.readlines()[:read]))
+        process.stdin.flush()
+        deadline = time.monotonic() + 60
+        while not open(self.output, 'rb').read().endswith(marker):
+            self.assertIsNone(process.poll(), 'the run ended before READ')
+            self.assertLess(time.monotonic(), deadline, 'the run did not reach READ')
+            time.sleep(0.01)
+        process.send_signal(signal.SIGKILL)
+        process.wait()
+        process.stdin.close()
+        self.assertTrue(os.path.exists(self.checkpoint))
+
+    def resume(self, mode='ab'):
+        with open(self.input) as f, open(self.output, mode) as output:
+            return subprocess.run(self.checkpointed('--resume'), stdin=f, stdout=output,
+                                  stderr=subprocess.DEVNULL).returncode
+
+    def assertSameOutput(self, rc, expected):
+        with open(self.output, 'rb') as f:
+            self.assertEqual((f.read(), rc), expected)
+
+    def test_resume_after_checkpoints(self):
+        self.write(1000, 500)
+        expected = self.uninterrupted()
+        self.killAtRead(0)
+        self.assertSameOutput(self.resume(), expected)
+
+    def test_resume_before_first_checkpoint(self):
+        # only the checkpoint saved before the first instruction exists
+        self.write(0, 500)
+        expected = self.uninterrupted()
+        self.killAtRead(0)
+        self.assertSameOutput(self.resume(), expected)
+
+    def test_resume_twice(self):
+        # the second run is resumed, skips the line read before the checkpoint and is killed again
+        self.write(1000, 500)
+        expected = self.uninterrupted()
+        self.killAtRead(0)
+        self.killAtRead(1, '--resume')
+        self.assertSameOutput(self.resume(), expected)
+
+    def test_pipe_is_refused(self):
+        # output written to a pipe cannot be taken back by a resumed run
+        self.write(1000, 500)
+        with open(self.input) as f:
+            result = subprocess.run(self.checkpointed(), stdin=f, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.assertEqual((result.stdout, result.returncode), (b'', 12))
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resume_to_pipe_is_refused(self):
+        self.write(1000, 500)
+        self.killAtRead(0)
+        with open(self.input) as f:
+            result = subprocess.run(self.checkpointed('--resume'), stdin=f, stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL)
+        self.assertEqual((result.stdout, result.returncode), (b'', 12))
+
+    def test_missing_output_fails(self):
+        # the output file was truncated (>) instead of appended to (>>)
+        self.write(1000, 500)
+        self.killAtRead(0)
+        self.assertEqual(self.resume('wb'), 12)
+        self.assertEqual(os.path.getsize(self.output), 0)
+
+if __name__ == '__main__':
+    unittest.main()
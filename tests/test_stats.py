@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" --stats groups: --frequent counts the opcodes in the source code, --insts and --hot count the
+executed instructions. """
+# ---------------------------------------------------------------------------
+import os, sys, tempfile, unittest, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+from workloads import toXml
+
+INTERPRET = os.path.join(ROOT, 'interpret.py')
+
+# SUB and JUMPIFNEQ run 100 times, WRITE occurs three times in the code and runs three times
+LOOP = '''.IPPcode22
+DEFVAR GF@i
+MOVE GF@i int@100
+LABEL loop
+SUB GF@i GF@i int@1
+JUMPIFNEQ loop GF@i int@0
+WRITE GF@i
+WRITE string@\\010
+WRITE GF@i
+'''
+
+class StatsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def stats(self, code, *groups):
+        source, statsFile = os.path.join(self.tmp.name, 'program.xml'), os.path.join(self.tmp.name, 'stats')
+        with open(source, 'w') as f:
+            f.write(toXml(code, 'IPPcode22'))
+        subprocess.run([sys.executable, INTERPRET, '--source=' + source, '--input=' + os.devnull,
+                        '--stats=' + statsFile] + list(groups), stdout=subprocess.DEVNULL, check=True)
+        with open(statsFile) as f:
+            return f.read().splitlines()
+
+    def test_frequent_is_static(self):
+        self.assertEqual(self.stats(LOOP, '--frequent', '--insts', '--hot'), ['WRITE', '205', '4'])
+
+    def test_frequent_ties(self):
+        self.assertEqual(self.stats(LOOP.replace('WRITE GF@i\n', 'WRITE GF@i\nSUB GF@i GF@i int@0\n', 2), '--frequent'),
+                         ['SUB,WRITE'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" Tail calls: programs with CALL followed by RETURN, or by POPFRAME and RETURN, must print the same
+output and end with the same code as when every instruction is executed, which is the case with --stats.
+Tail recursions keep constant call and frame stack depths, reported by --peak-usage. """
+# ---------------------------------------------------------------------------
+import os, re, sys, tempfile, unittest, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+from workloads import toXml
+from recursion import countdown, frames, mutual
+
+INTERPRET = os.path.join(ROOT, 'interpret.py')
+
+# the result is returned in the frame of the outermost call, which ends in TF
+RESULT_IN_FRAME = '''.IPPcode22
+CREATEFRAME
+DEFVAR TF@n
+MOVE TF@n int@%d
+CALL f
+WRITE TF@n
+WRITE string@\\032
+WRITE TF@r
+EXIT int@0
+LABEL f
+PUSHFRAME
+DEFVAR LF@r
+MOVE LF@r LF@n
+JUMPIFEQ end LF@n int@0
+CREATEFRAME
+DEFVAR TF@n
+SUB TF@n LF@n int@1
+CALL f
+POPFRAME
+RETURN
+LABEL end
+POPFRAME
+RETURN
+'''
+
+# g works in the frame of its caller f, so frames are not balanced
+CALLER_FRAME = '''.IPPcode22
+CREATEFRAME
+DEFVAR TF@n
+MOVE TF@n int@%d
+CALL f
+WRITE TF@n
+EXIT int@0
+LABEL f
+PUSHFRAME
+JUMPIFEQ end LF@n int@0
+CREATEFRAME
+DEFVAR TF@n
+SUB TF@n LF@n int@1
+CALL g
+POPFRAME
+RETURN
+LABEL end
+POPFRAME
+RETURN
+LABEL g
+WRITE LF@n
+CALL f
+RETURN
+'''
+
+# EXIT at the bottom of a tail recursion
+EXIT_DEEP = '''.IPPcode22
+DEFVAR GF@n
+MOVE GF@n int@%d
+CALL down
+EXIT int@1
+LABEL down
+JUMPIFEQ bottom GF@n int@0
+SUB GF@n GF@n int@1
+CALL down
+RETURN
+LABEL bottom
+WRITE string@bottom
+EXIT int@7
+'''
+
+# a tail call of the main program, the RETURN after it has no address to return to
+EMPTY_CALL_STACK = '''.IPPcode22
+DEFVAR GF@n
+MOVE GF@n int@%d
+CALL down
+RETURN
+LABEL down
+JUMPIFEQ bottom GF@n int@0
+SUB GF@n GF@n int@1
+CALL down
+RETURN
+LABEL bottom
+WRITE GF@n
+RETURN
+'''
+
+# a tail call of the main program after POPFRAME, which has no frame to pop
+NO_LOCAL_FRAME = '''.IPPcode22
+CREATEFRAME
+DEFVAR TF@n
+MOVE TF@n int@%d
+CALL f
+POPFRAME
+RETURN
+LABEL f
+PUSHFRAME
+WRITE LF@n
+JUMPIFEQ end LF@n int@0
+CREATEFRAME
+DEFVAR TF@n
+SUB TF@n LF@n int@1
+CALL f
+POPFRAME
+RETURN
+LABEL end
+POPFRAME
+RETURN
+'''
+
+class TailCallTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, 'program.xml')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_(self, code, *options):
+        with open(self.source, 'w') as f:
+            f.write(toXml(code, 'IPPcode22'))
+        return subprocess.run([sys.executable, INTERPRET, '--source=' + self.source, '--input=' + os.devnull] + list(options),
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def assertSameResult(self, code):
+        statsFile = os.path.join(self.tmp.name, 'stats')
+        tail, full = self.run_(code), self.run_(code, '--stats=' + statsFile, '--insts')
+        self.assertEqual((tail.stdout, tail.returncode), (full.stdout, full.returncode))
+        return tail
+
+    def depths(self, result):
+        match = re.search(br'call depth (\d+), frame depth (\d+)', result.stderr)
+        return int(match.group(1)), int(match.group(2))
+
+    def test_same_results(self):
+        for program in (countdown, frames, mutual, RESULT_IN_FRAME.__mod__, CALLER_FRAME.__mod__,
+                        EXIT_DEEP.__mod__, EMPTY_CALL_STACK.__mod__, NO_LOCAL_FRAME.__mod__):
+            for depth in (0, 1, 2, 3, 50):
+                with self.subTest(program=program, depth=depth):
+                    self.assertSameResult(program(depth))
+
+    def test_error_codes(self):
+        self.assertEqual(self.assertSameResult(EXIT_DEEP % 20).returncode, 7)
+        self.assertEqual(self.assertSameResult(EMPTY_CALL_STACK % 20).returncode, 56)
+        self.assertEqual(self.assertSameResult(NO_LOCAL_FRAME % 20).returncode, 55)
+
+    def test_constant_depths(self):
+        for program in (countdown, frames, mutual):
+            with self.subTest(program=program):
+                self.assertLessEqual(self.depths(self.run_(program(2000), '--peak-usage')), (2, 2))
+
+    def test_caller_frame_is_not_dropped(self):
+        # g sees the frame of its caller f, so the frame of every level is kept
+        self.assertEqual(self.depths(self.run_(CALLER_FRAME % 100, '--peak-usage'))[1], 101)
+
+    def test_trace_executes_every_instruction(self):
+        # with a step hook every RETURN after a tail call is executed and counted
+        counts = [re.search(br'executed instructions: (\d+)', self.run_(countdown(100), *options).stderr).group(1)
+                  for options in ((), ('--trace=5',))]
+        self.assertEqual(counts, [b'306', b'406'])
+
+if __name__ == '__main__':
+    unittest.main()
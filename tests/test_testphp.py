@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+""" test.php: syntax check and runs on a copy of ipp-2023-tests/interpret-only. The summary must be
+the same as of the test.php of the first commit, shards merged together must give the same report
+as one run, the discovery index must see added and removed tests, and the parser and interpreter
+pipe must give the return code of the parser when it fails. Skipped without php. """
+# ---------------------------------------------------------------------------
+import os, re, sys, json, shutil, tempfile, unittest, subprocess
+import xml.etree.ElementTree as ET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+from workloads import toXml
+
+PHP = shutil.which('php')
+TEST_PHP = os.path.join(ROOT, 'test.php')
+INTERPRET = os.path.join(ROOT, 'interpret.py')
+CORPUS = os.path.join(ROOT, 'ipp-2023-tests', 'interpret-only')
+
+# passes the XML in the .src file to the interpreter, or ends with the code after FAIL without output
+PARSER = '''<?php
+$source = stream_get_contents(STDIN);
+if(preg_match("/^FAIL ([0-9]+)/", $source, $match)) {
+    exit(intval($match[1]));
+}
+echo $source;
+'''
+
+def summary(html):
+    return tuple(int(re.search(r'<h2>%s: (\d+)' % name, html).group(1)) for name in ('Tests run', 'Passed', 'Failed'))
+
+@unittest.skipUnless(PHP, 'php is not installed')
+class TestPhpTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tests = self.path('tests')
+        shutil.copytree(CORPUS, self.tests)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def run_(self, *options, script=TEST_PHP):
+        result = subprocess.run([PHP, script] + list(options), cwd=self.tmp.name, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout
+
+    def runTests(self, *options, script=TEST_PHP, directory=None):
+        return self.run_('--directory=' + (directory or self.tests), '--recursive', '--int-only',
+                         '--int-script=' + INTERPRET, *options, script=script)
+
+    def ids(self, jsonlFile):
+        with open(jsonlFile) as f:
+            return [json.loads(line)['id'] for line in f]
+
+    def test_syntax(self):
+        result = subprocess.run([PHP, '-l', TEST_PHP], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                universal_newlines=True)
+        self.assertEqual(result.returncode, 0, result.stdout)
+
+    def test_same_summary_as_first_commit(self):
+        first = subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'], cwd=ROOT, stdout=subprocess.PIPE,
+                               universal_newlines=True).stdout.split()
+        if not first:
+            self.skipTest('not a git repository')
+        original = self.path('test_original.php')
+        with open(original, 'wb') as f:
+            f.write(subprocess.run(['git', 'show', first[0] + ':test.php'], cwd=ROOT, stdout=subprocess.PIPE,
+                                   check=True).stdout)
+        # the original test.php creates the missing .in, .out and .rc files, so it gets its own copy
+        shutil.copytree(CORPUS, self.path('original'))
+        expected = summary(self.runTests(script=original, directory=self.path('original')))
+        self.assertEqual(expected[0], sum(name.endswith('.src') for _, _, names in os.walk(CORPUS) for name in names))
+        self.assertEqual(summary(self.runTests()), expected)
+
+    def test_shards_merge_to_one_report(self):
+        html = self.runTests('--jsonl=' + self.path('all.jsonl'))
+        manifest = self.path('manifest.json')
+        self.runTests('--manifest=' + manifest, '--durations=' + self.path('all.jsonl'))
+        with open(manifest) as f:
+            entries = json.load(f)['tests']
+        ids = self.ids(self.path('all.jsonl'))
+        self.assertEqual([entry['id'] for entry in entries], sorted(ids))
+        self.assertTrue(all(entry['known'] for entry in entries))
+
+        shards = [self.path('shard%d.jsonl' % index) for index in (1, 2, 3)]
+        for index, shard in enumerate(shards, 1):
+            self.runTests('--shard=%d/3' % index, '--durations=' + manifest, '--jsonl=' + shard)
+        shardIds = [self.ids(shard) for shard in shards]
+        self.assertTrue(all(shardIds))
+        self.assertEqual(sorted(sum(shardIds, [])), sorted(ids))
+
+        junit = self.path('merged.xml')
+        merged = self.run_('--merge=' + ','.join(shards), '--jsonl=' + self.path('merged.jsonl'), '--junit=' + junit,
+                           '--json=' + self.path('merged.json'))
+        self.assertEqual(merged, html) # tables of the same directory are printed together
+        self.assertEqual(sorted(self.ids(self.path('merged.jsonl'))), sorted(ids))
+        with open(self.path('merged.json')) as f:
+            self.assertEqual(len(json.load(f)['tests']), len(ids))
+        cases = ET.parse(junit).getroot().findall('.//testcase')
+        self.assertEqual((len(cases), sum(case.find('failure') is not None for case in cases)), summary(html)[::2])
+
+    def test_index_follows_changes(self):
+        index = self.path('index.json')
+        count = summary(self.runTests('--index=' + index))[0]
+        with open(index) as f:
+            self.assertIn('jumps', json.load(f)['directories'])
+        self.assertEqual(summary(self.runTests('--index=' + index))[0], count)
+
+        jumps = os.path.join(self.tests, 'jumps')
+        name = sorted(name for name in os.listdir(jumps) if name.endswith('.src'))[0]
+        shutil.copy(os.path.join(jumps, name), os.path.join(jumps, 'added.src'))
+        self.assertEqual(summary(self.runTests('--index=' + index))[0], count + 1)
+
+        frames = os.path.join(self.tests, 'frames')
+        removed = sum(name.endswith('.src') for name in os.listdir(frames))
+        shutil.rmtree(frames)
+        self.assertEqual(summary(self.runTests('--index=' + index))[0], count + 1 - removed)
+
+    def test_return_code_of_failed_parser(self):
+        parser, tests = self.path('parse.php'), self.path('both')
+        with open(parser, 'w') as f:
+            f.write(PARSER)
+        os.mkdir(tests)
+        cases = {'write': (toXml('.IPPcode22\nWRITE string@ahoj\n', 'IPPcode22'), 'ahoj', '0'),
+                 'exit': (toXml('.IPPcode22\nEXIT int@5\n', 'IPPcode22'), '', '5'),
+                 'lexical': ('FAIL 22', '', '22'), 'syntax': ('FAIL 23', '', '23')}
+        for name, (source, output, rc) in cases.items():
+            for extension, text in (('src', source), ('out', output), ('rc', rc)):
+                with open(os.path.join(tests, name + '.' + extension), 'w') as f:
+                    f.write(text)
+        jsonl = self.path('both.jsonl')
+        html = self.run_('--directory=' + tests, '--parse-script=' + parser, '--int-script=' + INTERPRET, '--jsonl=' + jsonl)
+        with open(jsonl) as f:
+            records = {record['id']: record for record in map(json.loads, f)}
+        self.assertEqual({name: str(record['rc']) for name, record in records.items()},
+                         {name: rc for name, (_, _, rc) in cases.items()})
+        self.assertEqual(summary(html), (4, 4, 0))
+
+if __name__ == '__main__':
+    unittest.main()